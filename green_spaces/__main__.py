@@ -1,34 +1,60 @@
-import reviews.yelp 
-import reviews.google 
-import reviews.combine_reviews 
-import parks.create_parks_geojson 
-import parks.clean_park_polygons 
-import index.index
-import tract_level_analysis.grid_chicago
-import tract_level_analysis.census
-import tract_level_analysis.tracts_data
-import viz.kepler_visual
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from green_spaces.index import index
+from green_spaces.parks import clean_park_polygons, create_parks_geojson, ingest_extract
+from green_spaces.reviews import combine_reviews, google, yelp
+from green_spaces.tract_level_analysis import census, grid_chicago, tracts_data
+from green_spaces.viz import kepler_visual
+from green_spaces.config import CHICAGO, CITIES, prepare_city_dirs
 
-def main():
-    # Parks
-    parks.create_parks_geojson.fetch_and_save_park_data()
-    parks.clean_park_polygons.main()
+def main(city=CHICAGO, pbf_path=None):
+    # Each city reads and writes under its own data directory; housing.geojson
+    # and the census tracts shapefile are provided per city
+    prepare_city_dirs(city)
+
+    # Parks, and buildings, read in one pass from a local OSM extract when
+    # given, otherwise parks are fetched from Overpass
+    if pbf_path is not None:
+        ingest_extract.main(pbf_path, city)
+    else:
+        create_parks_geojson.fetch_and_save_park_data(city)
+    clean_park_polygons.main(city)
 
     # Reviews
-    reviews.yelp.main()
-    reviews.google.main()
-    reviews.combine_reviews.main()
+    yelp.main(city)
+    google.main(city)
+    combine_reviews.main(city)
     
     # Index
-    index.index.main()
+    index.main(city=city)
 
     # Census Tracts
-    tract_level_analysis.grid_chicago.main()
-    tract_level_analysis.census.main()
-    tract_level_analysis.tracts_data.main()
+    grid_chicago.main(city=city)
+    census.main(city)
+    tracts_data.main(city)
     
     #Kepler Object
-    viz.kepler_visual.main()
+    kepler_visual.main(city)
+
+    return city.name
+
+def run_cities(cities, max_workers=None, pbf_path=None):
+    """
+    Run the whole pipeline for several cities concurrently, one worker
+    process per city, reading each city from the OSM extract if given.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for name in executor.map(main, cities, repeat(pbf_path)):
+            print(f"{name.title()} pipeline finished")
 
 if __name__ == "__main__":
-    main()
+    # Cities named on the command line run in parallel, Chicago by default
+    parser = argparse.ArgumentParser()
+    parser.add_argument("cities", nargs="*", help=f"cities among {', '.join(CITIES)}")
+    parser.add_argument("--pbf", help="local .osm.pbf extract covering the cities")
+    args = parser.parse_args()
+    if args.cities:
+        run_cities([CITIES[name] for name in args.cities], pbf_path=args.pbf)
+    else:
+        main(pbf_path=args.pbf)
@@ -0,0 +1,41 @@
+import numpy as np
+
+
+def find_clusters(edges):
+    """
+    Group IDs connected by edges into clusters with an array-based
+    union-find, e.g. intersecting parks or duplicate review listings.
+
+    Clusters are ordered by their first ID in edge order, and the IDs in
+    each cluster keep that order as well.
+
+    Args:
+        edges (list): Pairs of connected IDs
+
+    Returns:
+        list: List of clusters, each a list of IDs
+    """
+    # number IDs by their first appearance in the edge list
+    positions = {}
+    for edge in edges:
+        for node_id in edge:
+            positions.setdefault(node_id, len(positions))
+    parent = np.arange(len(positions))
+
+    def find(node):
+        while parent[node] != node:
+            # path halving keeps the trees shallow
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for id1, id2 in edges:
+        root1, root2 = find(positions[id1]), find(positions[id2])
+        if root1 != root2:
+            parent[max(root1, root2)] = min(root1, root2)
+
+    clusters = {}
+    for node_id, node in positions.items():
+        clusters.setdefault(find(node), []).append(node_id)
+
+    return list(clusters.values())
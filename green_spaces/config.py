@@ -0,0 +1,154 @@
+import numpy as np
+from pathlib import Path
+from typing import NamedTuple
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+
+# other cities keep their inputs and outputs under DATA_DIR / "cities" / name
+CITIES_DIR = DATA_DIR / "cities"
+
+# API response cache; other cities cache their responses under
+# CACHE_DIR / "cities" / name, as their searches may share parameters
+CACHE_DIR = Path(__file__).parent.parent / "cache"
+CITIES_CACHE_DIR = CACHE_DIR / "cities"
+
+
+class CityConfig(NamedTuple):
+    name: str  # short name, used for the city's data directory
+    place_name: str  # OSM place to fetch parks for
+    bbox: tuple  # (north, south, east, west) bounds of the city
+    search_locations: list  # (lat, lon) centers of the Google review searches
+    search_radius: int  # radius of the Google review searches (in meters)
+    yelp_location: str  # location of the Yelp review searches
+    state_fips: str  # census state FIPS code
+    county_fips: str  # census county FIPS code
+    map_center: tuple  # (lat, lon) center of the maps
+    data_dir: Path  # directory of the city's inputs and outputs
+    cache_dir: Path  # directory of the city's API response cache
+    tracts_file: str = "tracts.shp"  # census tracts shapefile name
+    tract_bbox: tuple = None  # bounds used to keep tracts, bbox when None
+
+
+def search_grid(bbox, rows=3, columns=5):
+    """
+    Spread review search centers over a bounding box, one per cell of a
+    rows x columns grid.
+
+    Args:
+        bbox (tuple): (north, south, east, west) bounds
+        rows (int): Number of grid rows
+        columns (int): Number of grid columns
+
+    Returns:
+        list: (lat, lon) tuples
+    """
+    north, south, east, west = bbox
+    lat_step = (north - south) / rows
+    lon_step = (east - west) / columns
+    lats = south + lat_step * (np.arange(rows) + 0.5)
+    lons = west + lon_step * (np.arange(columns) + 0.5)
+    return [(round(lat, 4), round(lon, 4)) for lat in lats for lon in lons]
+
+
+def city_config(name, place_name, bbox, state_fips, county_fips, **kwargs):
+    """
+    Build the configuration of a city from its place and bounds, spreading
+    the review searches over its bounding box.
+
+    Args:
+        name (str): Short name of the city
+        place_name (str): OSM place to fetch parks for
+        bbox (tuple): (north, south, east, west) bounds
+        state_fips (str): Census state FIPS code
+        county_fips (str): Census county FIPS code
+        kwargs: Overrides of the other CityConfig fields
+
+    Returns: CityConfig
+    """
+    north, south, east, west = bbox
+    locations = search_grid(bbox)
+
+    # circles reaching the corners of the 3 x 5 search grid cells
+    cell_height = (north - south) / 3 * 111_000
+    cell_width = (east - west) / 5 * 111_000 * np.cos(np.radians((north + south) / 2))
+    radius = int(np.hypot(cell_height, cell_width) / 2)
+
+    fields = {
+        "name": name,
+        "place_name": place_name,
+        "bbox": bbox,
+        "search_locations": locations,
+        "search_radius": radius,
+        "yelp_location": place_name.split(",")[0],
+        "state_fips": state_fips,
+        "county_fips": county_fips,
+        "map_center": ((north + south) / 2, (east + west) / 2),
+        "data_dir": CITIES_DIR / name,
+        "cache_dir": CITIES_CACHE_DIR / name,
+    }
+    fields.update(kwargs)
+    return CityConfig(**fields)
+
+
+def prepare_city_dirs(city):
+    """
+    Create the data directories the pipeline stages write to.
+
+    Args:
+        city (CityConfig): City to prepare
+    """
+    for subdir in [
+        "review_data",
+        "grid_and_tracts/raw/census_tracts",
+        "grid_and_tracts/processed/census",
+        "grid_and_tracts/processed/grid",
+        "grid_and_tracts/processed/merged",
+    ]:
+        (city.data_dir / subdir).mkdir(parents=True, exist_ok=True)
+
+
+# List of 15 locations spread out throughout Chicago
+CHICAGO_LOCATIONS = [
+    (41.7033, -87.8980),
+    (41.7033, -87.8140),
+    (41.7033, -87.7300),
+    (41.7033, -87.6460),
+    (41.7033, -87.5620),
+    (41.8300, -87.8980),
+    (41.8300, -87.8140),
+    (41.8300, -87.7300),
+    (41.8300, -87.6460),
+    (41.8300, -87.5620),
+    (41.9567, -87.8980),
+    (41.9567, -87.8140),
+    (41.9567, -87.7300),
+    (41.9567, -87.6460),
+    (41.9567, -87.5620),
+]
+
+CHICAGO = CityConfig(
+    name="chicago",
+    place_name="Chicago, Illinois, USA",
+    bbox=(42.023131, 41.644286, -87.523661, -87.940101),
+    search_locations=CHICAGO_LOCATIONS,
+    search_radius=3590,  # Roughly dividing Chicago in 15 areas
+    yelp_location="Chicago",
+    state_fips="17",  # Illinois
+    county_fips="031",  # Cook County
+    map_center=(41.8781, -87.6298),
+    data_dir=DATA_DIR,
+    cache_dir=CACHE_DIR,
+    tracts_file="il_tracts.shp",
+    tract_bbox=(42.0230374, 41.6328758, -87.5240812, -87.8824214),
+)
+
+MINNEAPOLIS = city_config(
+    "minneapolis",
+    "Minneapolis, Minnesota, USA",
+    (45.051248, 44.890198, -93.193859, -93.329163),
+    state_fips="27",  # Minnesota
+    county_fips="053",  # Hennepin County
+)
+
+# cities the pipeline can run for, by name
+CITIES = {city.name: city for city in [CHICAGO, MINNEAPOLIS]}
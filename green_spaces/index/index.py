@@ -1,16 +1,59 @@
 import geopandas as gpd
+import pandas as pd
+import hashlib
 import json
 import re
+import numpy as np
+import shapely
 from shapely.geometry import Polygon
 from typing import NamedTuple
 from collections import defaultdict
 from pathlib import Path
 from jellyfish import jaro_winkler_similarity
-from rtree import index as rtree_index
+from .kdtree import build_kdtree, query_radius
+from green_spaces.config import CHICAGO
+from green_spaces.reviews.combine_reviews import PLACE_TABLE, place_geodataframe
+from green_spaces.reviews.reviews_utils import load_place_table
 
 DATA_DIR = Path(__file__).parent.parent.parent / "data" 
 REVIEW_DIR = DATA_DIR / "review_data"
 
+# distance (meters) reviews are buffered by before matching them to parks
+REVIEW_BUFFER = 250
+
+# metric CRS used for buffering and distances (meters)
+METRIC_CRS = 3857
+
+# nearest-park metrics: minimum rating for the "nearest good park" distance,
+# number of parks averaged for the k-nearest distance, and initial search radius
+NEAREST_MIN_RATING = 4
+K_NEAREST = 3
+NEAREST_SEARCH_RADIUS = 2000
+
+# entrances within this distance (meters) of a park are assigned to it
+ENTRANCE_SNAP_DISTANCE = 15
+
+# exclusive review assignment: candidate radius (meters) around each review
+# and the weight of name similarity against proximity in the match score
+REVIEW_MATCH_DISTANCE = 250
+NAME_MATCH_WEIGHT = 0.6
+
+# simplification tolerance (degrees) for the park hulls of the park index
+HULL_TOLERANCE = 0.0002
+
+# approximate engine: slack (meters) absorbing the polygonal buffer and
+# reprojection, and the relative error bound of park_count, size_index or
+# rating_index above which a point is re-checked with the exact engine
+APPROX_SLACK = 2
+APPROX_TOLERANCE = 0.05
+
+# error bound returned by approximate_index for each index
+APPROX_ERRORS = {
+    "park_count": "count_error",
+    "size_index": "size_error",
+    "rating_index": "rating_error",
+}
+
 class ParkTuple(NamedTuple):
     park_polygon: Polygon
     name: str
@@ -19,6 +62,14 @@ class ParkTuple(NamedTuple):
     area: float
 
 
+class ParkIndex(NamedTuple):
+    ids: np.ndarray
+    geometries: np.ndarray  # prepared park polygons
+    hulls: np.ndarray  # simplified hulls containing each park
+    rep_x: np.ndarray  # coordinates of a point inside each park
+    rep_y: np.ndarray
+
+
 class HousingTuple(NamedTuple):
     park_count: int
     size_index: float
@@ -133,29 +184,178 @@ def match_park_ratings_name(park_name, polygon, ratings):
     return park_tuple
 
 
-def create_parks_dict(parks_data, ratings):
+def clean_name(name):
+    """
+    Remove words such as "park" and "field" from a park or review name.
+    """
+    if pd.isna(name):
+        return ""
+    for word in REMOVE_WORDS:
+        name = name.replace(word, "")
+    return name.strip()
+
+
+def match_reviews_exclusive(parks_data, ratings):
+    """
+    Assign each review to its single best park, so a review near several
+    adjacent parks is only counted once.
+
+    Candidate parks within REVIEW_MATCH_DISTANCE of each review are found with
+    one bulk query over the parks' spatial index. Each candidate pair is scored
+    by name similarity and proximity, and the highest scoring park wins.
+
+    Args:
+        parks_data (geopandas dataframe): parks data
+        ratings (geopandas dataframe): review data with latitude and longitude
+
+    Returns: pandas dataframe match table with one row per matched review and
+    columns review_id, park_id, match_type, score, distance.
+    """
+    # locate reviews by their coordinates rather than their buffered geometry
+    review_points = gpd.GeoSeries(
+        gpd.points_from_xy(ratings["longitude"], ratings["latitude"]), crs=4326
+    ).to_crs(epsg=METRIC_CRS)
+    parks_metric = parks_data.to_crs(epsg=METRIC_CRS)
+
+    review_idx, park_idx, distances = park_distance_pairs(
+        review_points, parks_metric, REVIEW_MATCH_DISTANCE
+    )
+
+    # unnamed parks only score on proximity
+    park_names = [
+        "" if pd.isna(name) or name.startswith("Unnamed") else clean_name(name)
+        for name in parks_data["name"]
+    ]
+    review_names = [clean_name(name) for name in ratings["name"]]
+
+    # score each distinct (review name, park name) pair once: chains and
+    # generic names repeat, so there are far fewer distinct pairs than
+    # candidate pairs
+    park_vocab, park_codes = np.unique(np.array(park_names, dtype=str), return_inverse=True)
+    review_vocab, review_codes = np.unique(
+        np.array(review_names, dtype=str), return_inverse=True
+    )
+    n_park_names = len(park_vocab)
+    pair_codes = review_codes[review_idx] * n_park_names + park_codes[park_idx]
+    unique_pairs, pair_inverse = np.unique(pair_codes, return_inverse=True)
+    review_pair_names = review_vocab[unique_pairs // n_park_names]
+    park_pair_names = park_vocab[unique_pairs % n_park_names]
+    unique_scores = np.array(
+        [
+            jaro_winkler_similarity(review_name, park_name) if park_name else 0.0
+            for review_name, park_name in zip(review_pair_names, park_pair_names)
+        ],
+        dtype=float,
+    )
+    name_scores = unique_scores[pair_inverse]
+    scores = NAME_MATCH_WEIGHT * name_scores + (1 - NAME_MATCH_WEIGHT) * (
+        1 - distances / REVIEW_MATCH_DISTANCE
+    )
+
+    # keep the best scoring park for each review
+    order = np.lexsort((distances, -scores, review_idx))
+    is_first = np.ones(len(order), dtype=bool)
+    is_first[1:] = review_idx[order][1:] != review_idx[order][:-1]
+    first = order[is_first]
+    first = first[scores[first] > 0]
+
+    return pd.DataFrame(
+        {
+            "review_id": ratings.index.to_numpy()[review_idx[first]],
+            "park_id": parks_data["id"].to_numpy()[park_idx[first]],
+            "match_type": "exclusive",
+            "score": scores[first],
+            "distance": distances[first],
+        }
+    )
+
+
+def match_reviews_buffer(parks_data, ratings):
+    """
+    Match reviews to parks the way buffer assignment rates them: a named park
+    takes the reviews with a similar name (see match_park_ratings_name), an
+    unnamed park the reviews whose buffer intersects it (see
+    match_park_ratings_point). A review may be matched to several parks.
+
+    Args:
+        parks_data (geopandas dataframe): parks data
+        ratings (geopandas dataframe): buffered review data
+
+    Returns: pandas dataframe match table with one row per matched pair,
+    grouped by park in parks order and reviews in ratings order, and columns
+    review_id, park_id, match_type, score.
+    """
+    review_ids = ratings.index.to_numpy()
+    park_ids = parks_data["id"].to_numpy()
+
+    # remove words such as "park" and "field" from review names once
+    review_names = []
+    for name in ratings["name"]:
+        name = name or ""
+        for word in REMOVE_WORDS:
+            name = name.replace(word, "")
+        review_names.append(name)
+
+    # unnamed parks match on intersecting review buffers
+    unnamed = np.array([pd.isna(name) for name in parks_data["name"]], dtype=bool)
+    unnamed_idx = np.flatnonzero(unnamed)
+    park_pos, review_pos = ratings.geometry.sindex.query(
+        parks_data.geometry.values[unnamed_idx], predicate="intersects"
+    )
+    spatial = defaultdict(list)
+    for p, r in zip(unnamed_idx[park_pos], review_pos):
+        spatial[p].append(r)
+
+    rows = []
+    for p, park_name in enumerate(parks_data["name"]):
+        if unnamed[p]:
+            rows.extend(
+                (review_ids[r], park_ids[p], "spatial", 1.0)
+                for r in sorted(spatial.get(p, []))
+            )
+            continue
+
+        cleaned_park_name = park_name
+        for word in REMOVE_WORDS:
+            cleaned_park_name = cleaned_park_name.replace(word, "")
+        is_numbered_park = re.match(r"^No\.\s\d{3}$", cleaned_park_name.strip())
+        # for park names such as "No. 593", require close to a perfect match
+        threshold = 0.97 if is_numbered_park else 0.85
+
+        for r, review_name in enumerate(review_names):
+            sim_score = jaro_winkler_similarity(review_name, park_name)
+            if sim_score > threshold:
+                rows.append((review_ids[r], park_ids[p], "name", sim_score))
+
+    return pd.DataFrame(rows, columns=["review_id", "park_id", "match_type", "score"])
+
+
+def create_parks_dict(parks_data, ratings, match_table=None):
     """
     Create a dictionary of parks with average ratings.
 
     Args:
         parks_data (geopandas dataframe): parks data
+        ratings (geopandas dataframe): review data
+        match_table (pandas dataframe): optional review to park match table
+            (see match_reviews_exclusive and load_match_table). Parks are
+            rated from their matched reviews, by default from the buffer and
+            name matches of match_reviews_buffer.
 
     Returns: dictionary of parks with NamedTuples as values.
     """
     parks_dict = defaultdict(int)
 
-    for _, park in parks_data.iterrows():
-        polygon = park.geometry
-        park_name = park["name"]
+    if match_table is None:
+        match_table = match_reviews_buffer(parks_data, ratings)
 
-        park_tuple = match_park_ratings_point(polygon, ratings)
+    reviews_by_park = defaultdict(list)
+    for review_id, park_id in zip(match_table["review_id"], match_table["park_id"]):
+        reviews_by_park[park_id].append(ratings.loc[review_id])
 
-        # Still check all park matches on name even if a review was matched to
-        # a park based on spatial proximity & override previous match accordingly
-        if park_name is not None:
-            park_tuple = match_park_ratings_name(park_name, polygon, ratings)
-
-        parks_dict[park["id"]] = park_tuple
+    for _, park in parks_data.iterrows():
+        matching_rows = reviews_by_park.get(park["id"], [])
+        parks_dict[park["id"]] = calculate_park_rating(matching_rows, park.geometry)
 
     return parks_dict
 
@@ -174,7 +374,7 @@ def create_buffer(housing, distance):
     Returns: updated geopandas dataframe with buffer geometries.
     """
     # convert to a metric CRS for buffering in meters
-    housing_project = housing.to_crs(epsg=3857)
+    housing_project = housing.to_crs(epsg=METRIC_CRS)
 
     # apply buffer to all points in housing data
     housing_project["geometry"] = housing_project.geometry.buffer(distance)
@@ -185,30 +385,38 @@ def create_buffer(housing, distance):
     return housing_project
 
 
-def park_walking_distance(buffered_point, parks_data):
+def park_walking_distance(buffered_point, parks_data, park_index=None):
     """
     Find parks within walking distance of housing unit.
 
     Args:
         buffered_point (Polygon): buffered radius around housing unit
         parks_data (geopandas dataframe): parks data
+        park_index (ParkIndex): optional precomputed park index, which decides
+            most candidates from simplified hulls and interior points and only
+            runs the exact predicate on the ambiguous ones
 
     Returns: tuple containing count of parks within walking distance to unit and
     list of those park ids.
     """
+    # Use the parks' spatial index (built once and cached on the GeoDataFrame)
+    # to filter candidates by bounding box
+    candidates = np.sort(parks_data.sindex.query(buffered_point))
+
+    if park_index is not None:
+        polygon_id_list = list(
+            park_index.ids[two_phase_intersects(buffered_point, candidates, park_index)]
+        )
+        return (len(polygon_id_list), polygon_id_list)
+
     polygon_id_list = []
     park_count = 0
-    # Create spatial index
-    idx = rtree_index.Index()
-    for i, park in parks_data.iterrows():
-        idx.insert(i, park.geometry.bounds)
-    
-    # Use spatial index to filter candidates
-    for i in list(idx.intersection(buffered_point.bounds)):
+
+    for i in candidates:
         park = parks_data.iloc[i]
         polygon = park.geometry
         polygon_id = park["id"]
-        
+
         if buffered_point.intersects(polygon):
             park_count += 1
             polygon_id_list.append(polygon_id)
@@ -216,6 +424,383 @@ def park_walking_distance(buffered_point, parks_data):
     return (park_count, polygon_id_list)
 
 
+##############################
+# Park index with simplified hulls and prepared geometries
+##############################
+
+
+def outer_hull(polygon):
+    """
+    Simplified hull guaranteed to contain the polygon: the convex hull is
+    grown by twice the tolerance before simplifying, so simplification can
+    never cut back into the park.
+    """
+    return polygon.convex_hull.buffer(2 * HULL_TOLERANCE).simplify(HULL_TOLERANCE)
+
+
+def create_park_index(parks_data, hulls=None, rep_points=None):
+    """
+    Create the park index used by park_walking_distance.
+
+    Args:
+        parks_data (geopandas dataframe): parks data
+        hulls, rep_points (arrays): optional precomputed hulls and interior
+            points, e.g. loaded from the on-disk cache
+
+    Returns: ParkIndex
+    """
+    geometries = parks_data.geometry.to_numpy().copy()
+    if hulls is None:
+        hulls = np.array([outer_hull(polygon) for polygon in geometries])
+    if rep_points is None:
+        rep_points = shapely.point_on_surface(geometries)
+
+    shapely.prepare(geometries)
+    shapely.prepare(hulls)
+
+    return ParkIndex(
+        ids=parks_data["id"].to_numpy(),
+        geometries=geometries,
+        hulls=hulls,
+        rep_x=shapely.get_x(rep_points),
+        rep_y=shapely.get_y(rep_points),
+    )
+
+
+def two_phase_intersects(buffered_point, candidates, park_index):
+    """
+    Test which candidate parks intersect a buffered point. Parks whose hull
+    misses the buffer are clearly out and parks with an interior point inside
+    the buffer are clearly in; only the remaining boundary cases run the exact
+    predicate on the prepared park geometry.
+
+    Args:
+        buffered_point (Polygon): buffered radius around housing unit
+        candidates (array): park positions from the bounding box query
+        park_index (ParkIndex): park index
+
+    Returns: array of park positions that intersect the buffered point.
+    """
+    candidates = candidates[
+        shapely.intersects(park_index.hulls[candidates], buffered_point)
+    ]
+
+    shapely.prepare(buffered_point)
+    clearly_in = shapely.contains_xy(
+        buffered_point, park_index.rep_x[candidates], park_index.rep_y[candidates]
+    )
+
+    ambiguous = candidates[~clearly_in]
+    exact_in = shapely.intersects(park_index.geometries[ambiguous], buffered_point)
+    shapely.destroy_prepared(buffered_point)
+
+    return np.sort(np.concatenate([candidates[clearly_in], ambiguous[exact_in]]))
+
+
+def file_hash(path):
+    """
+    SHA-1 hash of a file's contents, used to key cached artifacts.
+    """
+    sha = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def load_park_index(parks_data, parks_path):
+    """
+    Load the park index for a cleaned parks file, reusing the hulls and
+    interior points cached next to it when the parks file is unchanged.
+
+    Args:
+        parks_data (geopandas dataframe): parks data read from parks_path
+        parks_path (Path): cleaned parks GeoJSON file
+
+    Returns: ParkIndex
+    """
+    cache_path = parks_path.with_name(parks_path.stem + "_index.json")
+    source_hash = file_hash(parks_path)
+
+    if cache_path.exists():
+        with open(cache_path, "r") as f:
+            cached = json.load(f)
+        if (
+            cached["source_hash"] == source_hash
+            and cached["tolerance"] == HULL_TOLERANCE
+        ):
+            hulls = np.array([shapely.geometry.shape(h) for h in cached["hulls"]])
+            rep_points = shapely.points(cached["rep_points"])
+            return create_park_index(parks_data, hulls, rep_points)
+
+    park_index = create_park_index(parks_data)
+
+    with open(cache_path, "w") as f:
+        json.dump(
+            {
+                "source_hash": source_hash,
+                "tolerance": HULL_TOLERANCE,
+                "hulls": [hull.__geo_interface__ for hull in park_index.hulls],
+                "rep_points": np.column_stack(
+                    [park_index.rep_x, park_index.rep_y]
+                ).tolist(),
+            },
+            f,
+        )
+
+    return park_index
+
+
+def ratings_path(review_dir, buffer_distance=REVIEW_BUFFER):
+    """
+    Path of the combined reviews: the place table saved by combine_reviews,
+    or the buffered GeoJSON export of earlier runs when there is no table.
+    """
+    table_path = review_dir / (PLACE_TABLE + ".npy")
+    if table_path.exists():
+        return table_path
+    return review_dir / f"combined_reviews_buffered_{buffer_distance}.geojson"
+
+
+def review_ids(ratings):
+    """
+    Stable id of each review, a hash of its source, name and coordinates.
+    Unlike row positions, ids name the same places from one combine or
+    refresh run to the next, so saved match tables keep pointing at them.
+    Repeated keys are numbered in row order.
+
+    Args:
+        ratings (geopandas dataframe): review data
+
+    Returns: list of review id strings aligned with ratings
+    """
+    ids, seen = [], defaultdict(int)
+    columns = ["source", "name", "latitude", "longitude"]
+    for values in zip(*(ratings[column] for column in columns)):
+        key = json.dumps(
+            [None if pd.isna(value) else value for value in values], default=float
+        )
+        review_id = hashlib.sha256(key.encode()).hexdigest()[:16]
+        seen[review_id] += 1
+        if seen[review_id] > 1:
+            review_id = f"{review_id}-{seen[review_id]}"
+        ids.append(review_id)
+    return ids
+
+
+def load_ratings(review_dir, buffer_distance=REVIEW_BUFFER):
+    """
+    Load the combined reviews, buffered for matching to parks and indexed by
+    review_ids. The place table is memory-mapped and buffered in memory.
+
+    Args:
+        review_dir (Path): directory of the review data
+        buffer_distance (int): distance the reviews are buffered by
+
+    Returns: geopandas dataframe of the buffered reviews
+    """
+    path = ratings_path(review_dir, buffer_distance)
+    if path.suffix == ".npy":
+        ratings = place_geodataframe(load_place_table(path), buffer_distance)
+    else:
+        ratings = gpd.read_file(path)
+    ratings.index = pd.Index(review_ids(ratings), name="review_id")
+    return ratings
+
+
+def load_match_table(
+    parks_data, ratings, parks_path, reviews_path, review_assignment="buffer"
+):
+    """
+    Load the review to park match table, reusing the one saved next to the
+    reviews when the parks and reviews files and the match settings are
+    unchanged. Otherwise the reviews are matched again and the table saved.
+
+    Args:
+        parks_data (geopandas dataframe): parks data read from parks_path
+        ratings (geopandas dataframe): review data read from reviews_path
+        parks_path (Path): cleaned parks GeoJSON file
+        reviews_path (Path): combined reviews file (see ratings_path)
+        review_assignment (str): "buffer" or "exclusive"
+
+    Returns: pandas dataframe match table with columns review_id (the
+    ratings index, stable review_ids when loaded with load_ratings), park_id,
+    match_type, score
+    """
+    cache_path = reviews_path.with_name(f"review_park_matches_{review_assignment}.json")
+    if review_assignment == "exclusive":
+        settings = {"distance": REVIEW_MATCH_DISTANCE, "name_weight": NAME_MATCH_WEIGHT}
+    else:
+        settings = {"buffer": REVIEW_BUFFER}
+    key = {
+        "parks_hash": file_hash(parks_path),
+        "reviews_hash": file_hash(reviews_path),
+        "settings": settings,
+    }
+
+    if cache_path.exists():
+        with open(cache_path, "r") as f:
+            cached = json.load(f)
+        if cached["key"] == key:
+            return pd.DataFrame(cached["matches"])
+
+    if review_assignment == "exclusive":
+        match_table = match_reviews_exclusive(parks_data, ratings)
+    else:
+        match_table = match_reviews_buffer(parks_data, ratings)
+    match_table = match_table[["review_id", "park_id", "match_type", "score"]]
+
+    with open(cache_path, "w") as f:
+        json.dump({"key": key, "matches": match_table.to_dict(orient="list")}, f)
+
+    return match_table
+
+
+##############################
+# Nearest-park metrics
+##############################
+
+
+def park_rating_masks(parks_data, parks_dict):
+    """
+    Precompute boolean masks over the parks data for the rating filters used
+    by the nearest-park metrics.
+
+    Args:
+        parks_data (geopandas dataframe): parks data
+        parks_dict (dict): dictionary containing park values (NamedTuples)
+
+    Returns: dictionary mapping filter name to a boolean array aligned with
+    the rows of parks_data.
+    """
+    ratings = np.array(
+        [parks_dict[park_id].rating for park_id in parks_data["id"]], dtype=float
+    )
+
+    return {
+        "all": np.ones(len(parks_data), dtype=bool),
+        "min_rating": ratings >= NEAREST_MIN_RATING,
+    }
+
+
+def park_distance_pairs(points, parks_metric, search_radius):
+    """
+    Find all (point, park) pairs within a search radius with a single bulk
+    query over the parks' spatial index.
+
+    Args:
+        points (geopandas GeoSeries): points in the metric CRS
+        parks_metric (geopandas dataframe): parks data in the metric CRS
+        search_radius (float): search radius in meters
+
+    Returns: tuple of arrays (point positions, park positions, distances).
+    """
+    point_idx, park_idx = parks_metric.sindex.query(
+        points.values, predicate="dwithin", distance=search_radius
+    )
+    distances = shapely.distance(
+        points.values[point_idx], parks_metric.geometry.values[park_idx]
+    )
+
+    return (point_idx, park_idx, np.asarray(distances, dtype=float))
+
+
+def k_nearest_from_pairs(point_idx, park_idx, distances, mask, n_points, k):
+    """
+    Reduce (point, park, distance) pairs to the k smallest distances per point,
+    keeping only parks selected by mask.
+
+    Args:
+        point_idx, park_idx, distances (arrays): candidate pairs
+        mask (array): boolean mask over parks
+        n_points (int): number of points
+        k (int): number of nearest parks to keep
+
+    Returns: array of shape (n_points, k), NaN where a point has fewer than k
+    candidate parks.
+    """
+    keep = mask[park_idx]
+    point_idx, distances = point_idx[keep], distances[keep]
+
+    # sort pairs by point, then distance, and rank parks within each point
+    order = np.lexsort((distances, point_idx))
+    point_idx, distances = point_idx[order], distances[order]
+    rank = np.arange(len(point_idx)) - np.searchsorted(point_idx, point_idx)
+
+    nearest = np.full((n_points, k), np.nan)
+    within_k = rank < k
+    nearest[point_idx[within_k], rank[within_k]] = distances[within_k]
+
+    return nearest
+
+
+def nearest_park_distances(points, parks_metric, mask, k, pairs, search_radius):
+    """
+    Distances (meters) from each point to its k nearest parks selected by mask.
+    Starts from the shared candidate pairs and only re-queries points that
+    have fewer than k parks in range, doubling the search radius each time.
+
+    Args:
+        points (geopandas GeoSeries): points in the metric CRS
+        parks_metric (geopandas dataframe): parks data in the metric CRS
+        mask (array): boolean mask over parks
+        k (int): number of nearest parks
+        pairs (tuple): candidate pairs from park_distance_pairs
+        search_radius (float): radius used to build pairs
+
+    Returns: array of shape (len(points), k).
+    """
+    nearest = k_nearest_from_pairs(*pairs, mask, len(points), k)
+
+    # stop expanding once the radius spans the full extent of the data
+    bounds = np.vstack([points.total_bounds, parks_metric.total_bounds])
+    minx, miny = bounds[:, :2].min(axis=0)
+    maxx, maxy = bounds[:, 2:].max(axis=0)
+    max_radius = np.hypot(maxx - minx, maxy - miny)
+    incomplete = np.flatnonzero(np.isnan(nearest[:, -1]))
+
+    while len(incomplete) > 0 and mask.sum() >= k and search_radius < max_radius:
+        search_radius *= 2
+        point_idx, park_idx, distances = park_distance_pairs(
+            points.iloc[incomplete], parks_metric, search_radius
+        )
+        nearest[incomplete] = k_nearest_from_pairs(
+            point_idx, park_idx, distances, mask, len(incomplete), k
+        )
+        incomplete = incomplete[np.isnan(nearest[incomplete, -1])]
+
+    return nearest
+
+
+def nearest_park_metrics(housing, parks_data, parks_dict):
+    """
+    Compute the distance to the nearest park rated at least NEAREST_MIN_RATING
+    and the mean distance to the K_NEAREST nearest parks for every point.
+
+    Args:
+        housing (geopandas dataframe): affordable housing data or grid points
+        parks_data (geopandas dataframe): parks data
+        parks_dict (dict): dictionary containing park values (NamedTuples)
+
+    Returns: tuple of arrays (nearest rated park distance, mean k-nearest
+    distance), aligned with the rows of housing.
+    """
+    points = housing.geometry.to_crs(epsg=METRIC_CRS)
+    parks_metric = parks_data.to_crs(epsg=METRIC_CRS)
+    masks = park_rating_masks(parks_data, parks_dict)
+
+    pairs = park_distance_pairs(points, parks_metric, NEAREST_SEARCH_RADIUS)
+
+    nearest_rated = nearest_park_distances(
+        points, parks_metric, masks["min_rating"], 1, pairs, NEAREST_SEARCH_RADIUS
+    )
+    k_nearest = nearest_park_distances(
+        points, parks_metric, masks["all"], K_NEAREST, pairs, NEAREST_SEARCH_RADIUS
+    )
+
+    return (nearest_rated[:, 0], k_nearest.mean(axis=1))
+
+
 def calculate_index(polygon_list, parks_dict):
     """
     Calculate size and rating indexes for each housing unit.
@@ -240,21 +825,16 @@ def calculate_index(polygon_list, parks_dict):
     return (size_index, rating_index)
 
 
-def create_house_tuple(buffered_point, parks_dict, parks_data):
+def house_tuple_from_parks(polygon_id_list, parks_dict):
     """
-    Create NamedTuple for each housing unit.
+    Create NamedTuple for a housing unit from the parks it can access.
 
     Args:
-        buffered_point (Polygon): buffered radius around housing unit
-        housing (geopandas dataframe): affordable housing data
-        parks_data (geopandas dataframe): parks data
+        polygon_id_list (lst): list of accessible park ids
+        parks_dict (dict): dictionary containing park values (NamedTuples)
 
     Returns: NamedTuple of housing unit with index values.
     """
-    parks_buffer_count, polygon_id_list = park_walking_distance(
-        buffered_point, parks_data
-    )
-
     # check that polygon_list is not empty before proceeding
     if len(polygon_id_list) == 0:
         house_tuple = HousingTuple(park_count=0, size_index=0, rating_index=0)
@@ -262,18 +842,247 @@ def create_house_tuple(buffered_point, parks_dict, parks_data):
         # gather park tuples that fall within radius
         size_ix, rating_ix = calculate_index(polygon_id_list, parks_dict)
         house_tuple = HousingTuple(
-            park_count=parks_buffer_count, size_index=size_ix, rating_index=rating_ix
+            park_count=len(polygon_id_list), size_index=size_ix, rating_index=rating_ix
         )
 
     return house_tuple
 
 
+def create_house_tuple(buffered_point, parks_dict, parks_data, park_index=None):
+    """
+    Create NamedTuple for each housing unit.
+
+    Args:
+        buffered_point (Polygon): buffered radius around housing unit
+        housing (geopandas dataframe): affordable housing data
+        parks_data (geopandas dataframe): parks data
+        park_index (ParkIndex): optional precomputed park index
+
+    Returns: NamedTuple of housing unit with index values.
+    """
+    _, polygon_id_list = park_walking_distance(buffered_point, parks_data, park_index)
+
+    return house_tuple_from_parks(polygon_id_list, parks_dict)
+
+
+##############################
+# Park access by boundary and entrance distance
+##############################
+
+
+def assign_entrances_to_parks(entrances_metric, parks_metric):
+    """
+    Snap entrance points to the parks whose boundary lies within
+    ENTRANCE_SNAP_DISTANCE of them. An entrance on a shared boundary is
+    assigned to every park it touches.
+
+    Args:
+        entrances_metric (geopandas GeoSeries): entrance points in the metric CRS
+        parks_metric (geopandas dataframe): parks data in the metric CRS
+
+    Returns: tuple of arrays (entrance positions, park positions).
+    """
+    entrance_idx, park_idx = parks_metric.sindex.query(
+        entrances_metric.values, predicate="dwithin", distance=ENTRANCE_SNAP_DISTANCE
+    )
+    return (entrance_idx, park_idx)
+
+
+def min_distance_per_pair(point_idx, park_idx, distances, n_parks):
+    """
+    Collapse repeated (point, park) pairs to the smallest distance.
+
+    Returns: tuple of arrays (point positions, park positions, distances).
+    """
+    pair_key = point_idx.astype(np.int64) * n_parks + park_idx
+    order = np.lexsort((distances, pair_key))
+    pair_key, distances = pair_key[order], distances[order]
+    # np.r_[True, ...] would keep a first pair even when there are none
+    first = np.ones(len(pair_key), dtype=bool)
+    first[1:] = pair_key[1:] != pair_key[:-1]
+
+    return (pair_key[first] // n_parks, pair_key[first] % n_parks, distances[first])
+
+
+def park_access_pairs(housing, parks_data, distance, access_mode, entrances=None):
+    """
+    Find all (housing unit, park) pairs within walking distance in one bulk
+    query, measuring distance either to the park boundary or to its entrances.
+
+    In "boundary" mode the distance is measured to the park polygon (zero for
+    points inside a park). In "entrance" mode it is measured to the nearest
+    entrance of each park; parks without any known entrance fall back to the
+    boundary distance.
+
+    Args:
+        housing (geopandas dataframe): affordable housing data or grid points
+        parks_data (geopandas dataframe): parks data
+        distance (int): walking distance (meters)
+        access_mode (str): "boundary" or "entrance"
+        entrances (geopandas dataframe): entrance points, required for
+            "entrance" mode
+
+    Returns: tuple of arrays (housing positions, park positions, distances)
+    sorted by housing position.
+    """
+    points = housing.geometry.to_crs(epsg=METRIC_CRS)
+    parks_metric = parks_data.to_crs(epsg=METRIC_CRS)
+    n_parks = len(parks_metric)
+
+    point_idx, park_idx, distances = park_distance_pairs(
+        points, parks_metric, distance
+    )
+
+    if access_mode == "entrance":
+        if entrances is None:
+            raise ValueError("entrance access mode requires entrance points")
+
+        entrances_metric = entrances.geometry.to_crs(epsg=METRIC_CRS)
+        entrance_idx, entrance_park_idx = assign_entrances_to_parks(
+            entrances_metric, parks_metric
+        )
+
+        # keep boundary distances only for parks that have no entrance
+        has_entrance = np.zeros(n_parks, dtype=bool)
+        has_entrance[entrance_park_idx] = True
+        keep = ~has_entrance[park_idx]
+        point_idx, park_idx, distances = (
+            point_idx[keep], park_idx[keep], distances[keep]
+        )
+
+        # (point, entrance) pairs within walking distance
+        near_point_idx, near_entrance_idx = entrances_metric.sindex.query(
+            points.values, predicate="dwithin", distance=distance
+        )
+        near_distances = shapely.distance(
+            points.values[near_point_idx], entrances_metric.values[near_entrance_idx]
+        )
+
+        # expand each (point, entrance) pair to the parks of that entrance
+        order = np.argsort(entrance_idx, kind="stable")
+        entrance_idx, entrance_park_idx = entrance_idx[order], entrance_park_idx[order]
+        starts = np.searchsorted(entrance_idx, near_entrance_idx, side="left")
+        counts = np.searchsorted(entrance_idx, near_entrance_idx, side="right") - starts
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        point_idx = np.concatenate([point_idx, np.repeat(near_point_idx, counts)])
+        park_idx = np.concatenate(
+            [park_idx, entrance_park_idx[np.repeat(starts, counts) + offsets]]
+        )
+        distances = np.concatenate([distances, np.repeat(near_distances, counts)])
+
+    elif access_mode != "boundary":
+        raise ValueError(f"Unknown access mode: {access_mode}")
+
+    return min_distance_per_pair(point_idx, park_idx, distances, n_parks)
+
+
+##############################
+# Approximate engine with park circles
+##############################
+
+
+def park_circles(parks_data):
+    """
+    Reduce each park to its centroid and three radii (meters): the equivalent
+    radius of a circle with the same area, an inner radius (signed distance
+    from the centroid to the park boundary, negative if the centroid lies
+    outside the park) and an outer radius (distance to the farthest vertex).
+
+    Args:
+        parks_data (geopandas dataframe): parks data
+
+    Returns: tuple of arrays (centers, equivalent radii, inner radii, outer radii).
+    """
+    geometries = parks_data.geometry.to_crs(epsg=METRIC_CRS).values
+    centroids = shapely.centroid(geometries)
+    centers = shapely.get_coordinates(centroids)
+
+    equivalent = np.sqrt(shapely.area(geometries) / np.pi)
+
+    coords, owner = shapely.get_coordinates(geometries, return_index=True)
+    outer = np.zeros(len(geometries))
+    np.maximum.at(outer, owner, np.hypot(*(coords - centers[owner]).T))
+
+    inner = np.where(
+        shapely.within(centroids, geometries),
+        shapely.distance(centroids, shapely.boundary(geometries)),
+        -shapely.distance(centroids, geometries),
+    )
+
+    return (centers, equivalent, inner, outer)
+
+
+def approximate_index(housing, parks_data, parks_dict, distance):
+    """
+    Approximate park_count, size_index and rating_index with park circles.
+    A park counts for a point when the point is within distance plus the
+    park's equivalent radius of its centroid. Radius queries run on a NumPy
+    KD-tree over the park centroids.
+
+    The error bound sums the parks whose exact result is undecided by the
+    circles: within distance plus the outer radius of the centroid but not
+    within distance plus the inner radius. Only these parks can differ from
+    the exact park_walking_distance result.
+
+    Args:
+        housing (geopandas dataframe): affordable housing data or grid points
+        parks_data (geopandas dataframe): parks data
+        parks_dict (dict): dictionary containing park values (NamedTuples)
+        distance (int): walking distance (meters)
+
+    Returns: dictionary of arrays aligned with housing: park_count,
+    size_index, rating_index and their error bounds count_error, size_error,
+    rating_error.
+    """
+    centers, equivalent, inner, outer = park_circles(parks_data)
+    area = np.array([parks_dict[park_id].area for park_id in parks_data["id"]])
+    rating = np.array([parks_dict[park_id].rating for park_id in parks_data["id"]])
+
+    tree = build_kdtree(centers, outer + APPROX_SLACK)
+    points = shapely.get_coordinates(housing.geometry.to_crs(epsg=METRIC_CRS).values)
+    point_idx, park_idx, center_dist = query_radius(tree, points, distance)
+
+    approx_in = center_dist <= distance + equivalent[park_idx]
+    uncertain = center_dist > distance + inner[park_idx] - APPROX_SLACK
+
+    n_points = len(housing)
+    weights = {
+        "count": np.ones(len(park_idx)),
+        "size": area[park_idx],
+        "rating": area[park_idx] * rating[park_idx],
+    }
+
+    results = {}
+    for name, values in weights.items():
+        index_name = "park_count" if name == "count" else f"{name}_index"
+        results[index_name] = np.bincount(
+            point_idx, weights=values * approx_in, minlength=n_points
+        )
+        results[f"{name}_error"] = np.bincount(
+            point_idx, weights=values * uncertain, minlength=n_points
+        )
+
+    return results
+
+
 ##############################
 # Create housing dataframe with indexes
 ##############################
 
 
-def create_housing_df(housing, parks_dict, distance, parks_data, ratings):
+def create_housing_df(
+    housing,
+    parks_dict,
+    distance,
+    parks_data,
+    ratings,
+    access_mode="buffer",
+    entrances=None,
+    park_index=None,
+    engine="exact",
+    tolerance=APPROX_TOLERANCE,
+):
     """
     Create updated housing dataframe with index columns.
 
@@ -282,20 +1091,88 @@ def create_housing_df(housing, parks_dict, distance, parks_data, ratings):
         parks_dict (dict): dictionary containing park values (NamedTuples)
         distance (int): specifies buffer distnace (meters) from housing unit
         parks_data (geopandas dataframe): parks data
+        access_mode (str): "buffer" counts parks touched by the buffer,
+            "boundary" and "entrance" measure distance to the park boundary or
+            to its entrances (see park_access_pairs)
+        entrances (geopandas dataframe): entrance points for "entrance" mode
+        park_index (ParkIndex): park index for "buffer" mode, built from
+            parks_data if not given
+        engine (str): "exact", or "approximate" to score with park circles
+            (see approximate_index) and only re-check exactly the points where
+            the relative error bound of any index exceeds tolerance
+        tolerance (float): relative error tolerance for "approximate"
 
     Returns: geopandas dataframe of housing data with indexes.
     """
     # apply buffer to entire GeoDataFrame
     housing_with_index = create_buffer(housing, distance)
 
-    for idx, row in housing_with_index.iterrows():
-        buffered_point = row["geometry"]
-        house_tuple = create_house_tuple(buffered_point, parks_dict, parks_data)
+    if engine == "approximate":
+        if access_mode != "buffer":
+            raise ValueError("approximate engine only supports buffer access")
+
+        approx = approximate_index(housing, parks_data, parks_dict, distance)
+        # unrated parks add no rating error, so every index is bounded
+        recheck = (
+            (approx["count_error"] > tolerance * approx["park_count"])
+            | (approx["size_error"] > tolerance * approx["size_index"])
+            | (approx["rating_error"] > tolerance * approx["rating_index"])
+        )
+    elif engine != "exact":
+        raise ValueError(f"Unknown engine: {engine}")
 
-        housing_with_index.at[idx, "id"] = idx + 1  # Assign unique ID
-        housing_with_index.at[idx, "park_count"] = house_tuple.park_count
-        housing_with_index.at[idx, "size_index"] = house_tuple.size_index
-        housing_with_index.at[idx, "rating_index"] = house_tuple.rating_index
+    if access_mode != "buffer":
+        # group accessible park ids by housing position
+        point_idx, park_idx, _ = park_access_pairs(
+            housing, parks_data, distance, access_mode, entrances
+        )
+        park_ids = parks_data["id"].to_numpy()[park_idx]
+        splits = np.searchsorted(point_idx, np.arange(1, len(housing)))
+        accessible_parks = np.split(park_ids, splits)
+    elif park_index is None:
+        park_index = create_park_index(parks_data)
+
+    if engine == "approximate":
+        house_tuples = list(
+            zip(approx["park_count"], approx["size_index"], approx["rating_index"])
+        )
+        positions = np.flatnonzero(recheck)
+    else:
+        house_tuples = [None] * len(housing_with_index)
+        positions = range(len(housing_with_index))
+
+    for position in positions:
+        if access_mode == "buffer":
+            buffered_point = housing_with_index.geometry.iloc[position]
+            house_tuples[position] = create_house_tuple(
+                buffered_point, parks_dict, parks_data, park_index
+            )
+        else:
+            house_tuples[position] = house_tuple_from_parks(
+                accessible_parks[position], parks_dict
+            )
+
+    park_count, size_index, rating_index = np.array(
+        house_tuples, dtype=float
+    ).reshape(-1, 3).T
+    housing_with_index["id"] = housing_with_index.index + 1.0  # Assign unique ID
+    housing_with_index["park_count"] = park_count
+    housing_with_index["size_index"] = size_index
+    housing_with_index["rating_index"] = rating_index
+
+    # re-checked points are exact
+    if engine == "approximate":
+        for index_name, error_name in APPROX_ERRORS.items():
+            housing_with_index[f"{index_name}_error"] = np.where(
+                recheck, 0, approx[error_name]
+            )
+
+    # nearest-park metrics are computed in bulk for all units at once
+    nearest_rated_dist, mean_k_nearest_dist = nearest_park_metrics(
+        housing, parks_data, parks_dict
+    )
+    housing_with_index["nearest_rated_park_dist"] = nearest_rated_dist
+    housing_with_index["mean_k_nearest_dist"] = mean_k_nearest_dist
 
     return housing_with_index
 
@@ -322,7 +1199,19 @@ def calc_norm_values(housing):
 ##############################
 
 
-def create_housing_file(housing, distance, parks_data, ratings, file_name):
+def create_housing_file(
+    housing,
+    distance,
+    parks_data,
+    ratings,
+    file_name,
+    access_mode="buffer",
+    entrances=None,
+    match_table=None,
+    park_index=None,
+    engine="exact",
+    tolerance=APPROX_TOLERANCE,
+):
     """
     Create housing GeoJSON file with indexes.
 
@@ -330,13 +1219,28 @@ def create_housing_file(housing, distance, parks_data, ratings, file_name):
         housing (geopandas dataframe): affordable housing data
         distance (int): specifies buffer distnace (meters) from housing unit
         parks_data (geopandas dataframe): parks data
+        access_mode (str): "buffer", "boundary" or "entrance"
+        entrances (geopandas dataframe): entrance points for "entrance" mode
+        match_table (pandas dataframe): optional review to park match table
+        park_index (ParkIndex): optional precomputed park index
+        engine (str): "exact" or "approximate" (see create_housing_df)
+        tolerance (float): relative error tolerance for "approximate"
 
     Returns: outputs GeoJSON file to "data" folder.
     """
     # Create parks dictionary & updated housing dataframe
-    parks_dict = create_parks_dict(parks_data, ratings)
+    parks_dict = create_parks_dict(parks_data, ratings, match_table)
     housing_with_index = create_housing_df(
-        housing, parks_dict, distance, parks_data, ratings
+        housing,
+        parks_dict,
+        distance,
+        parks_data,
+        ratings,
+        access_mode,
+        entrances,
+        park_index,
+        engine,
+        tolerance,
     )
 
     # retrieve values to normalize indexes
@@ -347,6 +1251,13 @@ def create_housing_file(housing, distance, parks_data, ratings, file_name):
         avg_rating
     )
 
+    # distances are NaN where no qualifying park exists, written as JSON null
+    distance_columns = ["nearest_rated_park_dist", "mean_k_nearest_dist"]
+    distances = housing_with_index[distance_columns]
+    housing_with_index[distance_columns] = distances.astype(object).where(
+        distances.notna(), None
+    )
+
     # Create geoJSON dictionary
     geojson_dict = {"type": "FeatureCollection", "features": []}
 
@@ -364,10 +1275,22 @@ def create_housing_file(housing, distance, parks_data, ratings, file_name):
                 # Normalize index values on a scale of 1 to 100
                 "size_index": 100 * (row["size_index"] / max_size),
                 "rating_index": 100 * (row["rating_index"] / max_rating),
+                # distances in meters, None if no qualifying park exists
+                "nearest_rated_park_dist": row["nearest_rated_park_dist"],
+                "mean_k_nearest_dist": row["mean_k_nearest_dist"],
                 "latitude": row["Latitude"],
                 "longitude": row["Longitude"],
             },
         }
+        if engine == "approximate":
+            # error bounds on the park count and the normalized indexes
+            feature["properties"]["park_count_error"] = row["park_count_error"]
+            feature["properties"]["size_index_error"] = 100 * (
+                row["size_index_error"] / max_size
+            )
+            feature["properties"]["rating_index_error"] = 100 * (
+                row["rating_index_error"] / max_rating
+            )
         geojson_dict["features"].append(feature)
 
     # Save to a GeoJSON file
@@ -375,15 +1298,41 @@ def create_housing_file(housing, distance, parks_data, ratings, file_name):
         json.dump(geojson_dict, f, indent=4)
 
 
-def main(): 
+def main(access_mode="buffer", review_assignment="buffer", city=CHICAGO, engine="exact"):
     # Import data
-    parks = gpd.read_file(DATA_DIR / "cleaned_park_polygons.geojson")
-    housing = gpd.read_file(DATA_DIR / "housing.geojson")
-    ratings = gpd.read_file(REVIEW_DIR / "combined_reviews_buffered_250.geojson")
+    data_dir = city.data_dir
+    review_dir = data_dir / REVIEW_DIR.name
+    parks_path = data_dir / "cleaned_park_polygons.geojson"
+    parks = gpd.read_file(parks_path)
+    park_index = load_park_index(parks, parks_path)
+    housing = gpd.read_file(data_dir / "housing.geojson")
+    reviews_path = ratings_path(review_dir)
+    ratings = load_ratings(review_dir)
+
+    entrances = None
+    if access_mode == "entrance":
+        entrances = gpd.read_file(data_dir / "park_entrances.geojson")
+
+    # Match reviews to parks, reusing the saved match table when the parks
+    # and reviews are unchanged
+    match_table = load_match_table(
+        parks, ratings, parks_path, reviews_path, review_assignment
+    )
 
     # Create housing file
-    path = DATA_DIR / "housing_data_index.geojson"
-    create_housing_file(housing, 1000, parks, ratings, path)
+    path = data_dir / "housing_data_index.geojson"
+    create_housing_file(
+        housing,
+        1000,
+        parks,
+        ratings,
+        path,
+        access_mode,
+        entrances,
+        match_table,
+        park_index,
+        engine,
+    )
     
 if __name__ == "__main__":
     main()
\ No newline at end of file
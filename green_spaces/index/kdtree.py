@@ -0,0 +1,162 @@
+import numpy as np
+from typing import NamedTuple
+
+# maximum number of circles stored in a leaf node
+LEAF_SIZE = 16
+
+# number of query points traversed together, bounds memory use of the frontier
+QUERY_CHUNK = 200_000
+
+
+class KDTree(NamedTuple):
+    centers: np.ndarray  # (n, 2) circle centers in tree order
+    radii: np.ndarray  # circle radius for each center, in tree order
+    order: np.ndarray  # original position of each center
+    node_lo: np.ndarray  # (n_nodes, 2) lower corner of the node's bounding box
+    node_hi: np.ndarray  # (n_nodes, 2) upper corner of the node's bounding box
+    node_start: np.ndarray  # first position of the node's centers
+    node_end: np.ndarray  # one past the last position of the node's centers
+    node_left: np.ndarray  # left child, -1 for leaves
+    node_right: np.ndarray  # right child, -1 for leaves
+
+
+def build_kdtree(centers, radii):
+    """
+    Build a KD-tree over circles (center plus radius) using NumPy only.
+    Each node stores the bounding box of the circles below it, so radius
+    queries account for the circle extent and not only its center.
+
+    Args:
+        centers (array): (n, 2) circle centers
+        radii (array): circle radii
+
+    Returns: KDTree
+    """
+    centers = np.asarray(centers, dtype=float)
+    radii = np.asarray(radii, dtype=float)
+    order = np.arange(len(centers))
+
+    node_start, node_end, node_left, node_right = [], [], [], []
+    stack = [(0, 0, len(centers))]
+    node_start.append(0)
+    node_end.append(len(centers))
+    node_left.append(-1)
+    node_right.append(-1)
+
+    while stack:
+        node, start, end = stack.pop()
+        if end - start <= LEAF_SIZE:
+            continue
+
+        # split at the median along the axis with the largest spread
+        segment = order[start:end]
+        axis = np.argmax(np.ptp(centers[segment], axis=0))
+        mid = (end - start) // 2
+        split = np.argpartition(centers[segment, axis], mid)
+        order[start:end] = segment[split]
+
+        for child_start, child_end in ((start, start + mid), (start + mid, end)):
+            child = len(node_start)
+            node_start.append(child_start)
+            node_end.append(child_end)
+            node_left.append(-1)
+            node_right.append(-1)
+            if child_start == start:
+                node_left[node] = child
+            else:
+                node_right[node] = child
+            stack.append((child, child_start, child_end))
+
+    centers, radii = centers[order], radii[order]
+    node_start, node_end = np.array(node_start), np.array(node_end)
+
+    # bounding box of the circles in each node's range
+    lo = centers - radii[:, None]
+    hi = centers + radii[:, None]
+    node_lo = np.array([lo[s:e].min(axis=0) for s, e in zip(node_start, node_end)])
+    node_hi = np.array([hi[s:e].max(axis=0) for s, e in zip(node_start, node_end)])
+
+    return KDTree(
+        centers=centers,
+        radii=radii,
+        order=order,
+        node_lo=node_lo.reshape(-1, 2),
+        node_hi=node_hi.reshape(-1, 2),
+        node_start=node_start,
+        node_end=node_end,
+        node_left=np.array(node_left),
+        node_right=np.array(node_right),
+    )
+
+
+def query_radius(tree, points, distance):
+    """
+    Find all (point, circle) pairs where the point lies within distance of
+    the circle, i.e. |point - center| <= distance + radius.
+
+    The tree is traversed for all points at once: the frontier is an array
+    of (point, node) pairs that is pruned by bounding box distance and
+    expanded to child nodes level by level.
+
+    Args:
+        tree (KDTree): tree built by build_kdtree
+        points (array): (m, 2) query points
+        distance (float): query distance
+
+    Returns: tuple of arrays (point positions, original circle positions,
+    center distances), sorted by point position.
+    """
+    points = np.asarray(points, dtype=float)
+    results = []
+
+    for chunk_start in range(0, len(points), QUERY_CHUNK):
+        chunk = points[chunk_start : chunk_start + QUERY_CHUNK]
+        point_idx = np.arange(len(chunk))
+        node_idx = np.zeros(len(chunk), dtype=int)
+
+        while len(point_idx) > 0:
+            # prune pairs whose node bounding box is out of reach
+            gap = np.maximum(
+                0,
+                np.maximum(
+                    tree.node_lo[node_idx] - chunk[point_idx],
+                    chunk[point_idx] - tree.node_hi[node_idx],
+                ),
+            )
+            reachable = np.hypot(gap[:, 0], gap[:, 1]) <= distance
+            point_idx, node_idx = point_idx[reachable], node_idx[reachable]
+
+            is_leaf = tree.node_left[node_idx] < 0
+
+            # test every circle in the reachable leaves
+            leaf_points, leaf_nodes = point_idx[is_leaf], node_idx[is_leaf]
+            counts = tree.node_end[leaf_nodes] - tree.node_start[leaf_nodes]
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            pair_points = np.repeat(leaf_points, counts)
+            pair_circles = np.repeat(tree.node_start[leaf_nodes], counts) + offsets
+            center_dist = np.hypot(
+                *(chunk[pair_points] - tree.centers[pair_circles]).T
+            )
+            hit = center_dist <= distance + tree.radii[pair_circles]
+            results.append(
+                (
+                    pair_points[hit] + chunk_start,
+                    tree.order[pair_circles[hit]],
+                    center_dist[hit],
+                )
+            )
+
+            # descend into both children of internal nodes
+            inner_points, inner_nodes = point_idx[~is_leaf], node_idx[~is_leaf]
+            point_idx = np.concatenate([inner_points, inner_points])
+            node_idx = np.concatenate(
+                [tree.node_left[inner_nodes], tree.node_right[inner_nodes]]
+            )
+
+    if not results:
+        return (np.array([], dtype=int), np.array([], dtype=int), np.array([]))
+
+    point_idx, circle_idx, center_dist = (np.concatenate(r) for r in zip(*results))
+    order = np.lexsort((circle_idx, point_idx))
+
+    return (point_idx[order], circle_idx[order], center_dist[order])
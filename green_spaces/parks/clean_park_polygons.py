@@ -1,18 +1,35 @@
+import hashlib
 import json
+import numpy as np
+import shapely
+from concurrent.futures import ProcessPoolExecutor
 from shapely.geometry import shape
 from shapely.ops import unary_union
-import networkx as nx
+from shapely.strtree import STRtree
 from pathlib import Path
-import random
-
-random.seed(2024)
+from .geojson_stream import iter_features, write_features
+from green_spaces.clusters import find_clusters
+from green_spaces.config import CHICAGO
 
 DATA_DIR = Path(__file__).parent.parent.parent / "data"
 
+# Containment tolerances for intersecting named parks: a park counts as
+# contained when at least (1 - AREA_TOLERANCE) of its area overlaps the other
+# park, or, with the "hausdorff" method, when both parks snapped to
+# SNAP_GRID_SIZE are within HAUSDORFF_TOLERANCE of each other (in degrees)
+AREA_TOLERANCE = 0.01
+HAUSDORFF_TOLERANCE = 1e-5
+SNAP_GRID_SIZE = 1e-6
+
+# clusters with at least this many unnamed parks are merged in worker processes
+PARALLEL_CLUSTER_SIZE = 50
+
 
 def load_geojson(filepath):
     """
     Loads GeoJSON data from a file and returns the list of park features.
+    Features are parsed one at a time so the raw file text is never held in
+    memory alongside them.
 
     Args:
         filepath (str): Path to the GeoJSON file
@@ -20,11 +37,7 @@ def load_geojson(filepath):
     Returns:
         list: A list of GeoJSON features.
     """
-    with open(filepath, "r") as f:
-        data = json.load(f)
-        features = data["features"]
-
-    return features
+    return list(iter_features(filepath))
 
 
 def standardize_unnamed_parks(features):
@@ -61,54 +74,113 @@ def get_feature_info(feature):
     return id, name, geom
 
 
-def handle_intersecting_parks(features):
+def parse_geometries(features):
+    """
+    Parse the geometry of every feature once.
+
+    Args:
+        features (list): List of GeoJSON features
+
+    Returns:
+        numpy array: Shapely geometries aligned with features
+    """
+    return np.array([shape(feature["geometry"]) for feature in features])
+
+
+def intersecting_pairs(geometries):
+    """
+    Find all pairs of intersecting (but not identical) geometries with a bulk
+    spatial index query instead of comparing every pair.
+
+    Args:
+        geometries (numpy array): Shapely geometries
+
+    Returns:
+        tuple: Arrays of positions (i, j) with i < j, sorted by i then j
+    """
+    tree = STRtree(geometries)
+    left, right = tree.query(geometries, predicate="intersects")
+
+    # each pair is found from both sides, keep it once
+    keep = left < right
+    left, right = left[keep], right[keep]
+    order = np.lexsort((right, left))
+    left, right = left[order], right[order]
+
+    not_equal = ~shapely.equals(geometries[left], geometries[right])
+
+    return left[not_equal], right[not_equal]
+
+
+def handle_intersecting_parks(features, geometries=None):
     """
     The function manages intersecting parks in three ways:
 
-    - If an unnamed park intersects with another unnamed park, these parks
-    are added as related nodes to an undirected intersection graph, which will
-    later be used to merge these parks.
+    - If an unnamed park intersects with another unnamed park, the pair of
+    park IDs is added to the unnamed_edges list, which will later be used to
+    cluster and merge these parks.
     - If an unnamed park intersects with a named park, the unnamed park is added
     to the unnameds_to_remove return list to be used for later removal.
     - If two named parks intersect, these parks will be added as a tuple to the
     check_containment_parks list, which will later be used to check if one of
     these parks are fully contained within the other.
 
+    Intersecting pairs come from a single spatial index query over the parsed
+    geometries rather than comparing every pair of parks.
+
     Args:
         features (list): List of GeoJSON features
+        geometries (numpy array): Parsed feature geometries (optional)
 
     Returns:
-        NetworkX Graph: Graph of unnamed park intersections
+        list: list of intersecting unnamed park ID pairs
         list: list of unnamed park IDs to remove
         list: list of intersecting named park pairs for containment checks.
     """
-    # initialize empty undirected graph
-    G = nx.Graph()
+    if geometries is None:
+        geometries = parse_geometries(features)
+
+    ids = [feature["properties"].get("id") for feature in features]
+    unnamed = np.array(
+        [feature["properties"].get("name") == "Unnamed Park" for feature in features],
+        dtype=bool,
+    )
+
+    unnamed_edges = []
     unnameds_to_remove = []
     check_containment_parks = []
 
-    # for each pair of parks, check if their geometries intersect (but aren't identical)
-    for i, feature1 in enumerate(features):
-        id1, name1, geom1 = get_feature_info(feature1)
+    for i, j in zip(*intersecting_pairs(geometries)):
+        # if we have two unnamed intersecting parks, add edge
+        if unnamed[i] and unnamed[j]:
+            unnamed_edges.append((ids[i], ids[j]))
+        # if unnamed park intersects with named park, remove unnamed park
+        elif unnamed[i]:
+            unnameds_to_remove.append(ids[i])
+        # if unnamed park intersects with named park, remove unnamed park
+        elif unnamed[j]:
+            unnameds_to_remove.append(ids[j])
+        # if two named parks intersect, add to list to check for containment
+        else:
+            check_containment_parks.append((features[i], features[j]))
 
-        for feature2 in features[i + 1 :]:  # to avoid duplicate checks
-            id2, name2, geom2 = get_feature_info(feature2)
+    return unnamed_edges, unnameds_to_remove, check_containment_parks
 
-            if geom1.intersects(geom2) and not geom1.equals(geom2):
-                # if we have two unnamed intersecting parks, add edge
-                if name1 == "Unnamed Park" and name2 == "Unnamed Park":
-                    G.add_edge(id1, id2)
-                # if unnamed park intersects with named park, remove unnamed park
-                elif name1 == "Unnamed Park" and name2 != "Unnamed Park":
-                    unnameds_to_remove.append(id1)
-                # if unnamed park intersects with named park, remove unnamed park
-                elif name1 != "Unnamed Park" and name2 == "Unnamed Park":
-                    unnameds_to_remove.append(id2)
-                # if two named parks intersect, add to list to check for containment
-                elif name1 != "Unnamed Park" and name2 != "Unnamed Park":
-                    check_containment_parks.append((feature1, feature2))
 
-    return G, unnameds_to_remove, check_containment_parks
+def merged_park_id(member_ids):
+    """
+    Derive a deterministic id for a merged park from the OSM ids of its
+    members. The "merged-" prefix keeps it from colliding with OSM ids.
+
+    Args:
+        member_ids (list): IDs of the parks merged together
+
+    Returns:
+        str: Merged park id
+    """
+    # OSM ids may be integers, e.g. from the PBF backend or osmnx 2.x
+    digest = hashlib.sha1(",".join(sorted(map(str, member_ids))).encode()).hexdigest()
+    return "merged-" + digest[:16]
 
 
 def create_merged_feature(geometry, merged_id):
@@ -117,7 +189,7 @@ def create_merged_feature(geometry, merged_id):
 
     Args:
         geometry (shapely.geometry): Merged geometry object.
-        int: randomly assigned id for new merged feature
+        str: id for new merged feature (see merged_park_id)
 
     Returns:
         dict: A new GeoJSON feature representing the merged park.
@@ -138,157 +210,274 @@ def create_merged_feature(geometry, merged_id):
     # representation of the geometry in GeoJSON format.
 
 
-def check_park_containment(check_containment_parks):
+def check_park_containment(
+    check_containment_parks, geometries_by_id=None, method="area"
+):
     """
     This function checks all intersecting named parks to see if either geometry
     is fully contained within the other. If one is, it is added to a list of
     parks to remove from the cleaned data.
 
-    The list of named_parks_to_remove is initialized with a set of park ids that
-    should be removed but wouldn't be captured by this cleaning function due to
-    miniscule differences in their boundary coordinates. This function handles
-    the removal of those parks manually.
+    Parks that are near-duplicates with minuscule differences in their boundary
+    coordinates are caught with a tolerance, which is checked for all pairs at
+    once:
+
+    - "area": a park is contained if at least (1 - AREA_TOLERANCE) of its area
+    overlaps the other park.
+    - "hausdorff": both parks are snapped to a SNAP_GRID_SIZE precision grid; a
+    park is contained if it is within the other after snapping, and the smaller
+    park of a pair within HAUSDORFF_TOLERANCE Hausdorff distance is removed.
 
     Args:
         check_containment_parks (list): List of intersecting named park feature pairs
+        geometries_by_id (dict): Parsed geometries keyed by park ID (optional)
+        method (str): "area" or "hausdorff"
 
     Returns:
         list: IDs of named parks to remove
     """
-    # initialized with hand-selected park IDs to remove
-    # these are park IDs that are missed in the cleaning due to small coordinate differences
-    named_parks_to_remove = [
-        "242304191",
-        "747168477",
-        "747168489",
-        "747184016",
-        "747184053",
-        "860267019",
-    ]
-
-    for feature1, feature2 in check_containment_parks:
-        id1, _, geom1 = get_feature_info(feature1)
-        id2, _, geom2 = get_feature_info(feature2)
-
-        # if park2 is fully contained within park1, add to remove list
-        if geom2.within(geom1):
+    if not check_containment_parks:
+        return []
+
+    ids1 = [feature1["properties"].get("id") for feature1, _ in check_containment_parks]
+    ids2 = [feature2["properties"].get("id") for _, feature2 in check_containment_parks]
+
+    if geometries_by_id is None:
+        geometries_by_id = {}
+        for pair in check_containment_parks:
+            for feature in pair:
+                park_id = feature["properties"].get("id")
+                if park_id not in geometries_by_id:
+                    geometries_by_id[park_id] = shape(feature["geometry"])
+
+    geoms1 = np.array([geometries_by_id[park_id] for park_id in ids1])
+    geoms2 = np.array([geometries_by_id[park_id] for park_id in ids2])
+
+    if method == "area":
+        overlap = shapely.area(shapely.intersection(geoms1, geoms2))
+        within2 = shapely.within(geoms2, geoms1)
+        within1 = shapely.within(geoms1, geoms2)
+        near2 = overlap >= (1 - AREA_TOLERANCE) * shapely.area(geoms2)
+        near1 = overlap >= (1 - AREA_TOLERANCE) * shapely.area(geoms1)
+    elif method == "hausdorff":
+        snapped1 = shapely.set_precision(geoms1, SNAP_GRID_SIZE)
+        snapped2 = shapely.set_precision(geoms2, SNAP_GRID_SIZE)
+        within2 = shapely.within(snapped2, snapped1)
+        within1 = shapely.within(snapped1, snapped2)
+        duplicate = (
+            shapely.hausdorff_distance(snapped1, snapped2) <= HAUSDORFF_TOLERANCE
+        )
+        smaller2 = shapely.area(snapped2) <= shapely.area(snapped1)
+        near2 = duplicate & smaller2
+        near1 = duplicate & ~smaller2
+    else:
+        raise ValueError(f"Unknown containment method: {method}")
+
+    # exact containment decides first, the tolerance only adds near-duplicates
+    remove2 = within2 | (~within1 & near2)
+    remove1 = ~remove2 & (within1 | near1)
+
+    named_parks_to_remove = []
+    for id1, id2, park2_inside, park1_inside in zip(ids1, ids2, remove2, remove1):
+        # if park2 is contained within park1, add to remove list
+        if park2_inside:
             named_parks_to_remove.append(id2)
-        # if park1 is fully contained within park2, add to remove list
-        elif geom1.within(geom2):
+        # if park1 is contained within park2, add to remove list
+        elif park1_inside:
             named_parks_to_remove.append(id1)
 
     return named_parks_to_remove
 
 
-def get_final_features(features, graph, unnameds_to_remove, named_parks_to_remove):
+def get_final_features(
+    features,
+    unnamed_edges,
+    unnameds_to_remove,
+    named_parks_to_remove,
+    geometries_by_id=None,
+    max_workers=None,
+):
     """
     This function merges intersecting unnamed parks into single features.
-    By using the intersection graph, where nodes are park IDs and edges represent
-    intersections, the function groups connected parks, merges their geometries,
-    creates and adds their merged feature to the cleaned data, and removes the
-    original features of the merged parks.
+    By using the intersection edges between unnamed park IDs, the function
+    groups connected parks, merges their geometries, creates and adds their
+    merged feature to the cleaned data, and removes the original features of
+    the merged parks.
 
     The return list of features excludes the given list of unnamed and named parks
     to remove from the data.
 
     Args:
         features (list): List of GeoJSON features.
-        graph (networkx.Graph): Intersection graph of unnamed parks.
+        unnamed_edges (list): Pairs of intersecting unnamed park IDs.
         unnameds_to_remove (list): IDs of unnamed parks to remove.
         named_parks_to_remove (list): IDs of named parks to remove.
+        geometries_by_id (dict): Parsed geometries keyed by park ID (optional)
+        max_workers (int): Worker processes used to merge large clusters
 
     Returns:
         list: Updated list of park features, including merged unnamed parks.
+        dict: Lineage table mapping each merged park id to its sorted member ids
     """
-    # initialize list to track new merged park features
-    merged_features = []
+    # index the first feature for each park id
+    features_by_id = {}
+    for feature in features:
+        features_by_id.setdefault(feature["properties"].get("id"), feature)
+
     # initialize set to track park ids that have been merged and should be removed
     merged_ids = set()
+    cluster_geometries = []
+    lineage = {}
 
-    # nx.connected_components(graph) finds all groups of interconnected parks
-    # clusters is a list of sets, where each set contains the IDs of intersecting parks
-    clusters = [comp for comp in nx.connected_components(graph)]
-    # for each cluster of intersecting parks, initialize an empty list to collect the geometries
-    for cluster in clusters:
-        cluster_geometries = []
+    # for each cluster of intersecting parks, collect the geometries
+    for cluster in find_clusters(unnamed_edges):
+        geometries = []
+        member_ids = []
 
         for park_id in cluster:
-            for feature in features:
-                # for each park ID in the cluster, find the corresponding feature in the original features list
-                if feature["properties"].get("id") == park_id:
-                    # if match found, add geometry to cluster_geometries
-                    cluster_geometries.append(shape(feature["geometry"]))
-                    # add park id to merged_ids for removal from features list
-                    merged_ids.add(park_id)
-                    # assign new random park_id to merged feature
-                    new_id = new_id = str(random.randint(1, 100000))
-                    # break to ensure we only remove first matching feature
-                    break
-
-        # unary_union merges multiple geometries into a single geometry, handling overlaps & adjacent areas
-        merged_geometry = unary_union(cluster_geometries)
-        # create a new merged feature and append it to the merged_features return list
-        merged_features.append(create_merged_feature(merged_geometry, new_id))
-
-    # remaining features are park ids not within merged_ids, unnameds_to_remove, or named_parks_to_remove lists
+            feature = features_by_id.get(park_id)
+            if feature is None:
+                continue
+            if geometries_by_id is not None:
+                geometries.append(geometries_by_id[park_id])
+            else:
+                geometries.append(shape(feature["geometry"]))
+            # add park id to merged_ids for removal from features list
+            merged_ids.add(park_id)
+            member_ids.append(park_id)
+
+        if not member_ids:
+            continue
+
+        cluster_geometries.append(geometries)
+        # merged park id is derived from its member ids
+        lineage[merged_park_id(member_ids)] = sorted(member_ids)
+
+    # unary_union merges multiple geometries into a single geometry, handling
+    # overlaps & adjacent areas; large clusters are merged in parallel
+    merged_geometries = [None] * len(cluster_geometries)
+    large = [
+        i
+        for i, geometries in enumerate(cluster_geometries)
+        if len(geometries) >= PARALLEL_CLUSTER_SIZE
+    ]
+    if large:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(
+                unary_union, [cluster_geometries[i] for i in large]
+            )
+            for i, merged_geometry in zip(large, results):
+                merged_geometries[i] = merged_geometry
+    for i, geometries in enumerate(cluster_geometries):
+        if merged_geometries[i] is None:
+            merged_geometries[i] = unary_union(geometries)
+
+    # create new merged features
+    merged_features = [
+        create_merged_feature(merged_geometry, new_id)
+        for merged_geometry, new_id in zip(merged_geometries, lineage)
+    ]
+
+    # remaining features are park ids not merged or marked for removal
+    removed_ids = merged_ids | set(unnameds_to_remove) | set(named_parks_to_remove)
     remaining_features = [
         feature
         for feature in features
-        if feature["properties"].get("id") not in merged_ids
-        and feature["properties"].get("id") not in unnameds_to_remove
-        and feature["properties"].get("id") not in named_parks_to_remove
+        if feature["properties"].get("id") not in removed_ids
     ]
 
     # add the new merged features to the remaining features list
     remaining_features.extend(merged_features)
 
-    return remaining_features
+    return remaining_features, lineage
 
 
 def save_geojson(features, output_file_path):
     """
-    Save the cleaned park features to a JeoJSON file.
+    Save the cleaned park features to a compact GeoJSON file.
 
     Args:
         features (list): List of cleaned GeoJSON features.
         output_file_path (str): Path to save the output file.
     """
-    with open(output_file_path, "w") as f:
-        # convert the features list into a GeoJSON FeatureCollection
-        json.dump({"type": "FeatureCollection", "features": features}, f, indent=4)
+    count = write_features(features, output_file_path)
 
-    print("After cleaning, we have", len(features), "parks")
+    print("After cleaning, we have", count, "parks")
 
 
-def main():
+def save_lineage(lineage, output_file_path):
     """
-    Execute the complete park cleaning and merging process.
+    Save the merged park lineage table (merged id -> member ids) so later
+    stages can key caches and diffs by park id.
+
+    Args:
+        lineage (dict): Merged park ids mapped to their member ids.
+        output_file_path (str): Path to save the output file.
     """
+    with open(output_file_path, "w") as f:
+        json.dump(lineage, f, indent=1)
 
-    file_path = DATA_DIR / "uncleaned_park_polygons.geojson"
-    output_path = DATA_DIR / "cleaned_park_polygons.geojson"
 
-    features = load_geojson(file_path)
+def clean_features(features, max_workers=None):
+    """
+    Run the cleaning steps on a list of raw park features: standardize
+    unnamed parks, handle intersecting parks, check named park containment
+    and merge unnamed park clusters.
+
+    Args:
+        features (list): List of raw GeoJSON features
+        max_workers (int): Worker processes used to merge large clusters
 
+    Returns:
+        list: Cleaned park features
+        dict: Lineage table of merged park ids
+    """
     # standardize unnamed park names in GeoJSON
     standardized_features = standardize_unnamed_parks(features)
 
-    # retrieve intersection graph, list of unnamed parks to remove, list of intersecting named parks to review
-    intersection_graph, unnameds_to_remove, check_containment_parks = (
-        handle_intersecting_parks(standardized_features)
+    # parse every geometry once
+    geometries = parse_geometries(standardized_features)
+    geometries_by_id = {}
+    for feature, geometry in zip(standardized_features, geometries):
+        geometries_by_id.setdefault(feature["properties"].get("id"), geometry)
+
+    # retrieve unnamed intersection edges, list of unnamed parks to remove, list of intersecting named parks to review
+    unnamed_edges, unnameds_to_remove, check_containment_parks = (
+        handle_intersecting_parks(standardized_features, geometries)
     )
 
     # extract list of named parks to remove
-    named_parks_to_remove = check_park_containment(check_containment_parks)
+    named_parks_to_remove = check_park_containment(
+        check_containment_parks, geometries_by_id
+    )
 
     # merge unnamed park clusters & update features list accordingly
-    updated_features = get_final_features(
-        features, intersection_graph, unnameds_to_remove, named_parks_to_remove
+    return get_final_features(
+        standardized_features,
+        unnamed_edges,
+        unnameds_to_remove,
+        named_parks_to_remove,
+        geometries_by_id,
+        max_workers,
     )
 
+
+def main(city=CHICAGO):
+    """
+    Execute the complete park cleaning and merging process.
+    """
+
+    file_path = city.data_dir / "uncleaned_park_polygons.geojson"
+    output_path = city.data_dir / "cleaned_park_polygons.geojson"
+    lineage_path = city.data_dir / "merged_park_lineage.json"
+
+    features = load_geojson(file_path)
+    updated_features, lineage = clean_features(features)
+
     # create cleaned parks GeoJSON file
     save_geojson(updated_features, output_path)
-    print(f"Chicago Park Data cleaned and saved")
+    save_lineage(lineage, lineage_path)
+    print(f"{city.name.title()} Park Data cleaned and saved")
 
 
 if __name__ == "__main__":
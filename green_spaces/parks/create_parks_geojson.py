@@ -1,32 +1,42 @@
 import osmnx as ox
-import json
+import geopandas as gpd
+import shapely
 from pathlib import Path
+from .geojson_stream import write_features
+from .osm_pbf import PARK_TAGS
+from .normalize_geometries import normalize_gdf
+from green_spaces.config import CHICAGO
 
 # Define the data directory relative to the script's location
 DATA_DIR = Path(__file__).parent.parent.parent / "data"
 
 
 def fetch_and_save_park_data(
-    place_name="Chicago, Illinois, USA",
-    output_filename="uncleaned_park_polygons.geojson",
+    city=CHICAGO, output_filename="uncleaned_park_polygons.geojson"
 ):
     """
-    Fetch park features from OpenStreetMap for a given place and save them to a GeoJSON file.
+    Fetch park features from OpenStreetMap for a given city and save them to a GeoJSON file.
 
     Args:
-        place_name (str): The name of the place to fetch park data for.
+        city (CityConfig): The city to fetch park data for.
         output_filename (str): The name of the output GeoJSON file.
     """
-    polygons_filepath = DATA_DIR / output_filename
+    # Retrieve park features from OSM
+    parks = ox.features_from_place(city.place_name, tags=PARK_TAGS)
+    save_park_data(parks, city, output_filename)
 
-    # Define the OSM tags for parks and recreational areas
-    tags = {
-        "leisure": ["park", "nature_reserve", "playground", "dog_park"],
-        "landuse": "recreation_ground",
-    }
 
-    # Retrieve park features from OSM
-    parks = ox.features_from_place(place_name, tags=tags)
+def save_park_data(parks, city=CHICAGO, output_filename="uncleaned_park_polygons.geojson"):
+    """
+    Save the park polygons of OSM park features to a GeoJSON file, whether
+    fetched from Overpass or read from a local extract (see ingest_extract).
+
+    Args:
+        parks (GeoDataFrame): OSM park features indexed by (element, id)
+        city (CityConfig): The city the parks belong to.
+        output_filename (str): The name of the output GeoJSON file.
+    """
+    polygons_filepath = city.data_dir / output_filename
 
     # Select only relevant columns, adding safeguards for missing ones
     required_columns = ["geometry", "ele", "leisure", "name"]
@@ -34,17 +44,69 @@ def fetch_and_save_park_data(
     # Separate points and polygons
     parks_polygons = parks[parks.geometry.geom_type == "Polygon"]
 
-    # Save to GeoJSON file
-    parks_polygons[required_columns].to_file(polygons_filepath, driver="GeoJSON")
+    # Repair, snap and orient geometries once so later predicates run on
+    # clean geometries
+    parks_polygons, _ = normalize_gdf(parks_polygons, "parks")
+
+    # Stream features to a compact GeoJSON file in one pass, keeping the
+    # (element, id) index as properties like the GeoJSON driver does
+    features = parks_polygons.reindex(columns=required_columns).reset_index().iterfeatures(
+        na="null", drop_id=True
+    )
+    count = write_features(features, polygons_filepath)
+
+    print(f"Created {output_filename} file with {count} parks")
+
+
+def fetch_and_save_park_entrances(
+    city=CHICAGO,
+    parks_filename="cleaned_park_polygons.geojson",
+    output_filename="park_entrances.geojson",
+):
+    """
+    Fetch park entrance points for a given city and save them to a GeoJSON
+    file. Entrances are OSM nodes tagged "entrance" plus the points where
+    footpaths cross a park boundary.
+
+    Args:
+        city (CityConfig): The city to fetch entrances for.
+        parks_filename (str): The cleaned park polygons GeoJSON file.
+        output_filename (str): The name of the output GeoJSON file.
+    """
+    parks = gpd.read_file(city.data_dir / parks_filename)
+    boundaries = parks.geometry.boundary
+
+    # Entrance nodes tagged in OSM
+    entrances = ox.features_from_place(city.place_name, tags={"entrance": True})
+    entrance_points = entrances.geometry[entrances.geometry.geom_type == "Point"]
 
-    # Pretty-print the GeoJSON file
-    with polygons_filepath.open("r") as f:
-        data = json.load(f)
+    # Footpaths crossing park boundaries, found with one bulk index query
+    paths = ox.features_from_place(
+        city.place_name,
+        tags={"highway": ["footway", "path", "pedestrian", "cycleway", "steps"]},
+    )
+    path_lines = paths.geometry[
+        paths.geometry.geom_type.isin(["LineString", "MultiLineString"])
+    ].to_crs(parks.crs)
+    path_idx, park_idx = boundaries.sindex.query(
+        path_lines.values, predicate="intersects"
+    )
+    crossings = shapely.get_parts(
+        shapely.intersection(path_lines.values[path_idx], boundaries.values[park_idx])
+    )
+    crossing_points = crossings[shapely.get_type_id(crossings) == 0]
 
-    with polygons_filepath.open("w") as f:
-        json.dump(data, f, indent=4)
+    entrances_gdf = gpd.GeoDataFrame(
+        {
+            "source": ["entrance"] * len(entrance_points)
+            + ["path"] * len(crossing_points)
+        },
+        geometry=list(entrance_points.to_crs(parks.crs).values) + list(crossing_points),
+        crs=parks.crs,
+    )
+    entrances_gdf.to_file(city.data_dir / output_filename, driver="GeoJSON")
 
-    print(f"Created {output_filename} file")
+    print(f"Created {output_filename} file with {len(entrances_gdf)} entrances")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,131 @@
+import json
+
+# characters read from the file at a time
+CHUNK_SIZE = 1 << 16
+
+WHITESPACE = " \t\n\r"
+
+_decoder = json.JSONDecoder()
+
+
+class _Buffer:
+    """
+    Text buffer over a file that is refilled chunk by chunk, holding only the
+    unparsed part of the file in memory.
+    """
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        # grow reads geometrically so a large value is not re-parsed too often
+        remaining = self.text[self.pos :]
+        chunk = self.f.read(max(self.chunk_size, len(remaining)))
+        if not chunk:
+            self.eof = True
+        self.text = remaining + chunk
+        self.pos = 0
+
+    def next_char(self):
+        """Skip whitespace and return the next character without consuming it."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if self.eof:
+                raise ValueError("Unexpected end of GeoJSON file")
+            self.fill()
+
+    def expect(self, char):
+        if self.next_char() != char:
+            raise ValueError(f"Expected {char!r} at GeoJSON position {self.pos}")
+        self.pos += 1
+
+    def decode(self):
+        """Decode the next JSON value, reading more chunks until it is complete."""
+        self.next_char()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self.fill()
+                continue
+            # a number at the end of the buffer may continue in the next chunk
+            if end == len(self.text) and not self.eof:
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_features(filepath, chunk_size=CHUNK_SIZE):
+    """
+    Yield the features of a GeoJSON FeatureCollection one at a time, without
+    loading the whole file. Only the feature being parsed is held in memory.
+
+    Args:
+        filepath (str): Path to the GeoJSON file
+        chunk_size (int): Characters read from the file at a time
+
+    Yields:
+        dict: GeoJSON feature
+    """
+    with open(filepath, "r") as f:
+        buffer = _Buffer(f, chunk_size)
+        buffer.expect("{")
+        if buffer.next_char() == "}":
+            return
+
+        while True:
+            key = buffer.decode()
+            buffer.expect(":")
+            if key == "features":
+                buffer.expect("[")
+                if buffer.next_char() == "]":
+                    buffer.pos += 1
+                else:
+                    while True:
+                        yield buffer.decode()
+                        if buffer.next_char() == "]":
+                            buffer.pos += 1
+                            break
+                        buffer.expect(",")
+            else:
+                # other members (type, name, crs) are small and skipped
+                buffer.decode()
+
+            if buffer.next_char() == "}":
+                return
+            buffer.expect(",")
+
+
+def write_features(features, filepath):
+    """
+    Write features to a compact GeoJSON FeatureCollection in one pass, one
+    feature per line, without building the collection in memory.
+
+    Args:
+        features (iterable): GeoJSON features
+        filepath (str): Path to the output file
+
+    Returns:
+        int: Number of features written
+    """
+    count = 0
+    with open(filepath, "w") as f:
+        f.write('{"type": "FeatureCollection", "features": [\n')
+        for feature in features:
+            if count:
+                f.write(",\n")
+            f.write(json.dumps(feature, separators=(",", ":")))
+            count += 1
+        f.write("\n]}\n")
+
+    return count
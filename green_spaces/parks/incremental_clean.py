@@ -0,0 +1,287 @@
+import hashlib
+import json
+import numpy as np
+from pathlib import Path
+from .clean_park_polygons import (
+    load_geojson,
+    parse_geometries,
+    intersecting_pairs,
+    clean_features,
+    save_geojson,
+    save_lineage,
+)
+from green_spaces.clusters import find_clusters
+from green_spaces.config import CHICAGO
+
+DATA_DIR = Path(__file__).parent.parent.parent / "data"
+
+# state of the previous raw snapshot and its cleaned output
+SNAPSHOT_DIR = DATA_DIR / "park_snapshot"
+
+
+def feature_hash(feature):
+    """
+    Hash a feature's geometry and properties, used to detect changed parks.
+
+    Args:
+        feature (dict): A GeoJSON feature
+
+    Returns:
+        str: SHA-1 hex digest
+    """
+    content = json.dumps(
+        {"geometry": feature["geometry"], "properties": feature["properties"]},
+        sort_keys=True,
+    )
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+def component_labels(geometries):
+    """
+    Label each park with the connected component of the park intersection
+    graph it belongs to. Cleaning only ever relates parks that intersect, so
+    every component can be cleaned independently of the others.
+
+    Args:
+        geometries (numpy array): Parsed feature geometries
+
+    Returns:
+        numpy array: Component label (smallest member position) per park
+    """
+    left, right = intersecting_pairs(geometries)
+    labels = np.arange(len(geometries))
+    for cluster in find_clusters(list(zip(left.tolist(), right.tolist()))):
+        labels[cluster] = min(cluster)
+
+    return labels
+
+
+def snapshot_state(features, labels):
+    """
+    Build the per-feature state saved with a snapshot.
+
+    Returns:
+        dict: Park id mapped to its feature hash and component label
+    """
+    return {
+        feature["properties"].get("id"): {
+            "hash": feature_hash(feature),
+            "component": int(label),
+        }
+        for feature, label in zip(features, labels)
+    }
+
+
+def diff_snapshots(old_state, new_state):
+    """
+    Compare two snapshot states by park id and feature hash.
+
+    Returns:
+        tuple: Sets of added, removed and modified park ids
+    """
+    added = new_state.keys() - old_state.keys()
+    removed = old_state.keys() - new_state.keys()
+    modified = {
+        park_id
+        for park_id in new_state.keys() & old_state.keys()
+        if new_state[park_id]["hash"] != old_state[park_id]["hash"]
+    }
+    return added, removed, modified
+
+
+def affected_parks(old_state, new_state, changed_ids):
+    """
+    Find the parks of the new snapshot that must be cleaned again: every park
+    in a new component that contains a changed park, or a park whose previous
+    component contained a changed park.
+
+    Args:
+        old_state (dict): State of the previous snapshot
+        new_state (dict): State of the new snapshot
+        changed_ids (set): Added, removed and modified park ids
+
+    Returns:
+        set: Park ids of the new snapshot to re-clean
+        set: Component labels of the previous snapshot whose output is stale
+    """
+    stale_old = {
+        old_state[park_id]["component"] for park_id in changed_ids if park_id in old_state
+    }
+    seeds = {
+        park_id
+        for park_id, state in new_state.items()
+        if park_id in changed_ids
+        or (park_id in old_state and old_state[park_id]["component"] in stale_old)
+    }
+    new_components = {new_state[park_id]["component"] for park_id in seeds}
+    affected = {
+        park_id
+        for park_id, state in new_state.items()
+        if state["component"] in new_components
+    }
+
+    # previous components of the re-cleaned parks are stale as well
+    stale_old |= {
+        old_state[park_id]["component"] for park_id in affected if park_id in old_state
+    }
+
+    return affected, stale_old
+
+
+def order_cleaned_features(cleaned_features, lineage, features):
+    """
+    Sort cleaned features into the order of a full cleaning run: kept parks
+    in raw snapshot order, followed by merged parks ordered by their first
+    member in the raw snapshot.
+
+    Args:
+        cleaned_features (list): Cleaned park features
+        lineage (dict): Merged park ids mapped to member ids
+        features (list): Raw features of the snapshot
+
+    Returns:
+        list: Ordered cleaned features
+    """
+    positions = {}
+    for position, feature in enumerate(features):
+        positions.setdefault(feature["properties"].get("id"), position)
+
+    def sort_key(feature):
+        park_id = feature["properties"].get("id")
+        if park_id in lineage:
+            return (1, min(positions[member] for member in lineage[park_id]))
+        return (0, positions[park_id])
+
+    return sorted(cleaned_features, key=sort_key)
+
+
+def change_log(old_cleaned, new_cleaned):
+    """
+    Compare cleaned outputs so downstream stages only recompute changed parks.
+
+    Returns:
+        dict: Lists of added, removed and modified cleaned park ids
+    """
+    old_hashes = {f["properties"].get("id"): feature_hash(f) for f in old_cleaned}
+    new_hashes = {f["properties"].get("id"): feature_hash(f) for f in new_cleaned}
+    added, removed, modified = diff_snapshots(
+        {k: {"hash": v} for k, v in old_hashes.items()},
+        {k: {"hash": v} for k, v in new_hashes.items()},
+    )
+    return {
+        "added": sorted(added),
+        "removed": sorted(removed),
+        "modified": sorted(modified),
+    }
+
+
+def incremental_clean(features, old_state, old_cleaned, old_lineage):
+    """
+    Clean a new raw snapshot by re-running the cleaning steps only for the
+    components touched by changed parks, reusing the previous cleaned output
+    for everything else. The result is identical to cleaning the whole
+    snapshot.
+
+    Args:
+        features (list): Raw features of the new snapshot
+        old_state (dict): State of the previous snapshot
+        old_cleaned (list): Cleaned features of the previous snapshot
+        old_lineage (dict): Lineage table of the previous snapshot
+
+    Returns:
+        list: Cleaned features
+        dict: Lineage table
+        dict: State of the new snapshot
+    """
+    new_state = snapshot_state(features, component_labels(parse_geometries(features)))
+    added, removed, modified = diff_snapshots(old_state, new_state)
+    affected, stale_old = affected_parks(
+        old_state, new_state, added | removed | modified
+    )
+
+    # keep previous output of components untouched by any change
+    kept_features = []
+    kept_lineage = {}
+    for feature in old_cleaned:
+        park_id = feature["properties"].get("id")
+        members = old_lineage.get(park_id, [park_id])
+        if old_state[members[0]]["component"] not in stale_old:
+            kept_features.append(feature)
+            if park_id in old_lineage:
+                kept_lineage[park_id] = members
+
+    # re-clean the affected parks only
+    affected_features = [
+        feature for feature in features if feature["properties"].get("id") in affected
+    ]
+    recleaned_features, recleaned_lineage = clean_features(affected_features)
+    print(
+        f"{len(added)} added, {len(removed)} removed, {len(modified)} modified parks;",
+        f"re-cleaned {len(affected_features)} of {len(features)} parks",
+    )
+
+    lineage = {**kept_lineage, **recleaned_lineage}
+    cleaned = order_cleaned_features(
+        kept_features + recleaned_features, lineage, features
+    )
+
+    return cleaned, lineage, new_state
+
+
+def load_json(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_json(data, path):
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+
+def main(city=CHICAGO):
+    """
+    Incrementally clean the raw park snapshot against the previous one, or
+    run a full clean when there is no previous snapshot.
+    """
+    file_path = city.data_dir / "uncleaned_park_polygons.geojson"
+    output_path = city.data_dir / "cleaned_park_polygons.geojson"
+    lineage_path = city.data_dir / "merged_park_lineage.json"
+    changes_path = city.data_dir / "park_changes.json"
+
+    snapshot_dir = city.data_dir / SNAPSHOT_DIR.name
+    state_path = snapshot_dir / "state.json"
+    snapshot_cleaned_path = snapshot_dir / "cleaned_park_polygons.geojson"
+    snapshot_lineage_path = snapshot_dir / "merged_park_lineage.json"
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+
+    features = load_geojson(file_path)
+
+    if state_path.exists():
+        old_cleaned = load_geojson(snapshot_cleaned_path)
+        cleaned, lineage, state = incremental_clean(
+            features,
+            load_json(state_path),
+            old_cleaned,
+            load_json(snapshot_lineage_path),
+        )
+    else:
+        # hash the raw features before cleaning standardizes their names
+        old_cleaned = []
+        state = snapshot_state(features, component_labels(parse_geometries(features)))
+        cleaned, lineage = clean_features(features)
+
+    # downstream stages read the change log to recompute only changed parks
+    save_json(change_log(old_cleaned, cleaned), changes_path)
+
+    save_geojson(cleaned, output_path)
+    save_lineage(lineage, lineage_path)
+
+    # keep this run as the snapshot for the next one
+    save_json(state, state_path)
+    save_geojson(cleaned, snapshot_cleaned_path)
+    save_lineage(lineage, snapshot_lineage_path)
+    print(f"{city.name.title()} Park Data incrementally cleaned and saved")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+from .create_parks_geojson import save_park_data
+from .osm_pbf import read_osm_extract
+from green_spaces.config import CHICAGO
+from green_spaces.tract_level_analysis.block_chicago import building_centroids, save_data
+
+
+def main(pbf_path, city=CHICAGO):
+    """
+    Read a local .osm.pbf extract of the city in one pass and write both of
+    its layers: the uncleaned park polygons, and the building footprints
+    with their centroids. Replaces the Overpass park and building fetches.
+
+    Args:
+        pbf_path (str): Path to the OSM extract, which may cover more than
+            the city
+        city (CityConfig): The city to keep the parks and buildings of.
+    """
+    extract = read_osm_extract(pbf_path, city.bbox, city.place_name)
+
+    save_park_data(extract.parks, city)
+    save_data(
+        extract.buildings,
+        building_centroids(extract.buildings),
+        city.data_dir / "processed",
+    )
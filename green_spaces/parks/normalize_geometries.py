@@ -0,0 +1,157 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely.geometry import MultiPolygon, Polygon
+from shapely.geometry.polygon import orient
+from typing import NamedTuple
+
+# precision grid geometries are snapped to (in degrees, about 1 cm)
+GRID_SIZE = 1e-7
+
+# features with a smaller area are dropped as degenerate slivers (in m^2)
+MIN_SLIVER_AREA = 1.0
+
+# equal-area CRS used to measure slivers (NAD83 / Conus Albers)
+EQUAL_AREA_CRS = 5070
+
+
+class NormalizationReport(NamedTuple):
+    total: int  # features read
+    repaired: int  # invalid geometries made valid
+    reoriented: int  # polygons whose rings were reoriented
+    snapped: int  # geometries changed by snapping to the precision grid
+    dropped: int  # empty or sliver features dropped
+
+
+def polygonal_part(geometry):
+    """
+    Keep only the polygons of a geometry, as repairing a polygon can produce
+    collections with stray lines and points.
+
+    Args:
+        geometry (shapely geometry): A repaired geometry
+
+    Returns:
+        Polygon or MultiPolygon (empty if there is no polygon)
+    """
+    if isinstance(geometry, (Polygon, MultiPolygon)):
+        return geometry
+
+    polygons = [
+        part
+        for part in shapely.get_parts(geometry)
+        if isinstance(part, (Polygon, MultiPolygon))
+    ]
+    polygons = [p for part in polygons for p in shapely.get_parts(part)]
+    if not polygons:
+        return Polygon()
+    return polygons[0] if len(polygons) == 1 else MultiPolygon(polygons)
+
+
+def orient_rings(geometry):
+    """
+    Orient exterior rings counter-clockwise and holes clockwise (RFC 7946).
+    """
+    if isinstance(geometry, Polygon):
+        return orient(geometry, sign=1.0)
+    if isinstance(geometry, MultiPolygon):
+        return MultiPolygon([orient(part, sign=1.0) for part in geometry.geoms])
+    return geometry
+
+
+def normalize_geometries(
+    geometries, areas=None, grid_size=GRID_SIZE, min_area=MIN_SLIVER_AREA
+):
+    """
+    Repair validity, snap to a fixed precision grid, normalize ring
+    orientation and flag degenerate slivers, so later predicates run on
+    clean geometries.
+
+    Args:
+        geometries (array): Polygonal shapely geometries
+        areas (array): Function returning the area (m^2) of an array of
+            geometries, used to find slivers. Only empty geometries are
+            dropped when None.
+        grid_size (float): Precision grid size in the geometries' units
+        min_area (float): Smallest area of a kept feature
+
+    Returns:
+        numpy array: Normalized geometries
+        numpy array: Boolean mask of the features to keep
+        NormalizationReport
+    """
+    geometries = np.asarray(geometries, dtype=object)
+
+    # repair invalid geometries, keeping their polygonal part
+    invalid = ~shapely.is_valid(geometries)
+    repaired = geometries.copy()
+    repaired[invalid] = [
+        polygonal_part(geometry) for geometry in shapely.make_valid(geometries[invalid])
+    ]
+
+    # count rings not already in RFC 7946 orientation
+    reoriented = ~shapely.equals_exact(
+        np.array([orient_rings(geometry) for geometry in repaired], dtype=object),
+        repaired,
+        tolerance=0,
+    )
+
+    # snapping keeps the output valid, collapsing rings that degenerate; it
+    # may also reorder vertices, so only moved or removed vertices count
+    snapped = shapely.set_precision(repaired, grid_size)
+    snapped_changed = (shapely.hausdorff_distance(snapped, repaired) > 0) | (
+        shapely.get_num_coordinates(snapped) != shapely.get_num_coordinates(repaired)
+    )
+    snapped = np.array([polygonal_part(geometry) for geometry in snapped], dtype=object)
+
+    oriented = np.array([orient_rings(geometry) for geometry in snapped], dtype=object)
+
+    keep = ~shapely.is_empty(oriented)
+    if areas is not None and keep.any():
+        keep[keep] = areas(oriented[keep]) >= min_area
+
+    report = NormalizationReport(
+        total=len(geometries),
+        repaired=int(invalid.sum()),
+        reoriented=int(reoriented.sum()),
+        snapped=int(snapped_changed.sum()),
+        dropped=int((~keep).sum()),
+    )
+
+    return oriented, keep, report
+
+
+def normalize_gdf(gdf, layer_name, grid_size=GRID_SIZE, min_area=MIN_SLIVER_AREA):
+    """
+    Normalize the geometries of a GeoDataFrame, dropping empty features and
+    slivers, and print how many features were fixed.
+
+    Args:
+        gdf (GeoDataFrame): Layer to normalize
+        layer_name (str): Name of the layer in the printed report
+        grid_size (float): Precision grid size in the layer's CRS units
+        min_area (float): Smallest area (m^2) of a kept feature
+
+    Returns:
+        GeoDataFrame: Normalized layer
+        NormalizationReport
+    """
+    areas = None
+    if gdf.crs is not None:
+
+        def areas(geometries):
+            return gpd.GeoSeries(geometries, crs=gdf.crs).to_crs(EQUAL_AREA_CRS).area.values
+
+    geometries, keep, report = normalize_geometries(
+        gdf.geometry.values, areas, grid_size, min_area
+    )
+    normalized = gdf.set_geometry(geometries, crs=gdf.crs)[keep]
+
+    print(
+        f"Normalized {report.total} {layer_name}: {report.repaired} repaired,",
+        f"{report.reoriented} reoriented, {report.snapped} snapped,",
+        f"{report.dropped} dropped",
+    )
+
+    return normalized, report
+
@@ -0,0 +1,186 @@
+import osmium
+import geopandas as gpd
+import pandas as pd
+import shapely
+from typing import NamedTuple
+from green_spaces.config import CHICAGO
+
+# OSM tags of park and recreational areas, as queried through osmnx
+PARK_TAGS = {
+    "leisure": ["park", "nature_reserve", "playground", "dog_park"],
+    "landuse": "recreation_ground",
+}
+
+# Chicago boundaries (north, south, east, west)
+CHICAGO_BBOX = CHICAGO.bbox
+
+
+class OSMExtract(NamedTuple):
+    parks: gpd.GeoDataFrame  # park features indexed by (element, id)
+    buildings: gpd.GeoDataFrame  # building features indexed by (element, id)
+
+
+def is_park(tags):
+    """
+    Check whether OSM tags match PARK_TAGS.
+
+    Args:
+        tags (dict): OSM tags of an element
+
+    Returns:
+        bool
+    """
+    for key, values in PARK_TAGS.items():
+        values = [values] if isinstance(values, str) else values
+        if tags.get(key) in values:
+            return True
+    return False
+
+
+class _ExtractHandler(osmium.SimpleHandler):
+    """
+    Collect park and building features, and the administrative boundaries
+    named like the city, from one pass over an OSM file. Areas are
+    assembled by osmium from closed ways and multipolygon and boundary
+    relations.
+    """
+
+    def __init__(self, bbox, city_name=None):
+        super().__init__()
+        self.factory = osmium.geom.WKBFactory()
+        self.box = None
+        if bbox is not None:
+            north, south, east, west = bbox
+            self.box = shapely.box(west, south, east, north)
+        self.city_name = city_name
+        self.parks = []
+        self.buildings = []
+        self.boundaries = []
+
+    def keep(self, geometry):
+        return self.box is None or self.box.intersects(geometry)
+
+    def node(self, n):
+        # osmnx returns tagged building nodes as points
+        if "building" not in n.tags or not n.location.valid():
+            return
+        geometry = shapely.Point(n.location.lon, n.location.lat)
+        if self.keep(geometry):
+            self.buildings.append(("node", str(n.id), dict(n.tags), geometry))
+
+    def area(self, a):
+        tags = dict(a.tags)
+        park, building = is_park(tags), "building" in tags
+        boundary = (
+            self.city_name is not None
+            and tags.get("boundary") == "administrative"
+            and tags.get("name") == self.city_name
+        )
+        if not (park or building or boundary):
+            return
+
+        try:
+            geometry = shapely.from_wkb(self.factory.create_multipolygon(a))
+        except RuntimeError:
+            # skip areas osmium cannot assemble, as osmnx does
+            return
+
+        if boundary:
+            self.boundaries.append(geometry)
+
+        # single part areas are polygons, like osmnx returns them
+        if len(geometry.geoms) == 1:
+            geometry = geometry.geoms[0]
+        if not self.keep(geometry):
+            return
+
+        # ids as strings, like the saved osmnx features
+        element = "way" if a.from_way() else "relation"
+        record = (element, str(a.orig_id()), tags, geometry)
+        if park:
+            self.parks.append(record)
+        if building:
+            self.buildings.append(record)
+
+
+def records_to_gdf(records):
+    """
+    Build a GeoDataFrame with one column per OSM tag, indexed by
+    (element, id) like osmnx features.
+
+    Args:
+        records (list): (element, id, tags, geometry) tuples
+
+    Returns:
+        GeoDataFrame
+    """
+    index = pd.MultiIndex.from_tuples(
+        [(element, osm_id) for element, osm_id, _, _ in records],
+        names=["element", "id"],
+    )
+    return gpd.GeoDataFrame(
+        pd.DataFrame([tags for _, _, tags, _ in records], index=index),
+        geometry=[geometry for _, _, _, geometry in records],
+        crs="EPSG:4326",
+    )
+
+
+def within_boundary(records, boundary):
+    """
+    Keep the records whose geometry intersects the boundary, as osmnx keeps
+    the features of a place polygon.
+
+    Args:
+        records (list): (element, id, tags, geometry) tuples
+        boundary (shapely geometry): City boundary
+
+    Returns:
+        list: Records intersecting the boundary
+    """
+    if not records:
+        return records
+    keep = shapely.intersects(
+        boundary, [geometry for _, _, _, geometry in records]
+    )
+    return [record for record, kept in zip(records, keep) if kept]
+
+
+def read_osm_extract(pbf_path, bbox=CHICAGO_BBOX, place_name=CHICAGO.place_name):
+    """
+    Read park and building features from a local .osm.pbf extract in a
+    single streaming pass (see ingest_extract, which writes both layers).
+
+    Buildings are kept within the bounds, like osmnx features_from_bbox.
+    Parks are kept when they intersect the administrative boundary named
+    like the place, like osmnx features_from_place; when the extract has no
+    such boundary, parks within the bounds are kept.
+
+    Args:
+        pbf_path (str): Path to the OSM extract
+        bbox (tuple): (north, south, east, west) bounds to keep features in,
+            or None to keep the whole extract
+        place_name (str): OSM place whose boundary to keep parks in, or
+            None to keep parks by bounds only
+
+    Returns: OSMExtract
+    """
+    city_name = place_name.split(",")[0] if place_name else None
+    handler = _ExtractHandler(bbox, city_name)
+    handler.apply_file(str(pbf_path), locations=True)
+
+    if handler.boundaries:
+        # the city's boundary, should its name be shared by smaller areas
+        boundary = max(handler.boundaries, key=lambda geometry: geometry.area)
+        shapely.prepare(boundary)
+        handler.parks = within_boundary(handler.parks, boundary)
+    elif city_name is not None:
+        print(f"No {city_name} boundary in {pbf_path}, keeping parks within bounds")
+    print(
+        f"Read {len(handler.parks)} parks and {len(handler.buildings)} buildings",
+        f"from {pbf_path}",
+    )
+
+    return OSMExtract(
+        parks=records_to_gdf(handler.parks),
+        buildings=records_to_gdf(handler.buildings),
+    )
@@ -0,0 +1,143 @@
+import numpy as np
+import shapely
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from .clean_park_polygons import (
+    load_geojson,
+    parse_geometries,
+    clean_features,
+    save_geojson,
+    save_lineage,
+)
+from .incremental_clean import component_labels, order_cleaned_features
+from green_spaces.config import CHICAGO
+
+DATA_DIR = Path(__file__).parent.parent.parent / "data"
+
+# side of the square tiles the park extent is partitioned into (in degrees)
+TILE_SIZE = 0.05
+
+
+def partition_components(geometries, labels, tile_size=TILE_SIZE):
+    """
+    Assign every intersection component to the tile containing its bounding
+    box. Components whose bounding box crosses a tile border are returned
+    separately to be cleaned in the reconciliation pass.
+
+    Args:
+        geometries (numpy array): Parsed feature geometries
+        labels (numpy array): Component label per feature
+        tile_size (float): Side of the square tiles
+
+    Returns:
+        dict: Tile (column, row) mapped to the positions of its features
+        list: Positions of the features in components crossing tile borders
+    """
+    bounds = shapely.bounds(geometries)
+
+    # bounding box of each component
+    order = np.argsort(labels, kind="stable")
+    sorted_labels = labels[order]
+    is_start = np.ones(len(labels), dtype=bool)
+    is_start[1:] = sorted_labels[1:] != sorted_labels[:-1]
+    starts = np.flatnonzero(is_start)
+    minx = np.minimum.reduceat(bounds[order, 0], starts)
+    miny = np.minimum.reduceat(bounds[order, 1], starts)
+    maxx = np.maximum.reduceat(bounds[order, 2], starts)
+    maxy = np.maximum.reduceat(bounds[order, 3], starts)
+
+    lo_col, hi_col = np.floor(minx / tile_size), np.floor(maxx / tile_size)
+    lo_row, hi_row = np.floor(miny / tile_size), np.floor(maxy / tile_size)
+    in_one_tile = (lo_col == hi_col) & (lo_row == hi_row)
+
+    # position of each feature's component among the components
+    component = np.empty(len(labels), dtype=int)
+    component[order] = np.cumsum(is_start) - 1
+
+    tiles = defaultdict(list)
+    border = []
+    for position, comp in enumerate(component):
+        if in_one_tile[comp]:
+            tiles[(int(lo_col[comp]), int(lo_row[comp]))].append(position)
+        else:
+            border.append(position)
+
+    return dict(tiles), border
+
+
+def clean_tile(features):
+    """
+    Clean the features of one tile in a worker process.
+    """
+    return clean_features(features, max_workers=1)
+
+
+def parallel_clean(features, tile_size=TILE_SIZE, max_workers=None):
+    """
+    Clean park features tile by tile in worker processes. Parks only interact
+    with the parks they intersect, so each intersection component is cleaned
+    whole: components inside a tile are cleaned by that tile's worker and
+    components crossing tile borders are cleaned together in a final pass.
+    The result is identical to cleaning all features in one process.
+
+    Args:
+        features (list): List of raw GeoJSON features
+        tile_size (float): Side of the square tiles (in degrees)
+        max_workers (int): Number of worker processes
+
+    Returns:
+        list: Cleaned park features
+        dict: Lineage table of merged park ids
+    """
+    if not features:
+        return clean_features(features)
+
+    geometries = parse_geometries(features)
+    tiles, border = partition_components(
+        geometries, component_labels(geometries), tile_size
+    )
+    print(
+        f"Cleaning {len(features)} parks in {len(tiles)} tiles,",
+        f"{len(border)} parks cross tile borders",
+    )
+
+    cleaned, lineage = [], {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        tile_features = [[features[i] for i in positions] for positions in tiles.values()]
+        for tile_cleaned, tile_lineage in executor.map(clean_tile, tile_features):
+            cleaned.extend(tile_cleaned)
+            lineage.update(tile_lineage)
+
+    # reconcile the components crossing tile borders
+    border_cleaned, border_lineage = clean_features(
+        [features[i] for i in border], max_workers
+    )
+    cleaned.extend(border_cleaned)
+    lineage.update(border_lineage)
+
+    # restore the order of a single-process run
+    cleaned = order_cleaned_features(cleaned, lineage, features)
+
+    return cleaned, lineage
+
+
+def main(city=CHICAGO):
+    """
+    Execute the park cleaning and merging process tile by tile in parallel.
+    """
+    file_path = city.data_dir / "uncleaned_park_polygons.geojson"
+    output_path = city.data_dir / "cleaned_park_polygons.geojson"
+    lineage_path = city.data_dir / "merged_park_lineage.json"
+
+    features = load_geojson(file_path)
+    updated_features, lineage = parallel_clean(features)
+
+    # create cleaned parks GeoJSON file
+    save_geojson(updated_features, output_path)
+    save_lineage(lineage, lineage_path)
+    print(f"{city.name.title()} Park Data cleaned and saved")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import asyncio
+import contextlib
+import io
+import time
+import httpx
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+from . import google, yelp
+from .replay_server import (
+    GOOGLE_PATH,
+    YELP_PATH,
+    ReplayConfig,
+    load_replay_data,
+    start_replay_server,
+)
+from .reviews_utils import FetchException, RATE_LIMITS, RateLimiter
+from green_spaces.config import CHICAGO
+
+# Concurrency levels compared by the benchmark
+CONCURRENCY_LEVELS = [1, 4, 8, 16]
+
+# Conditions replayed by default: 50 ms responses with a long tail, 2% of
+# failures and throttling above 50 requests per second
+DEFAULT_CONDITIONS = ReplayConfig(latency=0.05, jitter=0.05, error_rate=0.02, rate_limit=50)
+
+
+class BenchmarkResult(NamedTuple):
+    provider: str
+    concurrency: int
+    requests: int  # HTTP requests sent, retries included
+    failures: int  # searches that failed after retries
+    retries: int  # requests retried by the rate limiter
+    seconds: float  # wall time of the run
+    throughput: float  # requests per second
+    p50: float  # request latency percentiles (seconds)
+    p95: float
+    p99: float
+
+
+class _Timed:
+    """
+    Records the latency of every request sent through a transport
+    """
+
+    def __init__(self):
+        self.latencies = []
+
+    def sync(self):
+        timer = self
+
+        class Transport(httpx.HTTPTransport):
+            def handle_request(self, request):
+                start = time.perf_counter()
+                response = super().handle_request(request)
+                timer.latencies.append(time.perf_counter() - start)
+                return response
+
+        return Transport()
+
+    def async_(self):
+        timer = self
+
+        class Transport(httpx.AsyncHTTPTransport):
+            async def handle_async_request(self, request):
+                start = time.perf_counter()
+                response = await super().handle_async_request(request)
+                timer.latencies.append(time.perf_counter() - start)
+                return response
+
+        return Transport()
+
+
+def summarize(provider, concurrency, timer, limiter, failures, seconds) -> BenchmarkResult:
+    """
+    Turns the recorded latencies and limiter counters into a result
+    """
+    latencies = np.array(timer.latencies) if timer.latencies else np.zeros(1)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    stats = limiter.stats()
+    return BenchmarkResult(
+        provider=provider,
+        concurrency=concurrency,
+        requests=stats.requests,
+        failures=failures,
+        retries=stats.retries,
+        seconds=seconds,
+        throughput=stats.requests / seconds if seconds else 0.0,
+        p50=float(p50),
+        p95=float(p95),
+        p99=float(p99),
+    )
+
+
+def benchmark_google(base_url, concurrency, city=CHICAGO, limiter=None) -> BenchmarkResult:
+    """
+    Runs the city's Google searches through fetch_google against the
+    replay server
+    """
+    limiter = limiter or RateLimiter(**RATE_LIMITS["google"], base_delay=0.1)
+    timer = _Timed()
+    failures = 0
+
+    start = time.perf_counter()
+    for _, _, parameters in google.search_requests(city)[:-1]:
+        try:
+            asyncio.run(
+                google.fetch_google(
+                    base_url + GOOGLE_PATH, parameters, city.search_locations,
+                    concurrency, timer.async_(), limiter,
+                )
+            )
+        except FetchException:
+            failures += 1
+    seconds = time.perf_counter() - start
+
+    return summarize("google", concurrency, timer, limiter, failures, seconds)
+
+
+def benchmark_yelp(base_url, concurrency, city=CHICAGO, limiter=None) -> BenchmarkResult:
+    """
+    Runs the city's Yelp searches through fetch_yelp against the replay
+    server, concurrency searches at a time
+    """
+    limiter = limiter or RateLimiter(**RATE_LIMITS["yelp"], base_delay=0.1)
+    timer = _Timed()
+
+    def search(headers):
+        try:
+            yelp.fetch_yelp(base_url + YELP_PATH, headers, limiter, timer.sync())
+            return 0
+        except FetchException:
+            return 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        failures = sum(
+            executor.map(search, [headers for _, _, headers in yelp.search_requests(city)])
+        )
+    seconds = time.perf_counter() - start
+
+    return summarize("yelp", concurrency, timer, limiter, failures, seconds)
+
+
+def main(
+    conditions=DEFAULT_CONDITIONS, levels=CONCURRENCY_LEVELS, unthrottled=False, city=CHICAGO
+):
+    """
+    Benchmarks the fetch layer against the replay server at several
+    concurrency levels, printing throughput and tail latency
+
+    Inputs:
+        conditions: ReplayConfig of the replayed latency, errors and
+            throttling
+        levels: concurrency levels to compare
+        unthrottled: whether to lift the client rate limits, to measure the
+            fetch layer rather than the configured quotas
+        city: CityConfig of the city whose cached searches are replayed
+    """
+    page_token_delay = google.PAGE_TOKEN_DELAY
+    if unthrottled:
+        google.PAGE_TOKEN_DELAY = 0
+    server, base_url = start_replay_server(load_replay_data(city), conditions)
+
+    print(f"{'provider':>8} {'conc':>5} {'requests':>8} {'retries':>7} {'failed':>6}",
+          f"{'req/s':>7} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7}")
+    try:
+        for concurrency in levels:
+            for benchmark, provider in [(benchmark_google, "google"), (benchmark_yelp, "yelp")]:
+                limiter = None
+                if unthrottled:
+                    limiter = RateLimiter(qps=10_000, burst=1_000, base_delay=0.1)
+                # silence the fetchers' progress messages
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = benchmark(base_url, concurrency, city, limiter)
+                print(
+                    f"{provider:>8} {concurrency:>5} {result.requests:>8}",
+                    f"{result.retries:>7} {result.failures:>6} {result.throughput:>7.1f}",
+                    f"{result.p50 * 1000:>7.0f} {result.p95 * 1000:>7.0f}",
+                    f"{result.p99 * 1000:>7.0f}",
+                )
+    finally:
+        google.PAGE_TOKEN_DELAY = page_token_delay
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+from .reviews_utils import cache_key
+
+CACHE_DIR = Path(__file__).parent.parent.parent / "cache"
+
+# Name of the response database inside the cache directory
+CACHE_DB = "reviews.sqlite"
+
+# Milliseconds a writer waits for another process holding the lock
+BUSY_TIMEOUT = 30_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    legacy_key TEXT,
+    url TEXT,
+    params TEXT,
+    fetched_at REAL NOT NULL,
+    ttl REAL,
+    body BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_legacy_key ON responses (legacy_key);
+CREATE TABLE IF NOT EXISTS request_counts (
+    provider TEXT NOT NULL,
+    day TEXT NOT NULL,
+    requests INTEGER NOT NULL,
+    PRIMARY KEY (provider, day)
+);
+"""
+
+
+def request_key(url: str, params: dict) -> str:
+    """
+    Canonical cache key of a request: a hash of the URL and its parameters,
+    independent of the parameter order
+
+    Inputs:
+        url: API URL
+        params: request parameters
+
+    Returns:
+        SHA-256 hex digest
+    """
+    canonical = json.dumps(
+        [url.lower(), sorted((str(k), str(v)) for k, v in params.items())],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class CacheStore:
+    """
+    Single-file response cache in SQLite, with zlib-compressed bodies, the
+    fetch time and an optional time to live per response. WAL mode and a
+    busy timeout make it safe to share between processes. It also counts
+    the requests sent to each provider per day, for the daily budgets.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, read_legacy=True, check_same_thread=True):
+        """
+        Inputs:
+            cache_dir: directory of the database, and of the loose JSON
+                cache files of earlier versions
+            read_legacy: whether to read and migrate loose cache files on a
+                miss
+            check_same_thread: whether only the creating thread may use the
+                store; False when callers serialize access themselves
+        """
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.legacy_dir = cache_dir if read_legacy else None
+        self.conn = sqlite3.connect(
+            cache_dir / CACHE_DB,
+            timeout=BUSY_TIMEOUT / 1000,
+            isolation_level=None,
+            check_same_thread=check_same_thread,
+        )
+        self.conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT}")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def count_request(self, provider: str, day: str, limit=None):
+        """
+        Counts one request to a provider, unless the provider's count for
+        the day has reached the limit. The check and the increment are one
+        statement, so processes sharing the cache cannot overrun the limit.
+
+        Inputs:
+            provider: provider name, e.g. "google"
+            day: ISO date of the request
+            limit: most requests allowed on the day, None for no limit
+
+        Returns:
+            the provider's request count for the day, None if the limit is
+            reached
+        """
+        if limit is not None and limit <= 0:
+            return None
+        row = self.conn.execute(
+            """
+            INSERT INTO request_counts VALUES (?, ?, 1)
+            ON CONFLICT (provider, day) DO UPDATE SET requests = requests + 1
+            WHERE ? IS NULL OR requests < ?
+            RETURNING requests
+            """,
+            (provider, day, limit, limit),
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def request_count(self, provider: str, day: str) -> int:
+        """
+        Returns the number of requests counted for a provider on a day
+        """
+        row = self.conn.execute(
+            "SELECT requests FROM request_counts WHERE provider = ? AND day = ?",
+            (provider, day),
+        ).fetchone()
+        return 0 if row is None else row[0]
+
+    def put(self, url: str, params: dict, data, ttl=None, fetched_at=None, legacy_key=None):
+        """
+        Stores a response
+
+        Inputs:
+            url: API URL
+            params: request parameters
+            data: JSON-serializable response data
+            ttl: seconds the response stays fresh, None to never expire
+            fetched_at: fetch time (epoch seconds), now by default
+            legacy_key: loose cache file name the response came from
+        """
+        body = zlib.compress(json.dumps(data).encode())
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                request_key(url, params),
+                legacy_key or cache_key(url, params),
+                url,
+                json.dumps(params, sort_keys=True),
+                time.time() if fetched_at is None else fetched_at,
+                ttl,
+                body,
+            ),
+        )
+
+    def get(self, url: str, params: dict, now=None):
+        """
+        Returns the cached response of a request, or None when it is missing
+        or expired. Responses still in loose legacy files are migrated on
+        first read.
+        """
+        return self.get_many([(url, params)], now)[0]
+
+    def get_many(self, requests: list[tuple], now=None) -> list:
+        """
+        Returns the cached responses of several requests with one indexed
+        query
+
+        Inputs:
+            requests: list of (url, params) tuples
+            now: current time (epoch seconds), used to expire responses
+
+        Returns:
+            list of response data, None for missing or expired responses
+        """
+        now = time.time() if now is None else now
+        keys = [request_key(url, params) for url, params in requests]
+        placeholders = ",".join("?" * len(keys))
+        rows = self.conn.execute(
+            f"SELECT key, fetched_at, ttl, body FROM responses WHERE key IN ({placeholders})",
+            keys,
+        ).fetchall()
+
+        found = {
+            key: json.loads(zlib.decompress(body))
+            for key, fetched_at, ttl, body in rows
+            if ttl is None or fetched_at + ttl >= now
+        }
+        stored = {key for key, _, _, _ in rows}
+
+        results = []
+        for key, (url, params) in zip(keys, requests):
+            if key not in found and key not in stored:
+                found[key] = self.migrate_legacy(url, params)
+            results.append(found.get(key))
+        return results
+
+    def entries(self):
+        """
+        Iterates over the responses whose request is known
+
+        Yields:
+            (url, params, data) tuples
+        """
+        rows = self.conn.execute(
+            "SELECT url, params, body FROM responses WHERE url IS NOT NULL ORDER BY key"
+        ).fetchall()
+        for url, params, body in rows:
+            yield url, json.loads(params), json.loads(zlib.decompress(body))
+
+    def fetch_times(self, requests: list[tuple]) -> list:
+        """
+        Returns when the responses of several requests were fetched
+
+        Inputs:
+            requests: list of (url, params) tuples
+
+        Returns:
+            list of fetch times (epoch seconds), None for missing requests
+        """
+        keys = [request_key(url, params) for url, params in requests]
+        placeholders = ",".join("?" * len(keys))
+        times = dict(
+            self.conn.execute(
+                f"SELECT key, fetched_at FROM responses WHERE key IN ({placeholders})",
+                keys,
+            ).fetchall()
+        )
+        return [times.get(key) for key in keys]
+
+    def migrate_legacy(self, url: str, params: dict):
+        """
+        Moves the response of a request from its loose legacy cache file,
+        imported by migrate_legacy_cache or still on disk, under the
+        canonical key
+
+        Returns:
+            the response data, None if there is no legacy response
+        """
+        legacy_key = cache_key(url, params)
+        row = self.conn.execute(
+            "SELECT key FROM responses WHERE legacy_key = ? AND url IS NULL",
+            (legacy_key,),
+        ).fetchone()
+        if row is not None:
+            # imported by file name only, attach the request to the row
+            self.conn.execute(
+                "UPDATE responses SET key = ?, url = ?, params = ? WHERE key = ?",
+                (request_key(url, params), url, json.dumps(params, sort_keys=True), row[0]),
+            )
+            return self.get(url, params)
+
+        if self.legacy_dir is None:
+            return None
+        path = Path(self.legacy_dir) / legacy_key
+        if not path.exists():
+            return None
+        with open(path, "r") as f:
+            data = json.load(f)
+        self.put(url, params, data, fetched_at=path.stat().st_mtime, legacy_key=legacy_key)
+        return data
+
+
+def migrate_legacy_cache(store: CacheStore, directory=None) -> int:
+    """
+    One-time import of the loose review cache files into the store. The
+    request behind a file name is not recoverable, so files are stored by
+    name and attached to their request the first time it is looked up.
+    Other files in the directory (e.g. the osmnx Overpass cache) are left
+    alone.
+
+    Inputs:
+        store: CacheStore to import into
+        directory: directory of loose JSON cache files, the store's cache
+            directory by default
+
+    Returns:
+        number of files imported
+    """
+    directory = store.cache_dir if directory is None else directory
+    imported = 0
+    for path in sorted(Path(directory).glob("*.json")):
+        with open(path, "r") as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError:
+                continue
+        # review responses are saved as {"places": [...]}
+        if not isinstance(data, dict) or set(data) != {"places"}:
+            continue
+        if store.conn.execute(
+            "SELECT 1 FROM responses WHERE legacy_key = ?", (path.name,)
+        ).fetchone():
+            continue
+
+        cursor = store.conn.execute(
+            "INSERT OR IGNORE INTO responses VALUES (?, ?, NULL, NULL, ?, NULL, ?)",
+            (
+                "legacy:" + path.name,
+                path.name,
+                path.stat().st_mtime,
+                zlib.compress(json.dumps(data).encode()),
+            ),
+        )
+        imported += cursor.rowcount
+
+    print(f"Migrated {imported} cache files into {CACHE_DB}")
+    return imported
+
+
+if __name__ == "__main__":
+    with CacheStore() as store:
+        migrate_legacy_cache(store)
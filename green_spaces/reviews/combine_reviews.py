@@ -1,11 +1,85 @@
 import json
+import math
+import re
 import geopandas as gpd
+import numpy as np
+import pandas as pd
+from collections import defaultdict
+from difflib import SequenceMatcher
 from pathlib import Path
-from shapely.geometry import Point
-from .reviews_utils import save_reviews, Place
+from . import google, yelp
+from .cache_store import CacheStore
+from .reviews_utils import (
+    Place,
+    place_table,
+    save_place_table,
+    save_reviews,
+    table_columns,
+    table_places,
+)
+from .tiling import tiled_request
+from green_spaces.clusters import find_clusters
+from green_spaces.config import CHICAGO
 
 DATA_DIR = Path(__file__).parent.parent.parent / "data" / "review_data"
 
+# Places of different sources closer than this may be duplicates (in meters)
+DEDUP_DISTANCE = 150
+
+# Smallest similarity of normalized names for places to be duplicates
+NAME_SIMILARITY = 0.9
+
+# Place table of the combined reviews, loaded by the index
+PLACE_TABLE = "combined_reviews"
+
+# Saved review sources ingested from offline dumps rather than API searches
+OFFLINE_REVIEWS = ["yelp_dataset"]
+
+# Words ignored when comparing place names
+NAME_STOPWORDS = {"the", "park", "parks", "of"}
+
+
+def unique_places(places: list[dict]) -> list[dict]:
+    """
+    Removes duplicate places
+
+    Inputs:
+        places: list of cleaned place dictionaries
+
+    Outputs:
+        list of dictionaries of the unique places
+    """
+    # Put review information in set to remove duplicates
+    unique_entries = set()
+
+    # Grab characteristics for place, save as named tuple in set
+    for place in places:
+        unique_entries.add(
+            Place(
+                name=place["name"],
+                latitude=place["latitude"],
+                longitude=place["longitude"],
+                rating=place["rating"],
+                review_count=place["review_count"],
+                source=place["source"],
+            )
+        )
+
+    # Convert set of tuples to list of dictionaries
+    return [row._asdict() for row in unique_entries]
+
+
+def place_order(place: dict) -> tuple:
+    """
+    Sort key giving places the same order in every run, as sets of places
+    iterate in an order that changes between processes. Missing values sort
+    last.
+    """
+    return tuple(
+        (place[field] is None, "" if place[field] is None else place[field])
+        for field in ["source", "name", "latitude", "longitude", "rating", "review_count"]
+    )
+
 
 def combine_reviews(directory) -> list[dict]:
     """
@@ -18,79 +92,311 @@ def combine_reviews(directory) -> list[dict]:
         list of dictionaries with merged, unique Yelp and Google reviews
     """
 
-    # Put review information in set to remove duplicates
-    unique_entries = set()
-
+    places = []
     for source in ["google", "yelp"]:
         # Load in each .json file beginning with "google" or "yelp"
         paths = list(directory.glob(f"{source}_*.json"))
 
         for path in paths:
             with open(path, "r") as f:
-                places = json.load(f)
-
-                # Grab characteristics for place, save as named tuple in set
-                for place in places:
-                    unique_entries.add(
-                        Place(
-                            name=place["name"],
-                            latitude=place["latitude"],
-                            longitude=place["longitude"],
-                            rating=place["rating"],
-                            review_count=place["review_count"],
-                            source=place["source"],
-                        )
-                    )
+                places.extend(json.load(f))
 
-    # Convert set of tuples to list of dictionaries
-    lst_data_dicts = []
-    for row in unique_entries:
-        lst_data_dicts.append(row._asdict())
+    return unique_places(places)
+
+
+def combine_cached_reviews(city=CHICAGO):
+    """
+    Combine the Yelp and Google searches of a city straight from the response
+    cache, reading all responses with one indexed query. A search run over
+    adaptive tiles (see tiling.py) adds the places it found to those of its
+    fixed grid response.
+
+    Inputs:
+        city: CityConfig of the city searched, whose response cache is read
+
+    Outputs:
+        list of dictionaries with merged, unique Yelp and Google reviews, or
+        None if a search is cached neither on the fixed grid nor over tiles
+    """
+    searches = [(google.place_rows, url, params)
+                for _, url, params in google.search_requests(city)]
+    searches += [(yelp.place_rows, url, params)
+                 for _, url, params in yelp.search_requests(city)]
 
-    return lst_data_dicts
+    # Each search is read both as run on the fixed grid and over tiles
+    requests = [(url, params) for _, url, params in searches]
+    requests += [tiled_request(url, params) for _, url, params in searches]
+    with CacheStore(city.cache_dir) as store:
+        responses = store.get_many(requests)
+    grid_responses, tiled_responses = responses[:len(searches)], responses[len(searches):]
+    if any(grid is None and tiled is None
+           for grid, tiled in zip(grid_responses, tiled_responses)):
+        return None
 
+    # Read the places straight from the responses into a set of Place
+    # tuples, removing duplicates in the same pass
+    places = set()
+    for (rows, _, _), grid, tiled in zip(searches, grid_responses, tiled_responses):
+        for response in [grid, tiled]:
+            if response is not None:
+                places.update(rows(response))
+    return [place._asdict() for place in places]
 
-def buffer_places(places: list[dict], buffer_distance: int):
+
+def normalize_name(name) -> str:
     """
-    Buffers places coordinates by specified distance, saving in "data" folder
-    and returning as a GeoJSON dataframe
+    Normalizes a place name for comparison: lowercase, punctuation removed
+    and generic words dropped
 
     Inputs:
-        places: list of dictionaries of places with latitudes and longitudes
+        name: place name
+
+    Outputs:
+        normalized name
+    """
+    name = (name or "").lower().replace("&", " and ")
+    words = re.sub(r"[^a-z0-9 ]", " ", name).split()
+    return " ".join(word for word in words if word not in NAME_STOPWORDS)
+
+
+def review_provider(source: str) -> str:
+    """
+    Returns the provider of a review source. Offline dumps share their
+    provider's reviews, e.g. "Yelp Dataset" counts as "Yelp".
+    """
+    return source.split()[0]
+
+
+def merge_duplicates(places: list[dict]) -> dict:
+    """
+    Merges places of different sources describing the same park into one
+    record. A provider listing the park more than once keeps its most
+    reviewed listing, then review counts are summed and ratings averaged
+    by review count.
+
+    Inputs:
+        places: list of duplicate place dictionaries
+
+    Outputs:
+        merged place dictionary
+    """
+    by_source = {}
+    for place in places:
+        provider = review_provider(place["source"])
+        kept = by_source.get(provider)
+        if kept is None or place["review_count"] > kept["review_count"]:
+            by_source[provider] = place
+    if len(by_source) == 1:
+        return next(iter(by_source.values()))
+
+    # Name and location of the most reviewed listing
+    listings = list(by_source.values())
+    merged = dict(max(listings, key=lambda place: place["review_count"]))
+    total_reviews = sum(place["review_count"] for place in listings)
+    if total_reviews:
+        merged["rating"] = (
+            sum(place["rating"] * place["review_count"] for place in listings)
+            / total_reviews
+        )
+    merged["review_count"] = total_reviews
+    merged["source"] = "+".join(sorted(by_source))
+    return merged
+
+
+def dedup_places(
+    places: list[dict], distance=DEDUP_DISTANCE, min_similarity=NAME_SIMILARITY
+) -> list[dict]:
+    """
+    Merges the listings of the same park by different sources. Places are
+    bucketed in a spatial hash grid with cells as wide as the match
+    distance, so each place is only compared to the places of its own and
+    neighboring cells, in near-linear time.
+
+    Inputs:
+        places: list of cleaned place dictionaries
+        distance: largest distance between duplicates (in meters)
+        min_similarity: smallest similarity of duplicates' normalized names
+
+    Outputs:
+        list of place dictionaries, duplicates merged
+    """
+    located = [
+        i for i, place in enumerate(places)
+        if place["latitude"] is not None and place["longitude"] is not None
+    ]
+    if not located:
+        return list(places)
+
+    # Project to meters, at the mean latitude of the places
+    mean_lat = sum(float(places[i]["latitude"]) for i in located) / len(located)
+    lon_meters = 111_000 * math.cos(math.radians(mean_lat))
+    coords = {
+        i: (float(places[i]["latitude"]) * 111_000,
+            float(places[i]["longitude"]) * lon_meters)
+        for i in located
+    }
+
+    cells = defaultdict(list)
+    for i, (y, x) in coords.items():
+        cells[(math.floor(y / distance), math.floor(x / distance))].append(i)
+
+    names = [normalize_name(place["name"]) for place in places]
+
+    def duplicates(i, j):
+        if places[i]["source"] == places[j]["source"] or not names[i] or not names[j]:
+            return False
+        (y1, x1), (y2, x2) = coords[i], coords[j]
+        if math.hypot(y1 - y2, x1 - x2) > distance:
+            return False
+        return SequenceMatcher(None, names[i], names[j]).ratio() >= min_similarity
+
+    edges = []
+    for (row, column), members in cells.items():
+        for d_row in (-1, 0, 1):
+            for d_column in (-1, 0, 1):
+                neighbors = cells.get((row + d_row, column + d_column), [])
+                # Compare each pair once
+                edges.extend(
+                    (i, j) for i in members for j in neighbors
+                    if i < j and duplicates(i, j)
+                )
+
+    # Merge each cluster of duplicates into its first place
+    merged = {}
+    for cluster in find_clusters(edges):
+        first = min(cluster)
+        merged.update({i: None for i in cluster})
+        merged[first] = merge_duplicates([places[i] for i in sorted(cluster)])
+
+    deduped = []
+    for i, place in enumerate(places):
+        place = merged.get(i, place)
+        if place is not None:
+            deduped.append(place)
+    return deduped
+
+
+def place_geodataframe(places, buffer_distance: int):
+    """
+    Buffers places coordinates by specified distance, returning a GeoJSON
+    dataframe
+
+    Inputs:
+        places: list of dictionaries of places with latitudes and longitudes,
+            or a place table
         buffer_distance: int
 
     Returns:
         GeoJSON dataframe with each place buffered by the specified distance
     """
-    # Convert the list of dictionaries into a list of geometries and properties
-    geo = [
-        Point(float(place["longitude"]), float(place["latitude"])) for place in places
-    ]
+    if isinstance(places, np.ndarray):
+        places = table_columns(places)
+    places_df = pd.DataFrame(places)
+
+    # Convert the coordinates into a list of geometries
+    geo = gpd.points_from_xy(
+        places_df["longitude"].astype(float), places_df["latitude"].astype(float)
+    )
 
     # Create a GeoDataFrame
-    places_gdf = gpd.GeoDataFrame(places, geometry=geo, crs=3857)
+    places_gdf = gpd.GeoDataFrame(places_df, geometry=geo, crs=3857)
 
     # Apply buffer to all points in places data
     places_gdf["geometry"] = places_gdf.geometry.buffer(buffer_distance)
 
     # Convert to EPSG: 4326 in order to compare to polygons
-    places_gdf = places_gdf.to_crs(epsg=4326)
+    return places_gdf.to_crs(epsg=4326)
+
+
+def buffer_places(places: list[dict], buffer_distance: int, data_dir=DATA_DIR):
+    """
+    Buffers places coordinates by specified distance, saving in "data" folder
+    and returning as a GeoJSON dataframe
+
+    Inputs:
+        places: list of dictionaries of places with latitudes and longitudes
+        buffer_distance: int
+        data_dir: directory to save the buffered places in
+
+    Returns:
+        GeoJSON dataframe with each place buffered by the specified distance
+    """
+    places_gdf = place_geodataframe(places, buffer_distance)
 
     # Save and return
-    path = DATA_DIR / str(
+    path = data_dir / str(
         "combined_reviews_buffered_" + str(buffer_distance) + ".geojson"
     )
     places_gdf.to_file(path, driver="GeoJSON")
     return places_gdf
 
 
-def main():
-    # Create GeoJSON dataframe of places buffered by 250 meters
-    places = combine_reviews(DATA_DIR)
-    save_reviews(places, "combined_reviews_clean")
-    buffer_places(places, 250)
-    
-    print("Reviews Deduplicated and Buffered")
+def combined_places(city=CHICAGO) -> list[dict]:
+    """
+    Combines all the Yelp and Google searches and offline review dumps of a
+    city, merging the listings of the same park by Google and Yelp
+
+    Inputs:
+        city: CityConfig of the city searched
+
+    Outputs:
+        list of dictionaries of the unique places
+    """
+    review_dir = city.data_dir / "review_data"
+    places = combine_cached_reviews(city)
+    if places is None:
+        # Some searches are not cached, combine the saved search results
+        places = combine_reviews(review_dir)
+    else:
+        # Offline dumps are not in the response cache
+        for output_name in OFFLINE_REVIEWS:
+            path = review_dir / (output_name + ".json")
+            if path.exists():
+                with open(path, "r") as f:
+                    places = unique_places(places + json.load(f))
+
+    # Sort first, so duplicates merge the same way and the place table is
+    # identical from one run to the next
+    places = sorted(places, key=place_order)
+    deduped = dedup_places(places)
+    print(f"Merged {len(places) - len(deduped)} duplicate listings")
+    return deduped
+
+
+def combined_place_table(city=CHICAGO) -> np.ndarray:
+    """
+    Builds the place table of a city's combined, deduplicated reviews
+
+    Inputs:
+        city: CityConfig of the city searched
+
+    Outputs:
+        structured array of the unique places (see place_table)
+    """
+    places = sorted(combined_places(city), key=place_order)
+    return place_table(Place(**place) for place in places)
+
+
+def main(city=CHICAGO, export_json=False):
+    """
+    Saves the city's combined reviews as one place table, combined_reviews.npy,
+    which the index loads directly
+
+    Inputs:
+        city: CityConfig of the city searched
+        export_json: whether to also save the places as JSON and as GeoJSON
+            buffered by 250 meters
+    """
+    review_dir = city.data_dir / "review_data"
+    table = combined_place_table(city)
+    save_place_table(table, PLACE_TABLE, review_dir)
+
+    if export_json:
+        places = table_places(table)
+        save_reviews(places, "combined_reviews_clean", review_dir)
+        buffer_places(places, 250, review_dir)
+
+    print("Reviews Deduplicated and Saved")
 
 if __name__ == "__main__":
     main()
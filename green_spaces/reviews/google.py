@@ -1,15 +1,16 @@
+import asyncio
 import os
 import httpx
-import json
-import time
 from pathlib import Path
+from .cache_store import CacheStore
 from .reviews_utils import (
-    cache_key,
     FetchException,
-    CHICAGO_LOCATIONS,
+    Place,
+    get_limiter,
     get_unnamed_park_locations,
     save_reviews,
 )
+from green_spaces.config import CHICAGO
 
 DATA_DIR = Path(__file__).parent.parent.parent / "data" / "review_data"
 CACHE_DIR = Path(__file__).parent.parent.parent / "cache"
@@ -17,65 +18,169 @@ CACHE_DIR = Path(__file__).parent.parent.parent / "cache"
 # Set Google API Key (not needed if using cached files)
 GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
 
+# Maximum number of Google requests in flight
+GOOGLE_CONCURRENCY = 8
 
-def cached_get_google(url, kwargs: dict, locations: list[tuple]) -> dict:
+# Seconds before a next_page_token becomes valid
+PAGE_TOKEN_DELAY = 1
+
+
+async def fetch_location_pages(
+    client, semaphore, limiter, url, params: dict, loc: tuple
+) -> list:
+    """
+    Pages through the Google results around one location
+
+    Inputs:
+        client: shared httpx.AsyncClient
+        semaphore: asyncio.Semaphore bounding the requests in flight
+        limiter: RateLimiter throttling and retrying the requests
+        url: Google API URL
+        params: query parameters, without location and page token
+        loc: (latitude, longitude) tuple
+
+    Outputs:
+        list of raw places found around the location
+    """
+    places = []
+    next_page_token = None
+    for i in range(3):  # Limit of 60 results per search, 20 per page
+        # Set location argument equal to lat/lon coordinates, page token
+        # either to None or from previous response
+        page_params = dict(params)
+        page_params["location"] = f"{loc[0]},{loc[1]}"
+        page_params["page_token"] = next_page_token
+
+        async with semaphore:
+            response = await limiter.request_async(client.get, url, params=page_params)
+
+        if response.status_code != 200:
+            # Error fetching
+            raise FetchException(response)
+
+        # Extend data list with fetched results, set page token
+        data = response.json()
+        places.extend(data.get("results", []))
+        print("Getting results", i, "for", loc)
+        next_page_token = data.get("next_page_token", None)
+        if not next_page_token:
+            # No more results
+            break
+
+        # Wait for the token to become valid, without holding a request
+        # slot so the waits of different locations overlap
+        await asyncio.sleep(PAGE_TOKEN_DELAY)
+
+    return places
+
+
+async def fetch_google(
+    url, kwargs: dict, locations: list[tuple], max_concurrency=GOOGLE_CONCURRENCY,
+    transport=None, limiter=None,
+) -> list:
+    """
+    Fetches the Google results around all locations concurrently over one
+    pooled client
+
+    Inputs:
+        url: Google API URL
+        kwargs: arguments dictionary
+        locations: list of (latitude, longitude) tuples
+        max_concurrency: maximum number of requests in flight
+        transport: optional httpx transport, e.g. a mock for testing
+        limiter: RateLimiter throttling the requests, the shared Google
+            limiter by default
+
+    Outputs:
+        list of raw places, in the order of the locations
+    """
+    limiter = limiter or get_limiter("google")
+    params = dict(kwargs)
+    params["key"] = GOOGLE_API_KEY
+    semaphore = asyncio.Semaphore(max_concurrency)
+    limits = httpx.Limits(max_connections=max_concurrency)
+
+    async with httpx.AsyncClient(transport=transport, limits=limits) as client:
+        try:
+            async with asyncio.TaskGroup() as group:
+                tasks = [
+                    group.create_task(
+                        fetch_location_pages(
+                            client, semaphore, limiter, url, params, loc
+                        )
+                    )
+                    for loc in locations
+                ]
+        except ExceptionGroup as errors:
+            # Surface the first failure, the other locations are cancelled
+            raise errors.exceptions[0]
+
+    return [place for task in tasks for place in task.result()]
+
+
+def cached_get_google(
+    url, kwargs: dict, locations: list[tuple], max_concurrency=GOOGLE_CONCURRENCY,
+    transport=None, limiter=None, ttl=None, refresh=False, cache_dir=None,
+) -> dict:
     """
     Fetches API data from Google based on inputted URL and arguments
 
     Inputs:
-        url: Yelp API URL
+        url: Google API URL
         kwargs: arguments dictionary
+        locations: list of (latitude, longitude) tuples to search around
+        max_concurrency: maximum number of requests in flight
+        transport: optional httpx transport, e.g. a mock for testing
+        limiter: RateLimiter throttling the requests, the shared Google
+            limiter by default
+        ttl: seconds a fetched response stays cached, None to keep it
+        refresh: whether to fetch again even if the response is cached
+        cache_dir: directory of the city's response cache, CACHE_DIR by
+            default
 
     Outputs:
         dictionary of raw data returned
     """
-    key = cache_key(url, kwargs)
-
-    # If response already in cache, return it
-    CACHE_DIR.mkdir(exist_ok=True, parents=True)
-    path = CACHE_DIR / key
-    if path.exists():
-        with open(path, "r") as f:
-            all_data_dict = json.load(f)
-        return all_data_dict
-
-    # Else get from Google
-    kwargs["key"] = GOOGLE_API_KEY
-    all_places = []
-
-    # Loop through list of 15 locations distributed throughout Chicago
-    for loc in locations:
-        next_page_token = None
-        for i in range(3):  # Limit of 60 results per search, 20 per page
-            # Set location argument equal to lat/lon coordinates in loop
-            kwargs["location"] = f"{loc[0]},{loc[1]}"
-
-            # Set page token either to None or from previous httpx response
-            kwargs["page_token"] = next_page_token
-
-            response = httpx.get(url, params=kwargs)
-            if response.status_code == 200:
-                # Extend data list with fetched results, set page token
-                data = response.json()
-                all_places.extend(data.get("results", []))
-                print("Getting results", i, "for", loc)
-                next_page_token = data.get("next_page_token", None)
-                if not next_page_token:
-                    # No more results
-                    break
-                else:
-                    time.sleep(1)
-            else:
-                # Error fetching
-                raise FetchException(response)
-
-    # Save in cache
-    all_data_dict = {"places": all_places}
-    with open(path, "w") as f:
-        json.dump(all_data_dict, f, indent=1)
+    with CacheStore(cache_dir or CACHE_DIR) as store:
+        # If response already in cache, return it
+        all_data_dict = None if refresh else store.get(url, kwargs)
+        if all_data_dict is not None:
+            return all_data_dict
+
+        # Else get from Google, paging through all locations concurrently
+        all_places = asyncio.run(
+            fetch_google(url, kwargs, locations, max_concurrency, transport, limiter)
+        )
+
+        # Save in cache
+        all_data_dict = {"places": all_places}
+        store.put(url, kwargs, all_data_dict, ttl)
     return all_data_dict
 
 
+def place_rows(data: dict):
+    """
+    Reads the places of raw Google data, in one pass over the response
+
+    Inputs:
+        data: dictionary of raw data
+
+    Yields:
+        Place tuple per place
+    """
+    for place in data["places"]:
+        # Select relevant fields on park location/quality
+        location = place.get("geometry", {}).get("location", {})
+        yield Place(
+            name=place.get("name", "N/A"),
+            latitude=location.get("lat", None),
+            longitude=location.get("lng", None),
+            rating=place.get("rating", 0),
+            review_count=place.get("user_ratings_total", 0),
+            source="Google",
+        )
+
+
 def clean_google(data: dict) -> list[dict]:
     """
     Saves cleaned version of raw Google data to data directory with following:
@@ -88,32 +193,25 @@ def clean_google(data: dict) -> list[dict]:
     Outputs:
         list of dictionaries containing key information for each place
     """
-    places = []
-    for place in data["places"]:
-        # Select relevant fields on park location/quality
-        places.append(
-            {
-                "name": place.get("name", "N/A"),
-                "latitude": place.get("geometry", {})
-                .get("location", {})
-                .get("lat", None),
-                "longitude": place.get("geometry", {})
-                .get("location", {})
-                .get("lng", None),
-                "rating": place.get("rating", 0),
-                "review_count": place.get("user_ratings_total", 0),
-                "source": "Google",
-            }
-        )
-    return places
+    return [place._asdict() for place in place_rows(data)]
 
-def main():
+def search_requests(city=CHICAGO) -> list[tuple]:
+    """
+    Lists the Google searches run for a city. The last one searches around
+    the unnamed parks not merged on reviews.
+
+    Inputs:
+        city: CityConfig of the city searched
 
+    Outputs:
+        list of (output name, url, parameters) tuples
+    """
     url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
 
     # Run various searches to be saved separately
+    requests = []
     for search_category in ["park", "field", "stadium"]:
-        parameters = {"radius": "3590"}  # Roughly dividing Chicago in 15 areas
+        parameters = {"radius": str(city.search_radius)}  # Roughly dividing the city in 15 areas
 
         # Utilize more specific "type" parameter when searching for a park,
         # otherwise search using keyword if not a park search
@@ -121,20 +219,43 @@ def main():
             parameters["type"] = search_category
         else:
             parameters["keyword"] = search_category
+        requests.append(("google_" + search_category, url, parameters))
+
+    # Search for unnamed parks by location with a small radius
+    parameters = {"radius": "250", "keyword": "park"}
+    requests.append(("google_additional_parks", url, parameters))
+    return requests
 
-        google_raw_data = cached_get_google(url, parameters, CHICAGO_LOCATIONS)
-        google_clean_data = clean_google(google_raw_data)
-        save_reviews(google_clean_data, "google_" + search_category)
 
-    # Search for unnamed parks not merged on reviews,
-    # searching by location with a small radius
-    path = DATA_DIR / "parks_without_reviews.json"
+def main(city=CHICAGO, export_json=False):
+    """
+    Fetches the city's Google searches into the response cache, which
+    combine_reviews reads the places from
+
+    Inputs:
+        city: CityConfig of the city searched
+        export_json: whether to also save each search's cleaned places as JSON
+    """
+    review_dir = city.data_dir / "review_data"
+    *city_searches, additional_parks = search_requests(city)
+
+    for output_name, url, parameters in city_searches:
+        google_raw_data = cached_get_google(
+            url, parameters, city.search_locations, cache_dir=city.cache_dir
+        )
+        if export_json:
+            save_reviews(clean_google(google_raw_data), output_name, review_dir)
+
+    # Search for unnamed parks not merged on reviews
+    path = review_dir / "parks_without_reviews.json"
     unnamed_park_locations = get_unnamed_park_locations(path)
 
-    parameters = {"radius": "250", "keyword": "park"}
-    google_raw_data = cached_get_google(url, parameters, unnamed_park_locations)
-    google_clean_data = clean_google(google_raw_data)
-    save_reviews(google_clean_data, "google_additional_parks")
+    output_name, url, parameters = additional_parks
+    google_raw_data = cached_get_google(
+        url, parameters, unnamed_park_locations, cache_dir=city.cache_dir
+    )
+    if export_json:
+        save_reviews(clean_google(google_raw_data), output_name, review_dir)
     
     print("Google Reviews Fetched")
  
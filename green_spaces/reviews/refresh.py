@@ -0,0 +1,361 @@
+import math
+import time
+import geopandas as gpd
+from collections import defaultdict
+from typing import NamedTuple
+from . import google, yelp
+from .cache_store import CacheStore
+from .combine_reviews import (
+    PLACE_TABLE,
+    buffer_places,
+    combined_places,
+    place_geodataframe,
+)
+from .reviews_utils import (
+    Place,
+    get_unnamed_park_locations,
+    load_place_table,
+    place_table,
+    save_place_table,
+    save_reviews,
+    table_places,
+)
+from green_spaces.config import CHICAGO
+from green_spaces.index.index import REVIEW_BUFFER, match_reviews_buffer
+
+# Most API requests one refresh may send
+REFRESH_BUDGET = 200
+
+# Results per page, and most pages per search location, of each provider
+PAGE_SIZE = {"google": 20, "yelp": 50}
+MAX_PAGES = {"google": 3, "yelp": 5}
+
+CLEAN = {"google": google.clean_google, "yelp": yelp.clean_yelp}
+
+
+class Search(NamedTuple):
+    output_name: str  # name of the saved search results
+    provider: str  # "google" or "yelp"
+    url: str
+    params: dict
+    locations: list  # centers of a Google search, None for Yelp
+
+
+class RefreshCandidate(NamedTuple):
+    search: Search
+    age: float  # days since the cached response was fetched
+    impact: int  # reviews of the search's places matched to parks
+    cost: int  # estimated requests to fetch the search again
+    priority: float
+
+
+def city_searches(city=CHICAGO) -> list[Search]:
+    """
+    Lists the Google and Yelp searches run for a city
+
+    Inputs:
+        city: CityConfig of the city searched
+
+    Outputs:
+        list of Search tuples
+    """
+    review_dir = city.data_dir / "review_data"
+    *city_searches, additional_parks = google.search_requests(city)
+
+    searches = [
+        Search(output_name, "google", url, params, city.search_locations)
+        for output_name, url, params in city_searches
+    ]
+    unnamed_parks_path = review_dir / "parks_without_reviews.json"
+    if unnamed_parks_path.exists():
+        output_name, url, params = additional_parks
+        locations = get_unnamed_park_locations(unnamed_parks_path)
+        searches.append(Search(output_name, "google", url, params, locations))
+
+    searches += [
+        Search(output_name, "yelp", url, params, None)
+        for output_name, url, params in yelp.search_requests(city)
+    ]
+    return searches
+
+
+def place_key(place: dict) -> tuple:
+    """
+    Identifies a place across fetches by its name and location
+    """
+    lat, lon = place["latitude"], place["longitude"]
+    return (
+        place["name"],
+        None if lat is None else round(float(lat), 5),
+        None if lon is None else round(float(lon), 5),
+    )
+
+
+def estimate_cost(search: Search, n_places: int) -> int:
+    """
+    Estimates the requests needed to fetch a search again, from the number
+    of places it returned last time
+
+    Inputs:
+        search: Search to fetch
+        n_places: number of places of the cached response
+
+    Outputs:
+        number of requests
+    """
+    page_size, max_pages = PAGE_SIZE[search.provider], MAX_PAGES[search.provider]
+    if search.provider == "google":
+        # Every location is paged separately
+        n_locations = max(len(search.locations), 1)
+        pages = min(max_pages, int(n_places / n_locations) // page_size + 1)
+        return n_locations * pages
+    return min(max_pages, n_places // page_size + 1)
+
+
+def rank_searches(
+    searches: list[Search], responses: list, fetch_times: list, matched=None, now=None
+) -> list[RefreshCandidate]:
+    """
+    Ranks cached searches for refreshing, stalest and most influential first.
+    The priority of a search is its age in days, scaled up by the order of
+    magnitude of the reviews it contributes to parks.
+
+    Inputs:
+        searches: list of Search tuples
+        responses: cached response of each search, None if not cached
+        fetch_times: fetch time (epoch seconds) of each response
+        matched: set of place keys matched to parks, None to count the
+            reviews of all places
+        now: current time (epoch seconds)
+
+    Outputs:
+        list of RefreshCandidate tuples, by decreasing priority
+    """
+    now = time.time() if now is None else now
+    candidates = []
+    for search, response, fetched_at in zip(searches, responses, fetch_times):
+        if response is None or fetched_at is None:
+            # Never fetched, nothing to refresh
+            continue
+
+        places = CLEAN[search.provider](response)
+        impact = sum(
+            place["review_count"] for place in places
+            if matched is None or place_key(place) in matched
+        )
+        age = (now - fetched_at) / 86_400
+        candidates.append(
+            RefreshCandidate(
+                search=search,
+                age=age,
+                impact=impact,
+                cost=estimate_cost(search, len(places)),
+                priority=age * (1 + math.log10(1 + impact)),
+            )
+        )
+
+    return sorted(candidates, key=lambda candidate: candidate.priority, reverse=True)
+
+
+def select_within_budget(
+    candidates: list[RefreshCandidate], budget=REFRESH_BUDGET, max_searches=None
+) -> list[RefreshCandidate]:
+    """
+    Picks the highest priority searches whose estimated costs fit the budget
+
+    Inputs:
+        candidates: ranked list of RefreshCandidate tuples
+        budget: most requests to send
+        max_searches: most searches to refresh, None for no limit
+
+    Outputs:
+        list of RefreshCandidate tuples to refresh
+    """
+    selected, spent = [], 0
+    for candidate in candidates:
+        if max_searches is not None and len(selected) >= max_searches:
+            break
+        if spent + candidate.cost <= budget:
+            selected.append(candidate)
+            spent += candidate.cost
+    return selected
+
+
+def merge_ratings(old_places: list[dict], new_places: list[dict]) -> tuple:
+    """
+    Merges refreshed places into the combined places. Places keep their
+    order: changed places are updated in place, places no longer returned
+    (e.g. merged with a listing of another source) are removed and new
+    places are appended.
+
+    Inputs:
+        old_places: list of combined place dictionaries
+        new_places: list of refreshed place dictionaries
+
+    Outputs:
+        list of merged place dictionaries
+        number of changed places
+        number of added places
+        number of removed places
+    """
+    # Listings of different sources may share a name and location, so each
+    # key holds the positions of all its refreshed places
+    refreshed = defaultdict(list)
+    for i, place in enumerate(new_places):
+        refreshed[place_key(place)].append(i)
+    merged, changed, removed = [], 0, 0
+    kept = set()
+
+    for place in old_places:
+        candidates = refreshed.get(place_key(place))
+        if not candidates:
+            removed += 1
+            continue
+        # Prefer the refreshed listing of the same source
+        i = next(
+            (i for i in candidates if new_places[i]["source"] == place["source"]),
+            candidates[0],
+        )
+        candidates.remove(i)
+        kept.add(i)
+        new_place = new_places[i]
+        if any(
+            place[field] != new_place[field]
+            for field in ["rating", "review_count", "source"]
+        ):
+            changed += 1
+        merged.append(new_place)
+
+    # Remaining refreshed places are new
+    added = [place for i, place in enumerate(new_places) if i not in kept]
+    merged.extend(added)
+
+    return merged, changed, len(added), removed
+
+
+def match_places(parks, places: list[dict]) -> tuple:
+    """
+    Matches located places to parks the way the index rates parks: buffered
+    like the combined reviews, then matched with match_reviews_buffer
+
+    Inputs:
+        parks: GeoDataFrame of parks
+        places: list of place dictionaries
+
+    Outputs:
+        GeoDataFrame of the buffered located places, indexed by position in
+            places
+        match table of review (place position) to park
+    """
+    located = [
+        i for i, place in enumerate(places)
+        if place["latitude"] is not None and place["longitude"] is not None
+    ]
+    ratings = place_geodataframe([places[i] for i in located], REVIEW_BUFFER)
+    ratings.index = located
+    return ratings, match_reviews_buffer(parks, ratings)
+
+
+def park_ratings(parks, places: list[dict]) -> dict:
+    """
+    Rates parks from the places assigned to them
+
+    Inputs:
+        parks: GeoDataFrame of parks
+        places: list of place dictionaries
+
+    Outputs:
+        dictionary of park id to (total reviews, average rating)
+    """
+    ratings, matches = match_places(parks, places)
+
+    totals = defaultdict(lambda: [0, 0.0])
+    for review_id, park_id in zip(matches["review_id"], matches["park_id"]):
+        review_count = ratings.at[review_id, "review_count"]
+        totals[park_id][0] += review_count
+        totals[park_id][1] += ratings.at[review_id, "rating"] * review_count
+
+    return {
+        park_id: (total, weighted / total if total else 0.0)
+        for park_id, (total, weighted) in totals.items()
+    }
+
+
+def moved_parks(parks, old_places: list[dict], new_places: list[dict]) -> list:
+    """
+    Lists the parks whose rating or review count changed with the places
+
+    Outputs:
+        sorted list of park ids
+    """
+    old_ratings = park_ratings(parks, old_places)
+    new_ratings = park_ratings(parks, new_places)
+    return sorted(
+        str(park_id) for park_id in set(old_ratings) | set(new_ratings)
+        if old_ratings.get(park_id) != new_ratings.get(park_id)
+    )
+
+
+def main(city=CHICAGO, budget=REFRESH_BUDGET, max_searches=None, export_json=False):
+    """
+    Refetches the stalest, most influential cached searches within a request
+    budget, merges changed ratings into the combined place table and prints
+    the parks whose ratings moved, as a reminder to rerun the index. The
+    index is not run here. export_json also saves the refreshed searches
+    and the combined reviews as combined_reviews_clean.json.
+    """
+    review_dir = city.data_dir / "review_data"
+    parks = gpd.read_file(city.data_dir / "cleaned_park_polygons.geojson")
+    old_places = table_places(load_place_table(review_dir / (PLACE_TABLE + ".npy")))
+
+    searches = city_searches(city)
+    requests = [(search.url, search.params) for search in searches]
+    with CacheStore(city.cache_dir) as store:
+        responses = store.get_many(requests)
+        fetch_times = store.fetch_times(requests)
+
+    # Reviews contribute to the index through the parks they are matched to
+    _, matches = match_places(parks, old_places)
+    matched = {place_key(old_places[i]) for i in matches["review_id"]}
+
+    candidates = rank_searches(searches, responses, fetch_times, matched)
+    selected = select_within_budget(candidates, budget, max_searches)
+
+    for candidate in selected:
+        search = candidate.search
+        print(
+            f"Refreshing {search.output_name}, {candidate.age:.0f} days old,",
+            f"{candidate.impact} matched reviews, ~{candidate.cost} requests",
+        )
+        if search.provider == "google":
+            data = google.cached_get_google(
+                search.url, search.params, search.locations, refresh=True,
+                cache_dir=city.cache_dir,
+            )
+        else:
+            data = yelp.cached_get_yelp(
+                search.url, search.params, refresh=True, cache_dir=city.cache_dir
+            )
+        if export_json:
+            save_reviews(CLEAN[search.provider](data), search.output_name, review_dir)
+
+    places, changed, added, removed = merge_ratings(old_places, combined_places(city))
+    moved = moved_parks(parks, old_places, places)
+
+    save_place_table(
+        place_table(Place(**place) for place in places), PLACE_TABLE, review_dir
+    )
+    if export_json:
+        save_reviews(places, "combined_reviews_clean", review_dir)
+        buffer_places(places, 250, review_dir)
+
+    print(
+        f"Refreshed {len(selected)} searches: {changed} places changed,",
+        f"{added} added, {removed} removed, {len(moved)} park ratings moved",
+    )
+    if moved:
+        print("Rerun the index to update the housing index:", ", ".join(moved))
+
+
+if __name__ == "__main__":
+    main()
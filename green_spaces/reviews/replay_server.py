@@ -0,0 +1,273 @@
+import json
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple
+from urllib.parse import parse_qsl, urlsplit
+from . import google, yelp
+from .cache_store import CacheStore
+from green_spaces.config import CHICAGO
+
+
+# Endpoint paths served, as on the real APIs
+GOOGLE_PATH = "/maps/api/place/nearbysearch/json"
+YELP_PATH = "/v3/businesses/search"
+
+# Google serves 3 pages of 20 results, Yelp at most 240 results
+GOOGLE_PAGE_SIZE = 20
+GOOGLE_MAX_RESULTS = 60
+YELP_DEFAULT_LIMIT = 20
+YELP_MAX_RESULTS = 240
+
+# Parameters that page or place a search rather than select its places
+GOOGLE_PAGING_PARAMS = {"key", "location", "radius", "page_token", "pagetoken"}
+YELP_PAGING_PARAMS = {"location", "latitude", "longitude", "radius", "offset", "limit"}
+
+
+class ReplayConfig(NamedTuple):
+    latency: float = 0.0  # seconds added to every response
+    jitter: float = 0.0  # mean of the exponential extra latency (seconds)
+    error_rate: float = 0.0  # share of requests answered 503
+    rate_limit: float = None  # requests per second before answering 429
+    retry_after: int = 1  # Retry-After of 429 responses (seconds)
+    seed: int = None  # seed of the injected latency and errors
+
+
+def distance_meters(lat1, lon1, lat2, lon2) -> float:
+    """
+    Equirectangular distance, accurate at city scale
+    """
+    dy = (lat2 - lat1) * 111_000
+    dx = (lon2 - lon1) * 111_000 * math.cos(math.radians((lat1 + lat2) / 2))
+    return math.hypot(dx, dy)
+
+
+def signature(params: dict, paging_params: set) -> tuple:
+    """
+    Identifies the places a search selects, regardless of where it is
+    centered and which page it asks for
+    """
+    return tuple(sorted((k, v) for k, v in params.items() if k not in paging_params))
+
+
+class ReplayData:
+    """
+    Cached Google and Yelp places, pooled by search so any location and page
+    of a cached search can be answered
+    """
+
+    def __init__(self, entries):
+        """
+        Inputs:
+            entries: iterable of (url, params, data) cached responses
+        """
+        self.google = defaultdict(dict)
+        self.yelp = defaultdict(dict)
+        for url, params, data in entries:
+            if GOOGLE_PATH in url:
+                places = self.google[signature(params, GOOGLE_PAGING_PARAMS)]
+                for place in data["places"]:
+                    places.setdefault(place.get("place_id") or place.get("name"), place)
+            elif YELP_PATH in url:
+                places = self.yelp[signature(params, YELP_PAGING_PARAMS)]
+                for place in data["places"]:
+                    places.setdefault(place.get("id") or place.get("name"), place)
+
+    def google_page(self, params: dict) -> dict:
+        """
+        Answers a Nearby Search request with the cached places within its
+        radius, 20 per page
+        """
+        places = list(self.google.get(signature(params, GOOGLE_PAGING_PARAMS), {}).values())
+        if params.get("location"):
+            lat, lon = map(float, params["location"].split(","))
+            radius = float(params.get("radius") or 50_000)
+            places = [
+                place for place in places
+                if distance_meters(
+                    lat, lon,
+                    place["geometry"]["location"]["lat"],
+                    place["geometry"]["location"]["lng"],
+                ) <= radius
+            ]
+        places = places[:GOOGLE_MAX_RESULTS]
+
+        token = params.get("page_token") or params.get("pagetoken")
+        start = int(token) if token else 0
+        end = start + GOOGLE_PAGE_SIZE
+        page = {"results": places[start:end], "status": "OK" if places else "ZERO_RESULTS"}
+        if end < len(places):
+            page["next_page_token"] = str(end)
+        return page
+
+    def yelp_page(self, params: dict) -> dict:
+        """
+        Answers a Business Search request with the cached places, around
+        its coordinates if given, paged by offset and limit
+        """
+        places = list(self.yelp.get(signature(params, YELP_PAGING_PARAMS), {}).values())
+        if params.get("latitude") and params.get("longitude"):
+            lat, lon = float(params["latitude"]), float(params["longitude"])
+            radius = float(params.get("radius") or 40_000)
+            places = [
+                place for place in places
+                if distance_meters(
+                    lat, lon,
+                    place["coordinates"]["latitude"],
+                    place["coordinates"]["longitude"],
+                ) <= radius
+            ]
+        places = places[:YELP_MAX_RESULTS]
+
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or YELP_DEFAULT_LIMIT)
+        return {"businesses": places[offset:offset + limit], "total": len(places)}
+
+
+def load_replay_data(city=CHICAGO) -> ReplayData:
+    """
+    Reads the cached responses of the replay server. The city searches are
+    looked up first, so responses still in loose cache files are included.
+
+    Inputs:
+        city: CityConfig of the city whose cached searches are replayed
+    """
+    searches = google.search_requests(city) + yelp.search_requests(city)
+    with CacheStore(city.cache_dir) as store:
+        store.get_many([(url, params) for _, url, params in searches])
+        return ReplayData(store.entries())
+
+
+class _Injector:
+    """
+    Draws the latency, errors and throttling of each request, shared by the
+    server threads
+    """
+
+    def __init__(self, config: ReplayConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.tokens = config.rate_limit or 0.0
+        self.updated = time.monotonic()
+
+    def draw(self) -> tuple:
+        """
+        Returns:
+            seconds to wait, and the status to answer (200, 429 or 503)
+        """
+        with self.lock:
+            delay = self.config.latency
+            if self.config.jitter:
+                delay += self.random.expovariate(1 / self.config.jitter)
+
+            if self.config.rate_limit:
+                # token bucket holding one second of requests
+                now = time.monotonic()
+                self.tokens = min(
+                    self.config.rate_limit,
+                    self.tokens + (now - self.updated) * self.config.rate_limit,
+                )
+                self.updated = now
+                if self.tokens < 1:
+                    return delay, 429
+                self.tokens -= 1
+
+            if self.random.random() < self.config.error_rate:
+                return delay, 503
+        return delay, 200
+
+
+class ReplayServer(ThreadingHTTPServer):
+    # a deep listen backlog, so bursts of connections are not dropped and
+    # retried by the kernel, which would show up as second-long latencies
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def make_handler(data: ReplayData, config: ReplayConfig):
+    """
+    Builds the request handler class serving the replay data
+    """
+    injector = _Injector(config)
+
+    class ReplayHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = dict(parse_qsl(url.query, keep_blank_values=True))
+
+            delay, status = injector.draw()
+            time.sleep(delay)
+
+            headers = {}
+            if status == 429:
+                body = {"error": "rate limited"}
+                headers["Retry-After"] = str(config.retry_after)
+            elif status == 503:
+                body = {"error": "injected failure"}
+            elif url.path == GOOGLE_PATH:
+                body = data.google_page(params)
+            elif url.path == YELP_PATH:
+                body = data.yelp_page(params)
+            else:
+                status, body = 404, {"error": f"unknown endpoint {url.path}"}
+
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            # keep benchmark output readable
+            pass
+
+    return ReplayHandler
+
+
+def start_replay_server(data: ReplayData, config=None, host="127.0.0.1", port=0):
+    """
+    Starts the replay server in a background thread
+
+    Inputs:
+        data: ReplayData to serve
+        config: ReplayConfig of the injected latency, errors and throttling,
+            none injected if None
+        host: interface to listen on
+        port: port to listen on, any free port if 0
+
+    Returns:
+        the running ReplayServer, stopped with shutdown()
+        base URL of the server
+    """
+    if config is None:
+        config = ReplayConfig()
+    server = ReplayServer((host, port), make_handler(data, config))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def main(config=None, port=8765, city=CHICAGO):
+    if config is None:
+        config = ReplayConfig()
+    data = load_replay_data(city)
+    server = ReplayServer(("127.0.0.1", port), make_handler(data, config))
+    print(
+        f"Replaying {len(data.google)} Google and {len(data.yelp)} Yelp searches",
+        f"at http://127.0.0.1:{port}",
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,37 @@
+import asyncio
+import datetime
+import random
 import re
+import threading
+import time
 import httpx
 import json
+import math
+import numpy as np
+from email.utils import parsedate_to_datetime
 from pathlib import Path
 from typing import NamedTuple
 
 DATA_DIR = Path(__file__).parent.parent.parent / "data" / "review_data"
 
-# List of 15 locations spread out throughout Chicago
-CHICAGO_LOCATIONS = [
-    (41.7033, -87.8980),
-    (41.7033, -87.8140),
-    (41.7033, -87.7300),
-    (41.7033, -87.6460),
-    (41.7033, -87.5620),
-    (41.8300, -87.8980),
-    (41.8300, -87.8140),
-    (41.8300, -87.7300),
-    (41.8300, -87.6460),
-    (41.8300, -87.5620),
-    (41.9567, -87.8980),
-    (41.9567, -87.8140),
-    (41.9567, -87.7300),
-    (41.9567, -87.6460),
-    (41.9567, -87.5620),
+# Per-provider request rate (requests per second) and daily request budget
+RATE_LIMITS = {
+    "google": {"qps": 10, "daily_budget": 100_000},
+    "yelp": {"qps": 5, "daily_budget": 5_000},
+}
+
+# Responses worth retrying: throttling and transient server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Columns of the place table, string columns UTF-8 encoded and sized to
+# their longest value
+PLACE_COLUMNS = [
+    ("name", "S"),
+    ("latitude", "f8"),
+    ("longitude", "f8"),
+    ("rating", "f8"),
+    ("review_count", "i8"),
+    ("source", "S"),
 ]
 
 class Place(NamedTuple):
@@ -45,6 +54,218 @@ class FetchException(Exception):
         )
 
 
+class BudgetExceeded(Exception):
+    """
+    Raised when a provider's daily request budget is used up.
+    """
+
+
+def retry_after_seconds(retry_after: str):
+    """
+    Parses a Retry-After header, either seconds or an HTTP date
+
+    Returns:
+        seconds to wait, None if the header is malformed
+    """
+    try:
+        seconds = float(retry_after)
+    except ValueError:
+        pass
+    else:
+        # "nan" and "inf" parse as floats but are no delay to sleep for
+        return seconds if math.isfinite(seconds) else None
+    try:
+        when = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.UTC)
+    return (when - datetime.datetime.now(datetime.UTC)).total_seconds()
+
+
+class LimiterStats(NamedTuple):
+    requests: int  # requests sent, retries included
+    retries: int  # requests retried after a throttled or failed response
+    throttled: float  # seconds spent waiting for tokens or backing off
+
+
+class RateLimiter:
+    """
+    Token bucket limiting the request rate to a provider, with a daily
+    request budget and retries that honor Retry-After or back off
+    exponentially with jitter. One limiter is shared by all fetchers of a
+    provider, from threads or from asyncio tasks. With a store, the daily
+    request count is kept in the response cache, so the budget holds across
+    runs and processes.
+    """
+
+    def __init__(
+        self,
+        qps: float,
+        burst: int = 1,
+        daily_budget: int | None = None,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        clock=time.monotonic,
+        provider: str | None = None,
+        store=None,
+    ):
+        """
+        Inputs:
+            qps: requests per second
+            burst: requests that may be sent at once
+            daily_budget: most requests per day, None for no budget
+            max_retries: retries of a throttled or failed request
+            base_delay, max_delay: bounds of the retry backoff (seconds)
+            clock: monotonic clock, replaced in tests
+            provider: provider name the store counts requests under
+            store: CacheStore persisting the daily request count, None to
+                count in memory
+        """
+        self.qps = qps
+        self.burst = burst
+        self.daily_budget = daily_budget
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.provider = provider
+        self.store = store
+
+        self.tokens = float(burst)
+        self.updated = clock()
+        self.day = datetime.date.today()
+        self.day_requests = 0
+        self.lock = threading.Lock()
+
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0.0
+
+    def stats(self) -> LimiterStats:
+        return LimiterStats(self.requests, self.retries, self.throttled)
+
+    def reserve(self) -> float:
+        """
+        Take a token for one request, charging the daily budget
+
+        Returns:
+            seconds to wait before sending the request
+        """
+        with self.lock:
+            today = datetime.date.today()
+            if today != self.day:
+                self.day, self.day_requests = today, 0
+            if self.store is not None:
+                day_requests = self.store.count_request(
+                    self.provider, today.isoformat(), self.daily_budget
+                )
+                if day_requests is None:
+                    raise BudgetExceeded(f"Daily budget of {self.daily_budget} requests used")
+                self.day_requests = day_requests
+            elif self.daily_budget is not None and self.day_requests >= self.daily_budget:
+                raise BudgetExceeded(f"Daily budget of {self.daily_budget} requests used")
+            else:
+                self.day_requests += 1
+            self.requests += 1
+
+            # refill, then take a token; a negative balance is a reservation
+            # on tokens still to come
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.qps)
+            self.updated = now
+            self.tokens -= 1
+            wait = max(0.0, -self.tokens / self.qps)
+            self.throttled += wait
+            return wait
+
+    def retry_delay(self, response, attempt: int) -> float:
+        """
+        Seconds to wait before retrying, from the Retry-After header when
+        present and valid, else exponential backoff with full jitter
+
+        Inputs:
+            response: httpx.Response, or None after a transport error
+            attempt: number of the retry, starting at 0
+        """
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        delay = retry_after_seconds(retry_after) if retry_after else None
+        if delay is None:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        else:
+            delay = min(max(delay, 0.0), self.max_delay)
+
+        with self.lock:
+            self.retries += 1
+            self.throttled += delay
+        return delay
+
+    def request(self, send, *args, **kwargs) -> httpx.Response:
+        """
+        Send a request through the limiter, retrying throttled and failed
+        responses
+
+        Inputs:
+            send: function sending the request, e.g. httpx.get
+            args, kwargs: arguments of send
+
+        Returns:
+            the first successful response, or the last one once retries
+            are exhausted
+        """
+        for attempt in range(self.max_retries + 1):
+            time.sleep(self.reserve())
+            try:
+                response = send(*args, **kwargs)
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                response = None
+            if response is not None and response.status_code not in RETRY_STATUS_CODES:
+                return response
+            if attempt < self.max_retries:
+                time.sleep(self.retry_delay(response, attempt))
+        return response
+
+    async def request_async(self, send, *args, **kwargs) -> httpx.Response:
+        """
+        Async version of request, for sends such as httpx.AsyncClient.get
+        """
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(self.reserve())
+            try:
+                response = await send(*args, **kwargs)
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                response = None
+            if response is not None and response.status_code not in RETRY_STATUS_CODES:
+                return response
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.retry_delay(response, attempt))
+        return response
+
+
+_limiters = {}
+
+
+def get_limiter(provider: str) -> RateLimiter:
+    """
+    Returns the rate limiter shared by all fetchers of a provider
+    """
+    if provider not in _limiters:
+        # imported here, the cache store imports this module
+        from .cache_store import CacheStore
+
+        # the limiter's lock serializes the fetcher threads' use of the store
+        store = CacheStore(read_legacy=False, check_same_thread=False)
+        _limiters[provider] = RateLimiter(
+            **RATE_LIMITS[provider], provider=provider, store=store
+        )
+    return _limiters[provider]
+
+
 def cache_key(url: str, kwargs: dict) -> str:
     """
     Inputs:
@@ -88,10 +309,104 @@ def get_unnamed_park_locations(path) -> list[tuple]:
     return all_coords
 
 
-def save_reviews(places: list[dict], output_name: str):
+def save_reviews(places: list[dict], output_name: str, data_dir=DATA_DIR):
     """
     Saves review data to directory
     """
-    path = DATA_DIR / (output_name + ".json")
+    path = data_dir / (output_name + ".json")
     with open(path, "w") as f:
         json.dump(places, f, indent=1)
+
+
+def place_table(places) -> np.ndarray:
+    """
+    Builds the typed columnar place table, a NumPy structured array with one
+    row per place. Missing names are stored empty, missing coordinates as
+    NaN and missing ratings as 0.
+
+    Inputs:
+        places: iterable of Place tuples
+
+    Returns:
+        structured array with the PLACE_COLUMNS fields
+    """
+    rows = [
+        (
+            (place.name or "").encode(),
+            math.nan if place.latitude is None else float(place.latitude),
+            math.nan if place.longitude is None else float(place.longitude),
+            place.rating or 0,
+            place.review_count or 0,
+            place.source.encode(),
+        )
+        for place in places
+    ]
+    name_width = max((len(row[0]) for row in rows), default=0)
+    source_width = max((len(row[5]) for row in rows), default=0)
+    widths = {"name": max(name_width, 1), "source": max(source_width, 1)}
+    dtype = np.dtype(
+        [
+            (column, kind + str(widths[column]) if kind == "S" else kind)
+            for column, kind in PLACE_COLUMNS
+        ]
+    )
+    return np.array(rows, dtype=dtype)
+
+
+def table_places(table: np.ndarray) -> list[dict]:
+    """
+    Converts a place table back to place dictionaries, e.g. for a JSON
+    export
+
+    Inputs:
+        table: structured array built by place_table
+
+    Returns:
+        list of place dictionaries, missing values as None
+    """
+    places = []
+    for name, latitude, longitude, rating, review_count, source in table.tolist():
+        places.append(
+            Place(
+                name=name.decode() or None,
+                latitude=None if math.isnan(latitude) else latitude,
+                longitude=None if math.isnan(longitude) else longitude,
+                rating=rating,
+                review_count=review_count,
+                source=source.decode(),
+            )._asdict()
+        )
+    return places
+
+
+def table_columns(table: np.ndarray) -> dict:
+    """
+    Columns of a place table, e.g. to build a dataframe. Numeric columns are
+    views of the table, string columns are decoded.
+
+    Inputs:
+        table: structured array built by place_table
+
+    Returns:
+        dictionary of column name to array
+    """
+    return {
+        column: np.char.decode(table[column]) if kind == "S" else table[column]
+        for column, kind in PLACE_COLUMNS
+    }
+
+
+def save_place_table(table: np.ndarray, output_name: str, data_dir=DATA_DIR):
+    """
+    Saves a place table to directory as one binary .npy file
+    """
+    path = data_dir / (output_name + ".npy")
+    np.save(path, table, allow_pickle=False)
+
+
+def load_place_table(path) -> np.ndarray:
+    """
+    Loads a place table memory-mapped, so columns are read from the file
+    without copying, e.g. table["rating"]
+    """
+    return np.load(path, mmap_mode="r", allow_pickle=False)
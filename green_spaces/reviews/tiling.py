@@ -0,0 +1,232 @@
+import numpy as np
+from collections import deque
+from typing import NamedTuple
+from .cache_store import CacheStore
+from .google import cached_get_google, clean_google, search_requests as google_searches
+from .yelp import cached_get_yelp, clean_yelp, search_requests as yelp_searches
+from .reviews_utils import save_reviews
+from green_spaces.config import CHICAGO
+
+# Most results a single search returns (Google: 3 pages of 20, Yelp: 240)
+GOOGLE_RESULT_CAP = 60
+YELP_RESULT_CAP = 240
+
+# Largest search radius each provider accepts (in meters)
+GOOGLE_MAX_RADIUS = 50_000
+YELP_MAX_RADIUS = 40_000
+
+# Saturated tiles are not split below this search radius (in meters)
+MIN_RADIUS = 100
+
+
+class Tile(NamedTuple):
+    north: float
+    south: float
+    east: float
+    west: float
+
+    @property
+    def center(self) -> tuple:
+        return (
+            round((self.north + self.south) / 2, 6),
+            round((self.east + self.west) / 2, 6),
+        )
+
+    @property
+    def radius(self) -> int:
+        """
+        Radius (in meters) of the circle around the center covering the tile
+        """
+        height = (self.north - self.south) * 111_000
+        width = (self.east - self.west) * 111_000 * np.cos(
+            np.radians((self.north + self.south) / 2)
+        )
+        return int(np.ceil(np.hypot(height, width) / 2))
+
+    def split(self) -> list:
+        """
+        Splits the tile into its four quadrants
+        """
+        lat, lon = (self.north + self.south) / 2, (self.east + self.west) / 2
+        return [
+            Tile(self.north, lat, lon, self.west),
+            Tile(self.north, lat, self.east, lon),
+            Tile(lat, self.south, lon, self.west),
+            Tile(lat, self.south, self.east, lon),
+        ]
+
+
+class TilingResult(NamedTuple):
+    places: list  # unique raw places found
+    tiles: list  # tiles searched without saturating, or at the smallest size
+    calls: int  # searches run
+    truncated: list  # tiles still saturated at the smallest size
+
+
+def adaptive_search(
+    search, bbox: tuple, cap: int, key, max_radius=None, min_radius=MIN_RADIUS
+) -> TilingResult:
+    """
+    Searches a bounding box with a quadtree of tiles: a tile whose search hits
+    the provider's result cap may have missed places, so it is split into
+    quadrants searched in turn, until the searches stop saturating. Sparse
+    areas take a single search while dense ones are covered completely.
+
+    Inputs:
+        search: function taking a Tile and returning the list of raw places
+            found within its radius
+        bbox: (north, south, east, west) bounds to cover
+        cap: most results a single search returns
+        key: function returning the identifier of a raw place, used to
+            remove places found by overlapping tiles
+        max_radius: largest radius the provider accepts, larger tiles are
+            split without searching
+        min_radius: saturated tiles with a smaller radius are not split
+
+    Outputs:
+        TilingResult
+    """
+    places = {}
+    tiles, truncated = [], []
+    calls = 0
+
+    queue = deque([Tile(*bbox)])
+    while queue:
+        tile = queue.popleft()
+        if max_radius is not None and tile.radius > max_radius:
+            queue.extend(tile.split())
+            continue
+
+        results = search(tile)
+        calls += 1
+        for place in results:
+            places.setdefault(key(place), place)
+
+        if len(results) < cap:
+            tiles.append(tile)
+        elif tile.radius / 2 < min_radius:
+            tiles.append(tile)
+            truncated.append(tile)
+        else:
+            queue.extend(tile.split())
+
+    return TilingResult(list(places.values()), tiles, calls, truncated)
+
+
+def google_place_key(place: dict):
+    """
+    Identifier of a raw Google place
+    """
+    location = place.get("geometry", {}).get("location", {})
+    return place.get("place_id") or (place.get("name"), location.get("lat"), location.get("lng"))
+
+
+def yelp_place_key(place: dict):
+    """
+    Identifier of a raw Yelp place
+    """
+    coordinates = place.get("coordinates", {})
+    return place.get("id") or (
+        place.get("name"), coordinates.get("latitude"), coordinates.get("longitude")
+    )
+
+
+def tiled_request(url, parameters: dict) -> tuple:
+    """
+    Returns the cache request under which the places a search found over
+    adaptive tiles are stored, next to the fixed grid response of the
+    same search
+
+    Inputs:
+        url: API URL of the search
+        parameters: search parameters, as listed by search_requests
+
+    Outputs:
+        (url, parameters) tuple
+    """
+    return url, {**parameters, "tiling": "adaptive"}
+
+
+def google_tile_search(url, parameters: dict, cache_dir=None):
+    """
+    Returns a function running a cached Google search around a tile
+
+    Inputs:
+        url: Google API URL
+        parameters: search parameters, without location and radius
+        cache_dir: directory of the city's response cache
+    """
+
+    def search(tile: Tile) -> list:
+        lat, lon = tile.center
+        kwargs = dict(parameters)
+        kwargs["location"] = f"{lat},{lon}"
+        kwargs["radius"] = str(tile.radius)
+        data = cached_get_google(url, kwargs, [tile.center], cache_dir=cache_dir)
+        return data["places"]
+
+    return search
+
+
+def yelp_tile_search(url, headers: dict, cache_dir=None):
+    """
+    Returns a function running a cached Yelp search around a tile
+
+    Inputs:
+        url: Yelp API URL
+        headers: search parameters, without location
+        cache_dir: directory of the city's response cache
+    """
+
+    def search(tile: Tile) -> list:
+        lat, lon = tile.center
+        kwargs = {k: v for k, v in headers.items() if k != "location"}
+        kwargs["latitude"] = str(lat)
+        kwargs["longitude"] = str(lon)
+        kwargs["radius"] = str(tile.radius)
+        return cached_get_yelp(url, kwargs, cache_dir=cache_dir)["places"]
+
+    return search
+
+
+def main(city=CHICAGO):
+    """
+    Fetches the city-wide Google and Yelp searches over adaptive tiles
+    instead of the fixed search grid. The places each search found are
+    cached under its tiled request, which combine_reviews reads along with
+    the fixed grid responses.
+
+    Inputs:
+        city: CityConfig of the city searched
+    """
+    review_dir = city.data_dir / "review_data"
+
+    # the last Google search covers unnamed parks, not the whole city
+    for output_name, url, parameters in google_searches(city)[:-1]:
+        tile_parameters = {k: v for k, v in parameters.items() if k != "radius"}
+        result = adaptive_search(
+            google_tile_search(url, tile_parameters, city.cache_dir), city.bbox,
+            GOOGLE_RESULT_CAP, google_place_key, GOOGLE_MAX_RADIUS,
+        )
+        print(f"{output_name}: {len(result.places)} places in {result.calls} calls,",
+              f"{len(result.truncated)} tiles truncated")
+        with CacheStore(city.cache_dir) as store:
+            store.put(*tiled_request(url, parameters), {"places": result.places})
+        save_reviews(clean_google({"places": result.places}), output_name, review_dir)
+
+    for output_name, url, headers in yelp_searches(city):
+        result = adaptive_search(
+            yelp_tile_search(url, headers, city.cache_dir), city.bbox, YELP_RESULT_CAP,
+            yelp_place_key, YELP_MAX_RADIUS,
+        )
+        print(f"{output_name}: {len(result.places)} places in {result.calls} calls,",
+              f"{len(result.truncated)} tiles truncated")
+        with CacheStore(city.cache_dir) as store:
+            store.put(*tiled_request(url, headers), {"places": result.places})
+        save_reviews(clean_yelp({"places": result.places}), output_name, review_dir)
+
+    print("Reviews Fetched Over Adaptive Tiles")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,9 @@
 import httpx
 import os
-import json
-import time
 from pathlib import Path
-from .reviews_utils import cache_key, FetchException, save_reviews
+from .cache_store import CacheStore
+from .reviews_utils import FetchException, Place, save_reviews, get_limiter
+from green_spaces.config import CHICAGO
 
 DATA_DIR = Path(__file__).parent.parent.parent / "data" / "review_data"
 CACHE_DIR = Path(__file__).parent.parent.parent / "cache"
@@ -11,52 +11,129 @@ CACHE_DIR = Path(__file__).parent.parent.parent / "cache"
 # Set Yelp API Key (not needed if using cached files)
 YELP_API_KEY = f"Bearer {os.environ.get('YELP_API_KEY')}"
 
+# Results per Yelp request (the API defaults to 20 and allows up to 50),
+# and most results of a search
+YELP_PAGE_SIZE = 50
+YELP_MAX_RESULTS = 240
 
-def cached_get_yelp(url, kwargs: dict) -> dict:
+
+def search_requests(city=CHICAGO) -> list[tuple]:
+    """
+    Lists the Yelp searches run for a city
+
+    Inputs:
+        city: CityConfig of the city searched
+
+    Outputs:
+        list of (output name, url, headers) tuples
+    """
+    url = "https://api.yelp.com/v3/businesses/search"
+
+    # Search in multiple Yelp categories
+    requests = []
+    for search_category in ["parks", "playgrounds", "dog_parks", "communitygardens"]:
+        # Always search in the city, by "best match" with search category
+        headers = {"location": city.yelp_location, "sort_by": "best_match"}
+        headers["categories"] = search_category
+        requests.append(("yelp_" + search_category, url, headers))
+    return requests
+
+
+def cached_get_yelp(
+    url, kwargs: dict, limiter=None, ttl=None, refresh=False, cache_dir=None
+) -> dict:
     """
     Fetches API data from Yelp based on inputted URL and headers
 
     Inputs:
         url: Yelp API URL
         kwargs: headers dictionary
+        limiter: RateLimiter throttling the requests, the shared Yelp
+            limiter by default
+        ttl: seconds a fetched response stays cached, None to keep it
+        refresh: whether to fetch again even if the response is cached
+        cache_dir: directory of the city's response cache, CACHE_DIR by
+            default
 
     Outputs:
         dictionary of raw data returned
     """
-    key = cache_key(url, kwargs)
+    with CacheStore(cache_dir or CACHE_DIR) as store:
+        # If response already in cache, return it
+        all_data_dict = None if refresh else store.get(url, kwargs)
+        if all_data_dict is not None:
+            return all_data_dict
+
+        # Else get from Yelp, within the provider's rate limit
+        all_places = fetch_yelp(url, kwargs, limiter)
+
+        # Save in cache
+        all_data_dict = {"places": all_places}
+        store.put(url, kwargs, all_data_dict, ttl)
+    return all_data_dict
+
+
+def fetch_yelp(url, kwargs: dict, limiter=None, transport=None) -> list:
+    """
+    Pages through the Yelp results of a search over one pooled client
 
-    # If response already in cache, return it
-    CACHE_DIR.mkdir(exist_ok=True, parents=True)
-    path = CACHE_DIR / key
-    if path.exists():
-        with open(path, "r") as f:
-            all_data_dict = json.load(f)
-        return all_data_dict
+    Inputs:
+        url: Yelp API URL
+        kwargs: headers dictionary
+        limiter: RateLimiter throttling the requests, the shared Yelp
+            limiter by default
+        transport: optional httpx transport, e.g. a mock for testing
 
-    # Else get from Yelp
+    Outputs:
+        list of raw places
+    """
+    limiter = limiter or get_limiter("yelp")
     all_places = []
     headers = {
         "accept": "application/json",
         "Authorization": YELP_API_KEY,
     }
-    for offset in range(0, 250, 50):  # Yelp limits to 50 per call, 240 total
-        kwargs["offset"] = str(offset)
-        response = httpx.get(url, params=kwargs, headers=headers)
-
-        if response.status_code == 200:
-            # Successful get, add all fetched results to list
-            data = response.json()
-            all_places.extend(data["businesses"])
-        else:
-            raise FetchException(response)
-
-        time.sleep(1)
-
-    # Save in cache
-    all_data_dict = {"places": all_places}
-    with open(path, "w") as f:
-        json.dump(all_data_dict, f, indent=1)
-    return all_data_dict
+    params = dict(kwargs)
+    with httpx.Client(transport=transport) as client:
+        for offset in range(0, YELP_MAX_RESULTS, YELP_PAGE_SIZE):
+            params["offset"] = str(offset)
+            params["limit"] = str(min(YELP_PAGE_SIZE, YELP_MAX_RESULTS - offset))
+            response = limiter.request(client.get, url, params=params, headers=headers)
+
+            if response.status_code == 200:
+                # Successful get, add all fetched results to list
+                data = response.json()
+                all_places.extend(data["businesses"])
+            else:
+                raise FetchException(response)
+
+            if len(data["businesses"]) < int(params["limit"]):
+                # No more results
+                break
+
+    return all_places
+
+
+def place_rows(data: dict):
+    """
+    Reads the places of raw Yelp data, in one pass over the response
+
+    Inputs:
+        data: dictionary of raw data
+
+    Yields:
+        Place tuple per place
+    """
+    for place in data["places"]:
+        coordinates = place.get("coordinates", {})
+        yield Place(
+            name=place.get("name"),
+            latitude=coordinates.get("latitude"),
+            longitude=coordinates.get("longitude"),
+            rating=place.get("rating", 0),
+            review_count=place.get("review_count", 0),
+            source="Yelp",
+        )
 
 
 def clean_yelp(data: dict) -> list[dict]:
@@ -70,33 +147,21 @@ def clean_yelp(data: dict) -> list[dict]:
     Returns:
         list of cleaned data dictionaries as specified above
     """
-    places = []
-    for place in data["places"]:
-        places.append(
-            {
-                "name": place.get("name"),
-                "latitude": place.get("coordinates", {}).get("latitude"),
-                "longitude": place.get("coordinates", {}).get("longitude"),
-                "rating": place.get("rating", 0),
-                "review_count": place.get("review_count", 0),
-                "source": "Yelp",
-            }
-        )
-    return places
+    return [place._asdict() for place in place_rows(data)]
 
-def main():
-    url = "https://api.yelp.com/v3/businesses/search"
-
-    # Search in multiple Yelp categories
-    for search_category in ["parks", "playgrounds", "dog_parks", "communitygardens"]:
-        # Always search in Chicago, by "best match" with search category
-        headers = {"location": "Chicago", "sort_by": "best_match"}
-        headers["categories"] = search_category
+def main(city=CHICAGO, export_json=False):
+    """
+    Fetches the city's Yelp searches into the response cache, which
+    combine_reviews reads the places from
 
-        # For each query, get raw data, clean, and save
-        yelp_raw_data = cached_get_yelp(url, headers)
-        places = clean_yelp(yelp_raw_data)
-        save_reviews(places, "yelp_" + search_category)
+    Inputs:
+        city: CityConfig of the city searched
+        export_json: whether to also save each search's cleaned places as JSON
+    """
+    for output_name, url, headers in search_requests(city):
+        yelp_raw_data = cached_get_yelp(url, headers, cache_dir=city.cache_dir)
+        if export_json:
+            save_reviews(clean_yelp(yelp_raw_data), output_name, city.data_dir / "review_data")
         
     print("Yelp Reviews Fetched")
 
@@ -0,0 +1,203 @@
+import gzip
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from .reviews_utils import Place, save_reviews
+from green_spaces.config import CHICAGO
+
+# Directory of the Yelp Open Dataset dumps (JSON lines, optionally gzipped,
+# possibly split into several shard files)
+DATASET_DIR = Path(__file__).parent.parent.parent / "data" / "yelp_dataset"
+BUSINESS_FILES = "yelp_academic_dataset_business*.json*"
+REVIEW_FILES = "yelp_academic_dataset_review*.json*"
+
+# Yelp category titles of the API searches in yelp.py
+DATASET_CATEGORIES = ["Parks", "Playgrounds", "Dog Parks", "Community Gardens"]
+
+# Bytes of an uncompressed dump read by one worker task
+SHARD_SIZE = 64 * 1024 * 1024
+
+
+def file_shards(paths: list, shard_size=SHARD_SIZE) -> list[tuple]:
+    """
+    Splits JSON lines files into byte ranges read by separate workers.
+    Gzipped files cannot be read from an offset, so each is one shard.
+
+    Inputs:
+        paths: list of JSON lines file paths
+        shard_size: bytes per shard
+
+    Outputs:
+        list of (path, start, end) tuples, end None for the end of the file
+    """
+    shards = []
+    for path in paths:
+        path = str(path)
+        size = os.path.getsize(path)
+        if path.endswith(".gz") or size <= shard_size:
+            shards.append((path, 0, None))
+            continue
+        for start in range(0, size, shard_size):
+            shards.append((path, start, min(start + shard_size, size)))
+    return shards
+
+
+def iter_shard(path: str, start=0, end=None):
+    """
+    Streams the records of a byte range of a JSON lines file, one line at a
+    time. A line belongs to the shard it starts in.
+
+    Inputs:
+        path: JSON lines file, gzipped if it ends with .gz
+        start: offset of the range
+        end: end offset of the range, None for the end of the file
+
+    Yields:
+        dictionary per record
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        if start > 0:
+            # Skip to the first line starting in the range
+            f.seek(start - 1)
+            f.readline()
+        while end is None or f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            if line.strip():
+                yield json.loads(line)
+
+
+def in_bbox(record: dict, bbox: tuple) -> bool:
+    north, south, east, west = bbox
+    lat, lon = record.get("latitude"), record.get("longitude")
+    return lat is not None and lon is not None and south <= lat <= north and west <= lon <= east
+
+
+def filter_businesses(shard: tuple, bbox: tuple, categories: list) -> dict:
+    """
+    Keeps the businesses of a shard within the bounding box and in one of
+    the categories
+
+    Inputs:
+        shard: (path, start, end) tuple
+        bbox: (north, south, east, west) bounds
+        categories: Yelp category titles
+
+    Outputs:
+        dictionary of business id to business record
+    """
+    categories = set(categories)
+    businesses = {}
+    for record in iter_shard(*shard):
+        business_categories = {
+            category.strip() for category in (record.get("categories") or "").split(",")
+        }
+        if business_categories & categories and in_bbox(record, bbox):
+            businesses[record["business_id"]] = {
+                "name": record.get("name"),
+                "latitude": record["latitude"],
+                "longitude": record["longitude"],
+                "stars": record.get("stars", 0),
+                "review_count": record.get("review_count", 0),
+            }
+    return businesses
+
+
+def aggregate_reviews(shard: tuple, business_ids: set) -> dict:
+    """
+    Sums the review stars of the kept businesses in a shard. Memory is
+    bounded by the number of kept businesses, not the size of the dump.
+
+    Inputs:
+        shard: (path, start, end) tuple
+        business_ids: ids of the kept businesses
+
+    Outputs:
+        dictionary of business id to [review count, sum of stars]
+    """
+    totals = defaultdict(lambda: [0, 0.0])
+    for record in iter_shard(*shard):
+        business_id = record.get("business_id")
+        if business_id in business_ids:
+            totals[business_id][0] += 1
+            totals[business_id][1] += record.get("stars", 0)
+    return dict(totals)
+
+
+def ingest_dataset(
+    business_paths: list, review_paths: list, bbox: tuple,
+    categories=DATASET_CATEGORIES, max_workers=None, shard_size=SHARD_SIZE,
+) -> list[dict]:
+    """
+    Streams Yelp Open Dataset dumps into place records, reading shards in
+    worker processes. Ratings and review counts are aggregated from the
+    review dump, falling back to the business record for businesses without
+    reviews in it.
+
+    Inputs:
+        business_paths: business dump files
+        review_paths: review dump files, may be empty
+        bbox: (north, south, east, west) bounds to keep businesses in
+        categories: Yelp category titles to keep
+        max_workers: number of worker processes
+        shard_size: bytes per shard
+
+    Outputs:
+        list of place dictionaries, as saved by the Yelp API searches
+    """
+    business_shards = file_shards(business_paths, shard_size)
+    review_shards = file_shards(review_paths, shard_size)
+
+    businesses = {}
+    totals = defaultdict(lambda: [0, 0.0])
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for shard_businesses in executor.map(
+            filter_businesses, business_shards,
+            [bbox] * len(business_shards), [categories] * len(business_shards),
+        ):
+            businesses.update(shard_businesses)
+
+        business_ids = set(businesses)
+        for shard_totals in executor.map(
+            aggregate_reviews, review_shards, [business_ids] * len(review_shards)
+        ):
+            for business_id, (count, stars) in shard_totals.items():
+                totals[business_id][0] += count
+                totals[business_id][1] += stars
+
+    places = []
+    for business_id, business in businesses.items():
+        review_count, stars = totals.get(business_id, (0, 0.0))
+        if review_count:
+            rating = round(stars / review_count, 2)
+        else:
+            rating, review_count = business["stars"], business["review_count"]
+        places.append(
+            Place(
+                name=business["name"],
+                latitude=business["latitude"],
+                longitude=business["longitude"],
+                rating=rating,
+                review_count=review_count,
+                source="Yelp Dataset",
+            )._asdict()
+        )
+    return places
+
+
+def main(city=CHICAGO, dataset_dir=DATASET_DIR, max_workers=None):
+    business_paths = sorted(Path(dataset_dir).glob(BUSINESS_FILES))
+    review_paths = sorted(Path(dataset_dir).glob(REVIEW_FILES))
+
+    places = ingest_dataset(business_paths, review_paths, city.bbox, max_workers=max_workers)
+    save_reviews(places, "yelp_dataset", city.data_dir / "review_data")
+
+    print(f"Yelp Dataset Ingested: {len(places)} places")
+
+
+if __name__ == "__main__":
+    main()
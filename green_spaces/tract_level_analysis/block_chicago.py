@@ -2,15 +2,15 @@ import osmnx as ox
 import geopandas as gpd
 from shapely.geometry import Point, Polygon
 import pandas as pd
-from pathlib import Path
+from green_spaces.config import CHICAGO
 
-def get_chicago_buildings():
+def get_chicago_buildings(city=CHICAGO):
     """
-    Retrieve building footprints for Chicago using OSMNX.
+    Retrieve building footprints for a city (Chicago by default) using OSMNX.
     Returns both the building polygons and their centroids.
     """
-    # Chicago boundaries
-    north, south, east, west = 42.023131, 41.644286, -87.523661, -87.940101
+    # City boundaries
+    north, south, east, west = city.bbox
 
     try:
         # Get building footprints
@@ -22,16 +22,18 @@ def get_chicago_buildings():
         # Convert to GeoDataFrame
         #buildings_gdf = gpd.GeoDataFrame(buildings)
         
-        # Create centroids
-        centroids_gdf = buildings_gdf.copy()
-        centroids_gdf['geometry'] = buildings_gdf.centroid
-        
-        return buildings_gdf, centroids_gdf
+        return buildings_gdf, building_centroids(buildings_gdf)
     
     except Exception as e:
         print(f"Error retrieving building data: {e}")
         return None, None
 
+def building_centroids(buildings_gdf):
+    """Create the centroids of building footprints."""
+    centroids_gdf = buildings_gdf.copy()
+    centroids_gdf['geometry'] = buildings_gdf.centroid
+    return centroids_gdf
+
 def save_data(buildings_gdf, centroids_gdf, output_dir):
     """Save the GeoDataFrames to files."""
     try:
@@ -48,13 +50,13 @@ def save_data(buildings_gdf, centroids_gdf, output_dir):
     except Exception as e:
         print(f"Error saving data: {e}")
 
-def main():
+def main(city=CHICAGO):
     # Set output directory
-    output_dir = Path(__file__).parent.parent / "data" / "processed"
+    output_dir = city.data_dir / "processed"
     
     # Get building data
-    print("Retrieving Chicago building data...")
-    buildings_gdf, centroids_gdf = get_chicago_buildings()
+    print(f"Retrieving {city.name.title()} building data...")
+    buildings_gdf, centroids_gdf = get_chicago_buildings(city)
     
     if buildings_gdf is not None and centroids_gdf is not None:
         print(f"Retrieved {len(buildings_gdf)} buildings")
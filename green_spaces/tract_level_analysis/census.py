@@ -1,16 +1,17 @@
 import cenpy as cp
 import pandas as pd
-from pathlib import Path
 from typing import List
+from green_spaces.config import CHICAGO
 
-def get_census_data(year, variables: List[str], geo_level='tract'):
+def get_census_data(year, variables: List[str], geo_level='tract', city=CHICAGO):
     """
-    Retrieve census data for Chicago at the specified geographic level.
+    Retrieve census data for a city at the specified geographic level.
 
     Args:
         year (str): Census year (e.g., '2019')
         variables (list): List of census variable codes to retrieve
         geo_level (str): Geographic level ('tract' or 'block group')
+        city (CityConfig): City whose county is retrieved
 
     Returns:
         DataFrame: Census data for the specified variables and geography
@@ -20,9 +21,10 @@ def get_census_data(year, variables: List[str], geo_level='tract'):
         dataset = f'ACSDT5Y{year}'
         conn = cp.remote.APIConnection(dataset)
 
-        # Define Cook County, Illinois (FIPS code 17031) to encompass Chicago
-        state_fips = '17'  # Illinois
-        county_fips = '031'  # Cook County
+        # Define the county encompassing the city (Cook County, FIPS code
+        # 17031, for Chicago)
+        state_fips = city.state_fips
+        county_fips = city.county_fips
 
         # Query the specified variables at the geographic level
         data = conn.query(
@@ -37,16 +39,16 @@ def get_census_data(year, variables: List[str], geo_level='tract'):
         print(f"Error retrieving census data: {e}")
         return None
     
-def main():
+def main(city=CHICAGO):
     
     year = '2022'
     variables = ['B19013_001E', 'B02001_001E', 'B02001_003E']
     geo_level = 'tract'
 
     # Fetch the data
-    output_dir = Path(__file__).parent.parent.parent / "data" / "grid_and_tracts" / "processed" / "census"
+    output_dir = city.data_dir / "grid_and_tracts" / "processed" / "census"
     output_dir.mkdir(parents=True, exist_ok=True)
-    census_data = get_census_data(year, variables, geo_level)
+    census_data = get_census_data(year, variables, geo_level, city)
 
     if census_data is not None:
         # Calculate the percentage of the Black population
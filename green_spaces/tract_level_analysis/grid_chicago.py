@@ -1,9 +1,15 @@
 import geopandas as gpd
 from shapely.geometry import Point
 import pandas as pd
-from pathlib import Path
 import numpy as np
-from green_spaces.index.index import create_housing_file
+from green_spaces.index.index import (
+    create_housing_file,
+    load_match_table,
+    load_park_index,
+    load_ratings,
+    ratings_path,
+)
+from green_spaces.config import CHICAGO
 
 def create_grid(north, south, east, west, spacing):
     """
@@ -43,28 +49,42 @@ def get_boundaries_polygon(parks_gdf):
     # Return as north, south, east, west
     return maxy, miny, maxx, minx
 
-def main():
+def main(engine="exact", city=CHICAGO):
     #Set paths for this module
-    main_data_path = Path(__file__).parent.parent.parent
-    output_file = main_data_path / "data/grid_and_tracts/processed/grid/index.geojson"
+    data_path = city.data_dir
+    output_file = data_path / "grid_and_tracts/processed/grid/index.geojson"
     
     print("Loading parks data...")
-    parks = gpd.read_file(main_data_path / "data/cleaned_park_polygons.geojson" )
-    ratings = gpd.read_file(main_data_path / "data/review_data/combined_reviews_buffered_250.geojson")
+    parks_path = data_path / "cleaned_park_polygons.geojson"
+    parks = gpd.read_file(parks_path)
+    review_dir = data_path / "review_data"
+    ratings = load_ratings(review_dir)
     
     #Create the grid file 
     north, south, east, west = get_boundaries_polygon(parks)
     print(f"Parks data boundaries: North={north},South={south}, East={east}, West={west}")
-    # We use Chicago boundaries
+    # We use the city's park boundaries
     spacing = 0.002 #Aprox 200 meters
     #Index for all points
     distance = 1000
-    print("Creating grid of points over Chicago...")
+    print(f"Creating grid of points over {city.name.title()}...")
     grid_gdf = create_grid(north, south, east, west, spacing)
     
     #Not running the file again if already exists, time consuming
     if not output_file.exists():
-        create_housing_file(grid_gdf, distance, parks, ratings, output_file)
+        park_index = load_park_index(parks, parks_path)
+        # Same match table as the housing index, matched once per input
+        match_table = load_match_table(parks, ratings, parks_path, ratings_path(review_dir))
+        create_housing_file(
+            grid_gdf,
+            distance,
+            parks,
+            ratings,
+            output_file,
+            match_table=match_table,
+            park_index=park_index,
+            engine=engine,
+        )
     else:
         print(f"   File already exists at {output_file}")
     print(f"   Created grid with {len(grid_gdf)} points")
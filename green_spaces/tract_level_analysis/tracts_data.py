@@ -2,15 +2,18 @@ import pathlib
 import geopandas as gpd
 import pandas as pd
 from .grid_chicago import get_boundaries_polygon
+from green_spaces.parks.normalize_geometries import normalize_gdf
+from green_spaces.config import CHICAGO
 
-def filter_tracts_by_chicago_boundary(tracts_gdf):
+def filter_tracts_by_chicago_boundary(tracts_gdf, city=CHICAGO):
     """
-    Filter census tracts to only those within Chicago's boundaries.
+    Filter census tracts to only those within the city's boundaries
+    (Chicago's by default).
     """
-    # Chicago approximate boundaries
-    north, south, east, west = 42.0230374, 41.6328758, -87.5240812, -87.8824214
+    # City approximate boundaries
+    north, south, east, west = city.tract_bbox or city.bbox
     
-    # Filter tracts within Chicago boundaries
+    # Filter tracts within city boundaries
     chicago_tracts = tracts_gdf.cx[west:east, south:north]
     
     # Exclude Lake Michigan (tract ID 990000)
@@ -18,14 +21,37 @@ def filter_tracts_by_chicago_boundary(tracts_gdf):
     return chicago_tracts
 
 
-def merge_tract_values(shape_path, data):
+def normalize_tracts(shape_path, output_path):
+    """
+    Repair, snap and orient the census tract geometries once and save them,
+    so the spatial joins run on clean geometries. Skipped when the saved
+    layer is newer than the shapefile.
+
+    Args:
+        shape_path: Path to shapefile with census tracts
+        output_path: Path to save the normalized tracts GeoJSON
+
+    Returns:
+        Path to the normalized tracts
+    """
+    if output_path.exists() and output_path.stat().st_mtime >= shape_path.stat().st_mtime:
+        return output_path
+
+    tracts_gdf, _ = normalize_gdf(gpd.read_file(shape_path), "tracts")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tracts_gdf.to_file(output_path, driver='GeoJSON')
+
+    return output_path
+
+
+def merge_tract_values(shape_path, data, city=CHICAGO):
     """
     Merge the shape data with a dataframe we choose
     """
     shape_gdf = gpd.read_file(shape_path)
     
-    # Filter for Chicago tracts
-    shape_gdf = filter_tracts_by_chicago_boundary(shape_gdf)
+    # Filter for the city's tracts
+    shape_gdf = filter_tracts_by_chicago_boundary(shape_gdf, city)
     
     merged_df = shape_gdf.merge(
         data, 
@@ -96,21 +122,26 @@ def get_housing_units_per_tract(housing_geojson_path, tracts_gdf):
     
     return tract_housing
 
-def main(): 
-    main_data_path = pathlib.Path(__file__).parent.parent.parent
-    path_shape_tracts = main_data_path / "data/grid_and_tracts/raw/census_tracts/il_tracts.shp"
-    path_census_data = main_data_path / "data/grid_and_tracts/processed/census/census_data.csv"
-    path_index_geojson = main_data_path / "data/grid_and_tracts/processed/grid/index.geojson"
-    path_housing_geojson = main_data_path / "data/housing.geojson"  
-    output_dir = main_data_path / "data/grid_and_tracts/processed/merged"
-    
+def main(city=CHICAGO): 
+    data_path = city.data_dir
+    tracts_name = pathlib.Path(city.tracts_file).stem
+    path_raw_tracts = data_path / "grid_and_tracts/raw/census_tracts" / city.tracts_file
+    path_shape_tracts = data_path / f"grid_and_tracts/processed/census_tracts/{tracts_name}.geojson"
+    path_census_data = data_path / "grid_and_tracts/processed/census/census_data.csv"
+    path_index_geojson = data_path / "grid_and_tracts/processed/grid/index.geojson"
+    path_housing_geojson = data_path / "housing.geojson"  
+    output_dir = data_path / "grid_and_tracts/processed/merged"
+    
+    # Normalize tract geometries once before the joins
+    normalize_tracts(path_raw_tracts, path_shape_tracts)
+
     # Read census data
     census_data = pd.read_csv(path_census_data, dtype={'Tract': str})
     
     # Create output directory if it doesn't exist
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    merged_gdf = merge_tract_values(path_shape_tracts, census_data)
+    merged_gdf = merge_tract_values(path_shape_tracts, census_data, city)
     
     # Get mean index per tract
     tract_index = get_index_to_census_tract(path_index_geojson, path_shape_tracts)
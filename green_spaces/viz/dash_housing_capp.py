@@ -10,6 +10,7 @@ import json
 import numpy as np
 from pathlib import Path
 from shapely import Point
+from green_spaces.config import CHICAGO
 
 # Color palette - Colorblind-friendly palette
 COLORS = {
@@ -23,6 +24,10 @@ COLORS = {
     'text': '#212529'         # Dark gray
 }
 
+# Default map centers of the housing maps and of the Chicago tracts map
+MAP_CENTER = {"lat": CHICAGO.map_center[0], "lon": CHICAGO.map_center[1]}
+TRACTS_MAP_CENTER = {"lat": 41.8761, "lon": -87.6298}
+
 def load_geojson_data(file_path):
     """Load GeoJSON files."""
     try:
@@ -37,7 +42,7 @@ def load_geojson_data(file_path):
         print(f"Error loading GeoJSON file {file_path}: {e}")
         return None
 
-def create_housing_tab_content(housing_data):
+def create_housing_tab_content(housing_data, center=MAP_CENTER):
     """Create content for the housing data tab."""
     if housing_data is None or len(housing_data) == 0:
         return html.Div(["No housing data available."], className="alert alert-warning")
@@ -53,7 +58,7 @@ def create_housing_tab_content(housing_data):
                 html.H4("Housing distribution", style={'marginBottom': '15px', 'color': COLORS['secondary']}),
                 dcc.Graph(
                     id='housing-heatmap',
-                    figure=create_combined_map(housing_data),
+                    figure=create_combined_map(housing_data, center),
                     style={'height': '80vh', 'border': f'1px solid {COLORS["secondary"]}', 'borderRadius': '5px'}
                 )
             ], width=7),
@@ -100,7 +105,7 @@ def create_housing_tab_content(housing_data):
         ])
     ])
 
-def create_housing_heatmap(housing_data):
+def create_housing_heatmap(housing_data, center=MAP_CENTER):
     """Create a heatmap of housing locations."""
     zmin = housing_data['rating_index'].min()
     zmax = housing_data['rating_index'].max()
@@ -111,7 +116,7 @@ def create_housing_heatmap(housing_data):
         lon='longitude',
         z='rating_index',
         radius=15,
-        center={"lat": 41.8781, "lon": -87.6298},
+        center=center,
         zoom=9.5,
         color_continuous_scale='Magma',
         opacity=0.3,
@@ -139,7 +144,7 @@ def create_housing_heatmap(housing_data):
     )
     return fig
 
-def create_housing_scatter_map(housing_data):
+def create_housing_scatter_map(housing_data, center=MAP_CENTER):
     """Create a scatter map of housing locations colored by rating index."""
     fig = px.scatter_map(
         housing_data,
@@ -150,7 +155,7 @@ def create_housing_scatter_map(housing_data):
         size = "rating_index",
         size_max=15,
         zoom=10,
-        center={"lat": 41.8781, "lon": -87.6298},
+        center=center,
         title="Housing Locations by Accessibility Index",
         labels={'rating_index': 'Accessibility Index'},
         hover_data={
@@ -172,10 +177,10 @@ def create_housing_scatter_map(housing_data):
     )
     return fig
 
-def create_combined_map(housing_data):
+def create_combined_map(housing_data, center=MAP_CENTER):
     """Combine heatmap and scatter map of housing locations."""
-    heatmap_fig = create_housing_heatmap(housing_data)
-    scatter_fig = create_housing_scatter_map(housing_data)
+    heatmap_fig = create_housing_heatmap(housing_data, center)
+    scatter_fig = create_housing_scatter_map(housing_data, center)
 
     # Combine the data from both figures
     combined_fig = heatmap_fig
@@ -205,8 +210,9 @@ def create_rating_histogram(housing_data):
     return fig
 
 
-def create_dashboard(tracts_gdf, housing_gdf, kepler_path=None):
+def create_dashboard(tracts_gdf, housing_gdf, kepler_path=None, city=CHICAGO):
     app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+    center = {"lat": city.map_center[0], "lon": city.map_center[1]}
     
     # Clean up tracts data for visualization
     tracts_data = tracts_gdf.copy() if tracts_gdf is not None else None
@@ -216,7 +222,7 @@ def create_dashboard(tracts_gdf, housing_gdf, kepler_path=None):
     
     # Create project summary content (Tab 1)
     project_summary_content = create_project_summary()
-    housing_tab_content = create_housing_tab_content(housing_gdf)
+    housing_tab_content = create_housing_tab_content(housing_gdf, center)
     # Create dashboard content
     dashboard_content = create_dashboard_content(tracts_data)
     # Create Kepler map content (Tab 3)
@@ -226,7 +232,7 @@ def create_dashboard(tracts_gdf, housing_gdf, kepler_path=None):
     app.layout = html.Div([
         # Sticky header
         html.Div([
-            html.H1("Affordable Housing & Green Space Equity in Chicago", 
+            html.H1(f"Affordable Housing & Green Space Equity in {city.name.title()}", 
                   style={'color': COLORS['primary'], 'textAlign': 'center', 'margin': '0', 'padding': '15px'})
         ], style={
             'position': 'sticky', 
@@ -252,7 +258,8 @@ def create_dashboard(tracts_gdf, housing_gdf, kepler_path=None):
         ], fluid=True, style={'backgroundColor': COLORS['background'], 'minHeight': '100vh'})
     ])
     # Register callbacks
-    register_callbacks(app, tracts_data, kepler_path)
+    tracts_center = TRACTS_MAP_CENTER if city == CHICAGO else center
+    register_callbacks(app, tracts_data, kepler_path, tracts_center)
     
     return app
 
@@ -388,7 +395,7 @@ def create_dashboard_content(tracts_data):
         ], width=5)
     ])
 
-def register_callbacks(app, tracts_data, kepler_path):
+def register_callbacks(app, tracts_data, kepler_path, map_center=TRACTS_MAP_CENTER):
     """Register all callbacks for the app."""
     
     @app.callback(
@@ -408,7 +415,7 @@ def register_callbacks(app, tracts_data, kepler_path):
             empty_fig.update_layout(title="No data available")
             return empty_fig, empty_fig, empty_fig, "N/A"
         # Default center and zoom
-        center = {"lat": 41.8761, "lon": -87.6298}
+        center = map_center
         zoom = 10.5
         
         if relayout_data and 'mapbox.center' in relayout_data and 'mapbox.zoom' in relayout_data:
@@ -758,17 +765,16 @@ def register_callbacks(app, tracts_data, kepler_path):
             placeholder_content = html.Div("Select the Kepler Map tab to view the interactive map.")
             return placeholder_content, container_style
 
-def main():
-    data_parent = Path(__file__).parent.parent.parent
-    path_tracts = data_parent / "data/grid_and_tracts/processed/merged/merged_tract_data.geojson"
-    path_kepler = Path(__file__).parent.parent / "viz/chicago_parks_kepler.html"
+def main(city=CHICAGO):
+    path_tracts = city.data_dir / "grid_and_tracts/processed/merged/merged_tract_data.geojson"
+    path_kepler = Path(__file__).parent.parent / f"viz/{city.name}_parks_kepler.html"
     tracts_gdf = load_geojson_data(path_tracts)
     
-    path_housing = data_parent / "data/housing_data_index.geojson"
+    path_housing = city.data_dir / "housing_data_index.geojson"
     housing_gdf = load_geojson_data(path_housing)
 
     print("Dashboard running")
-    app = create_dashboard(tracts_gdf, housing_gdf, path_kepler)
+    app = create_dashboard(tracts_gdf, housing_gdf, path_kepler, city)
     app.run_server(debug=False)
 
 if __name__ == "__main__":
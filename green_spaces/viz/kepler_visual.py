@@ -6,6 +6,7 @@ import json
 from shapely.geometry import Point
 import traceback
 import re
+from green_spaces.config import CHICAGO
 
 
 def create_visualization( housing_data, parks_data, tracts_data, output_file, configure):
@@ -37,14 +38,14 @@ def create_visualization( housing_data, parks_data, tracts_data, output_file, co
         print(f"Error creating visualization: {e}")
         traceback.print_exc()
 
-def main():
+def main(city=CHICAGO):
     """Main function to run the visualization process."""
     # Set up file paths
     data_parent = Path(__file__).parent.parent.parent
-    path_parks = data_parent / "data/cleaned_park_polygons.geojson"
-    path_housing = data_parent / "data/housing_data_index.geojson"
-    path_tracts = data_parent / "data/grid_and_tracts/processed/merged/merged_tract_data.geojson"
-    output_file = data_parent / "green_spaces/viz/chicago_parks_kepler.html"
+    path_parks = city.data_dir / "cleaned_park_polygons.geojson"
+    path_housing = city.data_dir / "housing_data_index.geojson"
+    path_tracts = city.data_dir / "grid_and_tracts/processed/merged/merged_tract_data.geojson"
+    output_file = data_parent / f"green_spaces/viz/{city.name}_parks_kepler.html"
 
     # Load data
     with open(path_parks) as f:
@@ -60,6 +61,11 @@ def main():
         config = json.load(f)
         print("config loaded")
 
+    # The saved view is tuned for Chicago, center it on other cities
+    if city.name != CHICAGO.name:
+        config["config"]["mapState"]["latitude"] = city.map_center[0]
+        config["config"]["mapState"]["longitude"] = city.map_center[1]
+
     # Create visualization
     create_visualization(housing_data, parks_data, tracts_data, output_file,
                          config)
@@ -0,0 +1,128 @@
+import json
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+from green_spaces.reviews.cache_store import (
+    CacheStore,
+    migrate_legacy_cache,
+    request_key,
+)
+from green_spaces.reviews.reviews_utils import cache_key
+
+URL = "https://api.yelp.com/v3/businesses/search"
+
+
+@pytest.fixture
+def store(tmp_path):
+    '''
+    Empty response store in a temporary cache directory
+    '''
+    with CacheStore(tmp_path) as store:
+        yield store
+
+
+def test_request_key_ignores_parameter_order():
+    '''
+    Test that the key of a request does not depend on the parameter order
+    '''
+    key = request_key(URL, {"location": "Chicago", "categories": "parks"})
+    assert key == request_key(URL, {"categories": "parks", "location": "Chicago"})
+    assert key != request_key(URL, {"location": "Chicago", "categories": "dog_parks"})
+
+
+def test_get_respects_ttl(store):
+    '''
+    Test that responses are returned until their time to live runs out
+    '''
+    params = {"location": "Chicago"}
+    store.put(URL, params, {"places": [1]}, ttl=60, fetched_at=1000)
+    store.put(URL, {"location": "Evanston"}, {"places": [2]}, fetched_at=1000)
+
+    assert store.get(URL, params, now=1060) == {"places": [1]}
+    assert store.get(URL, params, now=1061) is None
+    assert store.get(URL, {"location": "Evanston"}, now=10**10) == {"places": [2]}
+
+
+def test_get_many(store):
+    '''
+    Test that several responses are read in request order, with None for
+    missing requests
+    '''
+    requests = [(URL, {"categories": category}) for category in ["a", "b", "c"]]
+    store.put(*requests[2], {"places": ["c"]})
+    store.put(*requests[0], {"places": ["a"]})
+
+    assert store.get_many(requests) == [{"places": ["a"]}, None, {"places": ["c"]}]
+
+
+def test_fetch_times(store):
+    '''
+    Test that fetch times are returned in request order
+    '''
+    store.put(URL, {"categories": "a"}, {"places": []}, fetched_at=1000)
+    requests = [(URL, {"categories": "b"}), (URL, {"categories": "a"})]
+    assert store.fetch_times(requests) == [None, 1000]
+
+
+def test_entries(store):
+    '''
+    Test that stored responses are listed with their requests
+    '''
+    store.put(URL, {"categories": "a"}, {"places": ["a"]})
+    assert list(store.entries()) == [(URL, {"categories": "a"}, {"places": ["a"]})]
+
+
+def test_migrate_legacy_cache(tmp_path):
+    '''
+    Test that loose review cache files are imported once and attached to
+    their request on first read, leaving other cache files alone
+    '''
+    params = {"location": "Chicago", "sort_by": "best_match"}
+    review_file = tmp_path / cache_key(URL, params)
+    review_file.write_text(json.dumps({"places": [{"name": "Oak Park"}]}))
+    (tmp_path / "overpass.json").write_text(json.dumps({"elements": []}))
+
+    with CacheStore(tmp_path, read_legacy=False) as store:
+        assert migrate_legacy_cache(store) == 1
+        assert migrate_legacy_cache(store) == 0
+
+        review_file.unlink()
+        assert store.get(URL, params) == {"places": [{"name": "Oak Park"}]}
+        row = store.conn.execute("SELECT key, url FROM responses").fetchone()
+        assert row == (request_key(URL, params), URL)
+
+
+def test_legacy_file_read_on_miss(tmp_path):
+    '''
+    Test that a loose cache file still on disk is read on a miss
+    '''
+    params = {"location": "Chicago"}
+    (tmp_path / cache_key(URL, params)).write_text(json.dumps({"places": [1]}))
+
+    with CacheStore(tmp_path) as store:
+        assert store.get(URL, params) == {"places": [1]}
+    with CacheStore(tmp_path, read_legacy=False) as store:
+        assert store.get(URL, params) == {"places": [1]}
+
+
+def write_responses(cache_dir, worker):
+    '''
+    Store 50 responses from one process
+    '''
+    with CacheStore(cache_dir) as store:
+        for i in range(50):
+            store.put(URL, {"worker": str(worker), "i": str(i)}, {"places": [worker, i]})
+
+
+def test_concurrent_writers(tmp_path):
+    '''
+    Test that processes can write to the same store at once
+    '''
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(write_responses, [tmp_path] * 4, range(4)))
+
+    with CacheStore(tmp_path) as store:
+        requests = [
+            (URL, {"worker": str(w), "i": str(i)}) for w in range(4) for i in range(50)
+        ]
+        responses = store.get_many(requests)
+    assert responses == [{"places": [w, i]} for w in range(4) for i in range(50)]
@@ -1,5 +1,7 @@
+import copy
 import pytest
 import geojson
+from shapely import affinity
 from shapely.geometry import Polygon, mapping
 from shapely.ops import unary_union
 
@@ -7,7 +9,12 @@ from green_spaces.parks.clean_park_polygons import (
     standardize_unnamed_parks,
     handle_intersecting_parks,
     create_merged_feature,
-    check_park_containment
+    check_park_containment,
+    parse_geometries,
+    intersecting_pairs,
+    get_final_features,
+    merged_park_id,
+    clean_features,
 )
 
 @pytest.fixture
@@ -98,8 +105,8 @@ def test_handle_intersecting_parks(test_data):
     This test checks that the handle_intersecting_parks function is working
     properly. Below is the functionality this test checks for:
 
-    - If an unnamed park intersects with another unnamed park, these parks 
-    are added as related nodes to an undirected intersection graph.
+    - If an unnamed park intersects with another unnamed park, the pair of
+    park IDs is added to the unnamed_edges list.
     - If an unnamed park intersects with a named park, the unnamed park is added
     to the unnameds_to_remove return list to be used for later removal.
     - If two named parks intersect, these parks will be added as a tuple to the 
@@ -110,15 +117,15 @@ def test_handle_intersecting_parks(test_data):
 
     standardized_features = standardize_unnamed_parks(features)
 
-    intersection_graph, unnameds_to_remove, check_containment_parks = handle_intersecting_parks(standardized_features)
+    unnamed_edges, unnameds_to_remove, check_containment_parks = handle_intersecting_parks(standardized_features)
 
     # Unnamed Park 3 (id = 6) intersects with Named Park 1, so the id, '6'. should
     # be in the unnameds_to_remove return list
     assert '6' in unnameds_to_remove
 
     # Unnamed Park 1 (id = 1) and Unnamed Park 2 (id = 2) intersect and should be
-    # added as related nodes in the NetworkX intersection_graph
-    assert intersection_graph.has_edge('1', '2')
+    # added as an edge in unnamed_edges
+    assert ('1', '2') in unnamed_edges
 
     # Named parks 1, 2, and 3 (id = 3, id = 4, id =5) intersect each other, so
     # they should be in the check_containment_parks list for further review
@@ -183,3 +190,102 @@ def test_create_merged_feature():
 
     # Validate that the merged_feature is a proper GeoJSON Feature
     assert geojson.Feature(**merged_feature), "Invalid GeoJSON Feature!"
+
+
+def test_intersecting_pairs(test_data):
+    """
+    Tests that the spatial index query returns every intersecting pair once,
+    ordered by the position of the first park, and skips identical geometries.
+    """
+    features = test_data["features"]
+    # add an exact duplicate of Named Park 2, which should not be paired with it
+    features.append(
+        {"type": "Feature", "geometry": features[4]["geometry"],
+         "properties": {"id": '7', "name": "Park 2 Copy"}}
+    )
+
+    left, right = intersecting_pairs(parse_geometries(features))
+    pairs = list(zip(left.tolist(), right.tolist()))
+
+    assert pairs == sorted(pairs)
+    assert (0, 1) in pairs
+    assert (3, 5) in pairs
+    assert (4, 6) not in pairs
+
+
+@pytest.mark.parametrize("method", ["area", "hausdorff"])
+def test_check_park_containment_near_duplicates(method):
+    """
+    Tests that a named park whose boundary differs from another only by tiny
+    coordinate differences is removed, although neither is strictly within
+    the other.
+    """
+    park = Polygon([(0, 0), (0, 0.01), (0.01, 0.01), (0.01, 0)])
+    # shifted by less than the snapping grid, so the parks only overlap
+    near_duplicate = affinity.translate(park, 1e-7, 1e-7)
+    assert not near_duplicate.within(park) and not park.within(near_duplicate)
+
+    features = [
+        {"type": "Feature", "geometry": mapping(park),
+         "properties": {"id": '1', "name": "Park"}},
+        {"type": "Feature", "geometry": mapping(near_duplicate),
+         "properties": {"id": '2', "name": "Park"}},
+    ]
+    _, _, check_containment_parks = handle_intersecting_parks(features)
+
+    named_parks_to_remove = check_park_containment(
+        check_containment_parks, method=method
+    )
+
+    assert len(named_parks_to_remove) == 1
+
+
+def test_get_final_features(test_data):
+    """
+    Tests that intersecting unnamed parks are merged into one feature and
+    that removed parks are dropped from the cleaned features.
+    """
+    features = standardize_unnamed_parks(test_data["features"])
+    unnamed_edges, unnameds_to_remove, check_containment_parks = (
+        handle_intersecting_parks(features)
+    )
+    named_parks_to_remove = check_park_containment(check_containment_parks)
+
+    final_features, lineage = get_final_features(
+        features, unnamed_edges, unnameds_to_remove, named_parks_to_remove
+    )
+    final_ids = [feature["properties"]["id"] for feature in final_features]
+
+    # parks 1 and 2 are merged, park 6 and park 5 are removed
+    assert final_ids[:2] == ['3', '4']
+    assert len(final_features) == 3
+    assert final_features[2]["properties"]["name"] == "Unnamed Merged Park"
+
+    # the merged id is derived from its members and recorded in the lineage
+    assert final_ids[2] == merged_park_id(['2', '1'])
+    assert lineage == {final_ids[2]: ['1', '2']}
+
+
+def test_clean_features_integer_ids(test_data):
+    """
+    Tests that parks with integer OSM ids are cleaned, and merged into the
+    same park id as string ids.
+    """
+    features = copy.deepcopy(test_data["features"])
+    for feature in features:
+        feature["properties"]["id"] = int(feature["properties"]["id"])
+
+    final_features, lineage = clean_features(features, max_workers=1)
+    string_features, string_lineage = clean_features(
+        copy.deepcopy(test_data["features"]), max_workers=1
+    )
+
+    final_ids = [str(feature["properties"]["id"]) for feature in final_features]
+    string_ids = [feature["properties"]["id"] for feature in string_features]
+    assert final_ids == string_ids
+    assert merged_park_id(['1', '2']) in final_ids
+    # the lineage keeps the members' original ids
+    assert {
+        park_id: [str(member) for member in members]
+        for park_id, members in lineage.items()
+    } == string_lineage
@@ -0,0 +1,11 @@
+from green_spaces.clusters import find_clusters
+
+
+def test_find_clusters():
+    """
+    Tests that union-find groups connected IDs, keeping the order in
+    which clusters and IDs first appear in the edge list.
+    """
+    edges = [('a', 'b'), ('x', 'y'), ('c', 'b'), ('y', 'z'), ('d', 'a')]
+
+    assert find_clusters(edges) == [['a', 'b', 'c', 'd'], ['x', 'y', 'z']]
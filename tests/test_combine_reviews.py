@@ -1,5 +1,20 @@
+import os
+import subprocess
+import sys
 import pytest
-from green_spaces.reviews.combine_reviews import combine_reviews
+from green_spaces.config import CHICAGO, MINNEAPOLIS
+from green_spaces.reviews import google, yelp
+from green_spaces.reviews.cache_store import CacheStore
+from green_spaces.reviews.combine_reviews import (
+    combine_cached_reviews,
+    combine_reviews,
+    combined_place_table,
+    dedup_places,
+    normalize_name,
+    place_geodataframe,
+)
+from green_spaces.reviews.reviews_utils import Place, place_table, table_places
+from green_spaces.reviews.tiling import tiled_request
 from pathlib import Path
 
 def test_combine_reviews():
@@ -11,3 +26,175 @@ def test_combine_reviews():
     reduced_num_reviews = len(combined_reviews)
     assert reduced_num_reviews == 6, f"Contained {reduced_num_reviews} instead of 6"
     
+
+
+def place(name, latitude, longitude, rating, review_count, source):
+    '''
+    Cleaned place dictionary
+    '''
+    return {"name": name, "latitude": latitude, "longitude": longitude,
+            "rating": rating, "review_count": review_count, "source": source}
+
+
+def test_normalize_name():
+    '''
+    Test that case, punctuation and generic words are ignored
+    '''
+    assert normalize_name("The Park at Lakeshore East") == "at lakeshore east"
+    assert normalize_name("Cancer Survivors' Garden") == "cancer survivors garden"
+    assert normalize_name(None) == ""
+
+
+def test_dedup_places_merges_sources():
+    '''
+    Test that the Google and Yelp listings of a park are merged, with
+    combined review counts and a rating weighted by review count
+    '''
+    places = [
+        place("Holstein Park", 41.9135, -87.6788, 4.5, 300, "Google"),
+        place("Holstein park", 41.9137, -87.6790, 3.5, 100, "Yelp"),
+        place("Wicker Park", 41.9080, -87.6773, 4.6, 2000, "Google"),
+    ]
+    deduped = dedup_places(places)
+    assert deduped == [
+        place("Holstein Park", 41.9135, -87.6788, 4.25, 400, "Google+Yelp"),
+        places[2],
+    ]
+
+
+def test_dedup_places_keeps_distinct_places():
+    '''
+    Test that places far apart, with different names or from the same
+    source are not merged
+    '''
+    places = [
+        place("Union Park", 41.8845, -87.6658, 4.5, 1000, "Google"),
+        place("Union Park", 41.9845, -87.6658, 4.0, 20, "Yelp"),
+        place("Smith Park", 41.8846, -87.6659, 4.0, 20, "Yelp"),
+        place("Union Park", 41.8846, -87.6659, 4.4, 900, "Google"),
+        place("Union Park", None, None, 0, 0, "Yelp"),
+    ]
+    assert dedup_places(places) == places
+
+
+def test_dedup_places_across_cells():
+    '''
+    Test that duplicates in neighboring grid cells are found, and that a
+    source listing the park twice only counts its most reviewed listing
+    '''
+    # 9 m apart, on both sides of a 10 m cell border
+    places = [
+        place("Ping Tom Memorial Park", 41.85711, -87.63290, 4.7, 3677, "Google"),
+        place("Ping Tom Memorial Park", 41.85719, -87.63290, 4.5, 84, "Yelp"),
+        place("Ping Tom Memorial Park", 41.85715, -87.63292, 4.7, 3676, "Google"),
+    ]
+    (merged,) = dedup_places(places, distance=10)
+    assert merged["review_count"] == 3677 + 84
+    assert merged["source"] == "Google+Yelp"
+
+
+def test_place_geodataframe_from_table():
+    '''
+    Test that a place table buffers to the same reviews as the place
+    dictionaries
+    '''
+    places = [
+        place("Union Park", 41.8845, -87.6658, 4.5, 1000, "Google"),
+        place("Smith Park", 41.8846, -87.6659, 4.0, 20, "Yelp"),
+    ]
+    from_dicts = place_geodataframe(places, 250)
+    from_table = place_geodataframe(place_table(Place(**p) for p in places), 250)
+    assert from_table["name"].tolist() == ["Union Park", "Smith Park"]
+    assert from_table["review_count"].tolist() == [1000, 20]
+    assert from_table.geometry.geom_equals_exact(from_dicts.geometry, 1e-9).all()
+
+
+def test_combine_cached_reviews_with_tiles(tmp_path):
+    '''
+    Test that the places a search found over adaptive tiles are combined
+    with the fixed grid responses, and that a search cached only over tiles
+    counts as cached
+    '''
+    city = CHICAGO._replace(data_dir=tmp_path, cache_dir=tmp_path / "cache")
+    searches = {name: (url, params) for name, url, params in
+                google.search_requests(city) + yelp.search_requests(city)}
+    grid_park = {"name": "Union Park", "rating": 4.5, "user_ratings_total": 1000,
+                 "geometry": {"location": {"lat": 41.8845, "lng": -87.6658}}}
+    tiled_park = {"name": "Ping Tom Memorial Park", "rating": 4.7,
+                  "user_ratings_total": 3676,
+                  "geometry": {"location": {"lat": 41.85715, "lng": -87.63292}}}
+    tiled_yelp = {"name": "Humboldt Park", "rating": 4.0, "review_count": 200,
+                  "coordinates": {"latitude": 41.9058, "longitude": -87.7016}}
+
+    with CacheStore(city.cache_dir) as store:
+        for name, (url, params) in searches.items():
+            if name != "google_stadium":
+                store.put(url, params, {"places": []})
+        store.put(*searches["google_park"], {"places": [grid_park]})
+        store.put(*tiled_request(*searches["google_park"]),
+                  {"places": [grid_park, tiled_park]})
+        store.put(*tiled_request(*searches["yelp_parks"]), {"places": [tiled_yelp]})
+        assert combine_cached_reviews(city) is None
+
+        store.put(*tiled_request(*searches["google_stadium"]), {"places": []})
+
+    places = combine_cached_reviews(city)
+    assert sorted(p["name"] for p in places) == [
+        "Humboldt Park", "Ping Tom Memorial Park", "Union Park"
+    ]
+    table = combined_place_table(city)
+    assert sorted(p["name"] for p in table_places(table)) == [
+        "Humboldt Park", "Ping Tom Memorial Park", "Union Park"
+    ]
+
+
+def test_combine_cached_reviews_per_city(tmp_path):
+    '''
+    Test that a city does not read the responses another city cached for
+    the same search parameters
+    '''
+    chicago = CHICAGO._replace(data_dir=tmp_path, cache_dir=tmp_path / "chicago")
+    minneapolis = MINNEAPOLIS._replace(
+        data_dir=tmp_path, cache_dir=tmp_path / "minneapolis"
+    )
+    with CacheStore(chicago.cache_dir) as store:
+        for _, url, params in google.search_requests(chicago) + yelp.search_requests(chicago):
+            store.put(url, params, {"places": []})
+
+    # the unnamed park search has the same parameters in every city
+    assert google.search_requests(chicago)[-1] == google.search_requests(minneapolis)[-1]
+    assert combine_cached_reviews(chicago) == []
+    assert combine_cached_reviews(minneapolis) is None
+
+
+def test_place_table_is_deterministic(tmp_path):
+    '''
+    Test that the combined place table has the same bytes in every process,
+    whatever the string hash seed
+    '''
+    city = CHICAGO._replace(data_dir=tmp_path, cache_dir=tmp_path / "cache")
+    (tmp_path / "review_data").mkdir()
+    with CacheStore(city.cache_dir) as store:
+        for i, (_, url, params) in enumerate(google.search_requests(city)):
+            store.put(url, params, {"places": [
+                {"name": f"Park {i}-{j}", "rating": 4, "user_ratings_total": j,
+                 "geometry": {"location": {"lat": 41.7 + j / 100, "lng": -87.7 + i / 10}}}
+                for j in range(20)
+            ]})
+        for _, url, params in yelp.search_requests(city):
+            store.put(url, params, {"places": []})
+
+    script = (
+        "import sys, pathlib\n"
+        "from green_spaces.config import CHICAGO\n"
+        "from green_spaces.reviews.combine_reviews import main\n"
+        "path = pathlib.Path(sys.argv[1])\n"
+        "main(CHICAGO._replace(data_dir=path, cache_dir=path / 'cache'))\n"
+    )
+    tables = []
+    for seed in ["1", "2"]:
+        env = {**os.environ, "PYTHONHASHSEED": seed,
+               "PYTHONPATH": str(Path(__file__).parent.parent)}
+        subprocess.run([sys.executable, "-c", script, str(tmp_path)], env=env, check=True)
+        tables.append((tmp_path / "review_data" / "combined_reviews.npy").read_bytes())
+    assert tables[0] == tables[1]
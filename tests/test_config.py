@@ -0,0 +1,62 @@
+from green_spaces.config import (
+    CHICAGO,
+    CITIES,
+    CITIES_DIR,
+    DATA_DIR,
+    city_config,
+    prepare_city_dirs,
+    search_grid,
+)
+
+
+def test_chicago_keeps_existing_data_dir():
+    """
+    Tests that Chicago reads and writes the existing data directory.
+    """
+    assert CHICAGO.data_dir == DATA_DIR
+    assert len(CHICAGO.search_locations) == 15
+    assert CHICAGO.tract_bbox is not None
+
+
+def test_city_config(tmp_path):
+    """
+    Tests that a new city gets its own data directory and review searches
+    spread over its bounding box.
+    """
+    bbox = (42.0, 41.0, -87.0, -88.0)
+    city = city_config("testville", "Testville, Illinois, USA", bbox, "17", "001")
+
+    assert city.data_dir == CITIES_DIR / "testville"
+    assert city.yelp_location == "Testville"
+    assert city.map_center == (41.5, -87.5)
+    assert city.search_locations == search_grid(bbox)
+    assert all(
+        41.0 < lat < 42.0 and -88.0 < lon < -87.0
+        for lat, lon in city.search_locations
+    )
+
+    city = city._replace(data_dir=tmp_path / "testville")
+    prepare_city_dirs(city)
+    assert (city.data_dir / "review_data").is_dir()
+    assert (city.data_dir / "grid_and_tracts/processed/grid").is_dir()
+
+
+def test_cities():
+    """
+    Tests that every city other than Chicago keeps its data apart and
+    searches within its own bounds.
+    """
+    assert len(CITIES) > 1
+    data_dirs = {city.data_dir for city in CITIES.values()}
+    assert len(data_dirs) == len(CITIES)
+    # searches of different cities may share parameters, so each city
+    # caches its responses apart
+    cache_dirs = {city.cache_dir for city in CITIES.values()}
+    assert len(cache_dirs) == len(CITIES)
+    for name, city in CITIES.items():
+        north, south, east, west = city.bbox
+        assert city.name == name
+        assert all(
+            south < lat < north and west < lon < east
+            for lat, lon in city.search_locations
+        )
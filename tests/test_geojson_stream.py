@@ -0,0 +1,52 @@
+import json
+import pytest
+
+from green_spaces.parks.geojson_stream import iter_features, write_features
+
+
+@pytest.fixture
+def features():
+    """
+    A few park features with nested coordinates, nulls and long numbers.
+    """
+    return [
+        {
+            "type": "Feature",
+            "properties": {"id": str(i), "name": None if i % 2 else f"Park {i}"},
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [[[-87.6 - i * 1e-9, 41.8], [-87.5, 41.8123456789], [-87.6, 41.9]]],
+            },
+        }
+        for i in range(20)
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_iter_features(tmp_path, features, chunk_size):
+    """
+    Tests that features are streamed from a pretty-printed collection with
+    extra members, whatever the chunk boundaries.
+    """
+    path = tmp_path / "parks.geojson"
+    collection = {"type": "FeatureCollection", "name": "parks",
+                  "crs": {"type": "name", "properties": {"name": "EPSG:4326"}},
+                  "features": features}
+    path.write_text(json.dumps(collection, indent=4))
+
+    assert list(iter_features(path, chunk_size)) == features
+
+
+def test_write_features_round_trip(tmp_path, features):
+    """
+    Tests that written collections are valid, compact GeoJSON.
+    """
+    path = tmp_path / "parks.geojson"
+
+    assert write_features(iter(features), path) == len(features)
+    assert json.loads(path.read_text())["features"] == features
+    assert list(iter_features(path)) == features
+    assert "    " not in path.read_text()
+
+    write_features([], path)
+    assert list(iter_features(path)) == []
@@ -1,6 +1,11 @@
+import asyncio
+import httpx
 import pytest
 import json
-from green_spaces.reviews.reviews_utils import CHICAGO_LOCATIONS
+from green_spaces.reviews import google
+from green_spaces.config import CHICAGO_LOCATIONS
+from green_spaces.reviews.reviews_utils import FetchException, RateLimiter
+from green_spaces.reviews.cache_store import CacheStore
 from green_spaces.reviews.google import cached_get_google, clean_google
 from pathlib import Path
 
@@ -87,4 +92,78 @@ def test_clean_yelp_park_missing_information(park_missing_info_raw,
     clean_park = clean_google(park_missing_info_raw)
     assert clean_park == park_missing_info_clean, \
          f"Returned {clean_park} instead of {park_missing_info_clean}"
-  
\ No newline at end of file
+  
+
+@pytest.fixture
+def mock_google():
+    '''
+    Mock Google server returning two pages per location, recording the
+    number of requests in flight
+    '''
+    state = {"in_flight": 0, "max_in_flight": 0, "requests": []}
+
+    async def handler(request):
+        state["in_flight"] += 1
+        state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        await asyncio.sleep(0.01)
+        state["in_flight"] -= 1
+
+        params = request.url.params
+        state["requests"].append(dict(params))
+        location = params["location"]
+        if params.get("page_token"):
+            return httpx.Response(200, json={"results": [{"name": location + " 2"}]})
+        return httpx.Response(
+            200,
+            json={"results": [{"name": location + " 1"}], "next_page_token": "next"},
+        )
+
+    return httpx.MockTransport(handler), state
+
+
+def test_cached_get_google_concurrent(tmp_path, monkeypatch, sample_google_inputs,
+                                      mock_google):
+    '''
+    Test that locations are paged concurrently within the concurrency limit,
+    that results keep the location order and that the response is cached
+    '''
+    monkeypatch.setattr(google, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(google, "PAGE_TOKEN_DELAY", 0.05)
+    transport, state = mock_google
+    url, headers = sample_google_inputs
+    locations = CHICAGO_LOCATIONS[:6]
+
+    limiter = RateLimiter(qps=1000, burst=100)
+    data = cached_get_google(url, headers, locations, max_concurrency=3,
+                             transport=transport, limiter=limiter)
+
+    names = [place["name"] for place in data["places"]]
+    assert names == [f"{lat},{lon} {page}" for lat, lon in locations
+                     for page in (1, 2)]
+    assert len(state["requests"]) == 12
+    assert 1 < state["max_in_flight"] <= 3
+    assert headers == {"radius": "250", "keyword": "park"}
+
+    # the response is cached, and read back without requests
+    with CacheStore(tmp_path) as store:
+        assert store.get(url, headers) == data
+    assert cached_get_google(url, headers, locations, transport=transport) == data
+    assert len(state["requests"]) == 12
+
+
+def test_cached_get_google_error(tmp_path, monkeypatch, sample_google_inputs):
+    '''
+    Test that a failed request raises FetchException and caches nothing
+    '''
+    monkeypatch.setattr(google, "CACHE_DIR", tmp_path)
+    transport = httpx.MockTransport(lambda request: httpx.Response(500, text="error"))
+    url, headers = sample_google_inputs
+
+    limiter = RateLimiter(qps=1000, burst=100, max_retries=2, base_delay=0.001)
+
+    with pytest.raises(FetchException):
+        cached_get_google(url, headers, CHICAGO_LOCATIONS[:3], transport=transport,
+                          limiter=limiter)
+    with CacheStore(tmp_path) as store:
+        assert store.get(url, headers) is None
+    assert limiter.stats().retries >= 2
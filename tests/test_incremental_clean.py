@@ -0,0 +1,72 @@
+import copy
+import pytest
+from shapely.geometry import Polygon, mapping
+
+from green_spaces.parks.clean_park_polygons import clean_features, parse_geometries
+from green_spaces.parks.incremental_clean import (
+    component_labels,
+    snapshot_state,
+    diff_snapshots,
+    incremental_clean,
+)
+
+
+def park(park_id, name, polygon):
+    return {
+        "type": "Feature",
+        "geometry": mapping(polygon),
+        "properties": {"id": park_id, "name": name},
+    }
+
+
+@pytest.fixture
+def snapshot():
+    """
+    Raw park snapshot with three separate groups of parks: two intersecting
+    unnamed parks, a named park containing another named park, and a lone
+    named park.
+    """
+    return [
+        park("1", None, Polygon([(0, 0), (0, 2), (2, 2), (2, 0)])),
+        park("2", None, Polygon([(1, 1), (1, 3), (3, 3), (3, 1)])),
+        park("3", "Park 1", Polygon([(10, 0), (10, 2), (12, 2), (12, 0)])),
+        park("4", "Park 2", Polygon([(10.5, 0.5), (10.5, 1.5), (11.5, 1.5), (11.5, 0.5)])),
+        park("5", "Park 3", Polygon([(20, 0), (20, 1), (21, 1), (21, 0)])),
+    ]
+
+
+def test_component_labels(snapshot):
+    """
+    Tests that intersecting parks share a component label.
+    """
+    labels = component_labels(parse_geometries(snapshot))
+
+    assert labels.tolist() == [0, 0, 2, 2, 4]
+
+
+def test_incremental_clean_matches_full_clean(snapshot):
+    """
+    Tests that cleaning a changed snapshot incrementally gives the same
+    features and lineage as cleaning it in full.
+    """
+    state = snapshot_state(snapshot, component_labels(parse_geometries(snapshot)))
+    old_cleaned, old_lineage = clean_features(copy.deepcopy(snapshot))
+
+    # move park 2 away from park 1, drop park 5 and add a new park
+    new = copy.deepcopy(snapshot)
+    new[1] = park("2", None, Polygon([(5, 5), (5, 6), (6, 6), (6, 5)]))
+    del new[4]
+    new.insert(0, park("6", "Park 4", Polygon([(30, 0), (30, 1), (31, 1), (31, 0)])))
+
+    new_state = snapshot_state(new, component_labels(parse_geometries(new)))
+    assert diff_snapshots(state, new_state) == ({"6"}, {"5"}, {"2"})
+
+    full, full_lineage = clean_features(copy.deepcopy(new))
+    cleaned, lineage, _ = incremental_clean(
+        copy.deepcopy(new), state, old_cleaned, old_lineage
+    )
+
+    assert cleaned == full
+    assert lineage == full_lineage
+    # park 4 stays removed as contained in park 3
+    assert [f["properties"]["id"] for f in cleaned] == ["6", "1", "2", "3"]
@@ -1,7 +1,30 @@
+import json
 import pytest
+import numpy as np
 import geopandas as gpd
-from green_spaces.index.index import create_buffer, create_parks_dict
+from shapely.geometry import Point, box
+from green_spaces.index import index
+from green_spaces.index.index import (
+    create_buffer,
+    create_parks_dict,
+    nearest_park_metrics,
+    park_access_pairs,
+    match_reviews_exclusive,
+    match_reviews_buffer,
+    match_park_ratings_name,
+    match_park_ratings_point,
+    load_match_table,
+    load_ratings,
+    park_walking_distance,
+    load_park_index,
+    create_park_index,
+    create_housing_df,
+    create_housing_file,
+    approximate_index,
+    ParkTuple,
+)
 from pathlib import Path
+from green_spaces.reviews.reviews_utils import Place, place_table, save_place_table
 
 DATA_DIR = Path(__file__).parent / 'data'
 
@@ -37,5 +60,354 @@ def test_parks_dict(parks_data, ratings_data):
     parks_dict = create_parks_dict(parks_data, ratings_data)
     assert len(parks_dict) == len(parks_data), f"Expected length \
         {len(parks_data)} but got length {len(parks_dict)}"
-    
-    
\ No newline at end of file
+
+
+@pytest.fixture
+def metric_parks():
+    """Three square parks 100m wide along the x axis (EPSG:3857)"""
+    parks = gpd.GeoDataFrame(
+        {
+            "id": ["a", "b", "c"],
+            "name": ["Park A", "Park B", "Park C"],
+            "geometry": [
+                box(100, 0, 200, 100),
+                box(500, 0, 600, 100),
+                box(3000, 0, 3100, 100),
+            ],
+        },
+        crs="EPSG:3857",
+    ).to_crs(epsg=4326)
+    ratings = {"a": 3.0, "b": 3.5, "c": 4.5}
+    parks_dict = {
+        row["id"]: ParkTuple(row.geometry, row["name"], ratings[row["id"]], 1, 0)
+        for _, row in parks.iterrows()
+    }
+    return parks, parks_dict
+
+
+def test_nearest_park_metrics(metric_parks):
+    """Check nearest rated park and mean k-nearest distances against known values"""
+    parks, parks_dict = metric_parks
+    points = gpd.GeoDataFrame(
+        geometry=[Point(0, 50), Point(150, 50)], crs="EPSG:3857"
+    ).to_crs(epsg=4326)
+
+    nearest_rated, mean_k_nearest = nearest_park_metrics(points, parks, parks_dict)
+
+    # only park "c" is rated >= 4, and it lies beyond the initial search radius
+    assert np.allclose(nearest_rated, [3000, 2850], atol=1e-3)
+    assert np.allclose(mean_k_nearest, [(100 + 500 + 3000) / 3, (0 + 350 + 2850) / 3], atol=1e-3)
+
+
+def test_park_access_entrance_mode(metric_parks):
+    """Entrance mode measures to the park's gate rather than its nearest edge"""
+    parks, _ = metric_parks
+    points = gpd.GeoDataFrame(geometry=[Point(0, 50)], crs="EPSG:3857").to_crs(
+        epsg=4326
+    )
+    # park "a" only has a gate on its far side; "b" has no known entrance
+    entrances = gpd.GeoDataFrame(geometry=[Point(200, 50)], crs="EPSG:3857").to_crs(
+        epsg=4326
+    )
+
+    _, boundary_parks, boundary_dist = park_access_pairs(
+        points, parks, 1000, "boundary"
+    )
+    _, entrance_parks, entrance_dist = park_access_pairs(
+        points, parks, 1000, "entrance", entrances
+    )
+
+    assert list(parks["id"].values[boundary_parks]) == ["a", "b"]
+    assert np.allclose(boundary_dist, [100, 500], atol=1e-3)
+    assert list(parks["id"].values[entrance_parks]) == ["a", "b"]
+    assert np.allclose(entrance_dist, [200, 500], atol=1e-3)
+
+
+def test_park_access_no_pairs(metric_parks):
+    """Points with no park within walking distance give no pairs"""
+    parks, _ = metric_parks
+    points = gpd.GeoDataFrame(geometry=[Point(0, 5000)], crs="EPSG:3857").to_crs(
+        epsg=4326
+    )
+
+    point_idx, park_idx, distances = park_access_pairs(points, parks, 1000, "boundary")
+
+    assert len(point_idx) == len(park_idx) == len(distances) == 0
+
+
+def test_match_reviews_exclusive(metric_parks):
+    """A review between two parks is assigned once, to the better named match"""
+    parks, _ = metric_parks
+    review_points = gpd.GeoSeries(
+        [Point(350, 50), Point(150, 120)], crs="EPSG:3857"
+    ).to_crs(epsg=4326)
+    ratings = gpd.GeoDataFrame(
+        {
+            "name": ["Park B Playground", "Somewhere Else"],
+            "rating": [4.0, 3.0],
+            "review_count": [10, 5],
+            "latitude": review_points.y,
+            "longitude": review_points.x,
+        },
+        geometry=review_points,
+    )
+
+    match_table = match_reviews_exclusive(parks, ratings)
+    parks_dict = create_parks_dict(parks, ratings, match_table)
+
+    assert match_table["review_id"].is_unique
+    assert dict(zip(match_table["review_id"], match_table["park_id"])) == {0: "b", 1: "a"}
+    assert parks_dict["b"].rating == 4.0
+    assert parks_dict["c"].total_reviews == 0
+
+
+def test_match_reviews_exclusive_no_candidates(metric_parks):
+    """Reviews with no park within the match distance give an empty table"""
+    parks, _ = metric_parks
+    review_points = gpd.GeoSeries([Point(0, 5000)], crs="EPSG:3857").to_crs(epsg=4326)
+    ratings = gpd.GeoDataFrame(
+        {
+            "name": ["Park A"],
+            "rating": [4.0],
+            "review_count": [10],
+            "latitude": review_points.y,
+            "longitude": review_points.x,
+        },
+        geometry=review_points,
+    )
+
+    match_table = match_reviews_exclusive(parks, ratings)
+
+    assert len(match_table) == 0
+    assert create_parks_dict(parks, ratings, match_table)["a"].total_reviews == 0
+
+
+def test_match_reviews_exclusive_missing_names(metric_parks):
+    """Parks and reviews with missing (NaN) names only match on proximity"""
+    parks, _ = metric_parks
+    parks["name"] = ["Park A", np.nan, "Park C"]
+    review_points = gpd.GeoSeries([Point(550, 50)], crs="EPSG:3857").to_crs(epsg=4326)
+    ratings = gpd.GeoDataFrame(
+        {
+            "name": [np.nan],
+            "rating": [4.0],
+            "review_count": [10],
+            "latitude": review_points.y,
+            "longitude": review_points.x,
+        },
+        geometry=review_points,
+    )
+
+    match_table = match_reviews_exclusive(parks, ratings)
+    assert list(match_table["park_id"]) == ["b"]
+
+
+def test_match_reviews_exclusive_scores_name_pairs_once(metric_parks, monkeypatch):
+    """Reviews sharing a name are scored against each park name only once"""
+    parks, _ = metric_parks
+    calls = []
+    jaro_winkler_similarity = index.jaro_winkler_similarity
+    monkeypatch.setattr(
+        index,
+        "jaro_winkler_similarity",
+        lambda a, b: calls.append((a, b)) or jaro_winkler_similarity(a, b),
+    )
+    review_points = gpd.GeoSeries(
+        [Point(350, 50), Point(350, 60), Point(150, 120)], crs="EPSG:3857"
+    ).to_crs(epsg=4326)
+    ratings = gpd.GeoDataFrame(
+        {
+            "name": ["Park B Playground", "Park B Playground", "Park B Playground"],
+            "rating": [4.0, 3.0, 5.0],
+            "review_count": [10, 5, 1],
+            "latitude": review_points.y,
+            "longitude": review_points.x,
+        },
+        geometry=review_points,
+    )
+
+    match_table = match_reviews_exclusive(parks, ratings)
+
+    # the three reviews each have parks "a" and "b" as candidates, and the
+    # review on park "a" still goes to it on proximity
+    assert len(calls) == len(set(calls)) == 2
+    assert list(match_table["park_id"]) == ["b", "b", "a"]
+
+
+@pytest.fixture
+def buffered_reviews():
+    """Reviews buffered by 60m, named after a park or near park "c" """
+    review_points = gpd.GeoSeries(
+        [Point(150, 50), Point(3050, 150), Point(1500, 50)], crs="EPSG:3857"
+    )
+    coordinates = review_points.to_crs(epsg=4326)
+    return gpd.GeoDataFrame(
+        {
+            "name": ["Washington Park Playground", "Somewhere Else", "Lincoln Park Zoo"],
+            "rating": [4.0, 3.0, 5.0],
+            "review_count": [10, 5, 2],
+            "latitude": coordinates.y,
+            "longitude": coordinates.x,
+        },
+        geometry=review_points.buffer(60),
+    ).to_crs(epsg=4326)
+
+
+def test_match_reviews_buffer(metric_parks, buffered_reviews):
+    """Buffer match table rates parks like the name and spatial matches"""
+    parks, _ = metric_parks
+    parks["name"] = ["Washington Park", "Lincoln Park", None]
+
+    match_table = match_reviews_buffer(parks, buffered_reviews)
+    assert list(
+        zip(match_table["park_id"], match_table["review_id"], match_table["match_type"])
+    ) == [("a", 0, "name"), ("b", 2, "name"), ("c", 1, "spatial")]
+
+    parks_dict = create_parks_dict(parks, buffered_reviews)
+    for _, park in parks.iterrows():
+        if park["id"] == "c":
+            expected = match_park_ratings_point(park.geometry, buffered_reviews)
+        else:
+            expected = match_park_ratings_name(park["name"], park.geometry, buffered_reviews)
+        assert parks_dict[park["id"]] == expected
+
+
+def test_load_match_table(metric_parks, buffered_reviews, tmp_path, monkeypatch):
+    """Match table is reused until the parks or reviews change"""
+    parks, _ = metric_parks
+    parks["name"] = ["Washington Park", "Lincoln Park", "Jackson Park"]
+    parks_path = tmp_path / "parks.geojson"
+    parks.to_file(parks_path, driver="GeoJSON")
+    reviews_path = tmp_path / "reviews.npy"
+    reviews_path.write_bytes(b"reviews")
+
+    calls = []
+    match = index.match_reviews_buffer
+    monkeypatch.setattr(
+        index, "match_reviews_buffer", lambda *args: calls.append(1) or match(*args)
+    )
+
+    first = load_match_table(parks, buffered_reviews, parks_path, reviews_path)
+    second = load_match_table(parks, buffered_reviews, parks_path, reviews_path)
+    assert len(calls) == 1
+    assert second.equals(first.reset_index(drop=True))
+
+    reviews_path.write_bytes(b"refreshed reviews")
+    load_match_table(parks, buffered_reviews, parks_path, reviews_path)
+    assert len(calls) == 2
+
+    # exclusive matches are saved separately
+    load_match_table(parks, buffered_reviews, parks_path, reviews_path, "exclusive")
+    assert (tmp_path / "review_park_matches_exclusive.json").exists()
+    load_match_table(parks, buffered_reviews, parks_path, reviews_path)
+    assert len(calls) == 2
+
+
+def test_load_ratings_stable_ids(tmp_path):
+    """Review ids name the same places whatever the row order of the table"""
+    places = [
+        Place("Union Park", 41.8845, -87.6658, 4.5, 1000, "Google"),
+        Place("Union Park", 41.8845, -87.6658, 4.0, 20, "Yelp"),
+        Place("Smith Park", 41.8920, -87.6880, 4.0, 50, "Google"),
+    ]
+    first_dir, second_dir = tmp_path / "first", tmp_path / "second"
+    first_dir.mkdir()
+    second_dir.mkdir()
+    save_place_table(place_table(places), "combined_reviews", first_dir)
+    save_place_table(place_table(places[::-1]), "combined_reviews", second_dir)
+
+    first, second = load_ratings(first_dir), load_ratings(second_dir)
+
+    assert first.index.is_unique
+    assert sorted(first.index) == sorted(second.index)
+    for review_id in first.index:
+        assert first.loc[review_id, ["name", "source", "review_count"]].equals(
+            second.loc[review_id, ["name", "source", "review_count"]]
+        )
+
+
+def test_two_phase_matches_exact(housing_data, parks_data, tmp_path):
+    """Park index results must be identical to the exact intersects path"""
+    parks_path = tmp_path / "parks.geojson"
+    parks_data.to_file(parks_path, driver="GeoJSON")
+
+    # first call builds and caches the index, second call loads it from disk
+    load_park_index(parks_data, parks_path)
+    park_index = load_park_index(parks_data, parks_path)
+
+    buffered = create_buffer(housing_data.iloc[:100], 1000)
+    for buffered_point in buffered.geometry:
+        exact = park_walking_distance(buffered_point, parks_data)
+        two_phase = park_walking_distance(buffered_point, parks_data, park_index)
+        assert two_phase == exact
+
+
+def test_approximate_error_bound(housing_data, parks_data):
+    """Approximate index stays within its error bound of the exact result"""
+    parks_dict = {
+        park_id: ParkTuple(polygon, None, 4.0, 1, polygon.area)
+        for park_id, polygon in zip(parks_data["id"], parks_data.geometry)
+    }
+    points = housing_data.iloc[:100]
+
+    exact = create_housing_df(
+        points, parks_dict, 1000, parks_data, None,
+        park_index=create_park_index(parks_data),
+    )
+    approx = approximate_index(points, parks_data, parks_dict, 1000)
+
+    error = np.abs(approx["rating_index"] - exact["rating_index"].to_numpy())
+    assert (error <= approx["rating_error"] + 1e-12).all()
+
+    # with zero tolerance every uncertain point is re-checked exactly
+    rechecked = create_housing_df(
+        points, parks_dict, 1000, parks_data, None, engine="approximate", tolerance=0
+    )
+    assert np.allclose(rechecked["rating_index"], exact["rating_index"])
+
+
+def test_approximate_recheck_unrated_parks(housing_data, parks_data):
+    """Unrated parks add no rating error, yet their park count is re-checked"""
+    parks_dict = {
+        park_id: ParkTuple(polygon, None, 0.0, 0, polygon.area)
+        for park_id, polygon in zip(parks_data["id"], parks_data.geometry)
+    }
+    points = housing_data.iloc[:100]
+
+    exact = create_housing_df(
+        points, parks_dict, 1000, parks_data, None,
+        park_index=create_park_index(parks_data),
+    )
+    approx = approximate_index(points, parks_data, parks_dict, 1000)
+    assert not approx["rating_error"].any()
+    assert approx["count_error"].any()
+
+    rechecked = create_housing_df(
+        points, parks_dict, 1000, parks_data, None, engine="approximate", tolerance=0
+    )
+    assert np.array_equal(rechecked["park_count"], exact["park_count"])
+    assert np.allclose(rechecked["size_index"], exact["size_index"])
+    assert not rechecked[["park_count_error", "size_index_error"]].to_numpy().any()
+
+
+def test_create_housing_file_null_distances(metric_parks, buffered_reviews, tmp_path):
+    """Distances to parks that do not exist are written as JSON null"""
+    parks, _ = metric_parks
+    parks["name"] = ["Washington Park", "Lincoln Park", None]
+    # no park is rated 4 or more
+    buffered_reviews["rating"] = 3.0
+    points = gpd.GeoSeries([Point(150, 50), Point(550, 50)], crs="EPSG:3857").to_crs(
+        epsg=4326
+    )
+    housing = gpd.GeoDataFrame(
+        {"id": [1, 2], "Latitude": points.y, "Longitude": points.x}, geometry=points
+    )
+    file_name = tmp_path / "housing.geojson"
+
+    create_housing_file(housing, 1000, parks, buffered_reviews, file_name)
+
+    properties = [
+        feature["properties"] for feature in json.loads(file_name.read_text())["features"]
+    ]
+    assert [p["nearest_rated_park_dist"] for p in properties] == [None, None]
+    assert all(isinstance(p["mean_k_nearest_dist"], float) for p in properties)
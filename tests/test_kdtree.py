@@ -0,0 +1,39 @@
+import pytest
+import numpy as np
+from green_spaces.index.kdtree import build_kdtree, query_radius
+
+
+@pytest.fixture
+def circles():
+    """Random circles with varying radii, enough to build several tree levels"""
+    rng = np.random.default_rng(2025)
+    centers = rng.uniform(0, 5000, (500, 2))
+    radii = rng.exponential(40, 500)
+    return centers, radii
+
+
+def test_query_radius_matches_brute_force(circles):
+    """KD-tree radius query returns exactly the pairs found by brute force"""
+    centers, radii = circles
+    points = np.random.default_rng(7).uniform(0, 5000, (400, 2))
+
+    tree = build_kdtree(centers, radii)
+    point_idx, circle_idx, center_dist = query_radius(tree, points, 300)
+
+    all_dist = np.hypot(
+        points[:, None, 0] - centers[None, :, 0], points[:, None, 1] - centers[None, :, 1]
+    )
+    expected_points, expected_circles = np.nonzero(all_dist <= 300 + radii[None, :])
+
+    assert np.array_equal(point_idx, expected_points)
+    assert np.array_equal(circle_idx, expected_circles)
+    assert np.allclose(center_dist, all_dist[expected_points, expected_circles])
+
+
+def test_query_radius_no_hits(circles):
+    """Points far from every circle return empty results"""
+    centers, radii = circles
+    tree = build_kdtree(centers, radii)
+    point_idx, circle_idx, _ = query_radius(tree, np.array([[1e7, 1e7]]), 100)
+
+    assert len(point_idx) == 0 and len(circle_idx) == 0
@@ -0,0 +1,57 @@
+import geopandas as gpd
+import pytest
+import shapely
+from shapely.geometry import Polygon, box
+
+from green_spaces.parks.normalize_geometries import normalize_gdf, polygonal_part
+
+
+@pytest.fixture
+def parks():
+    """
+    Parks with a self-intersecting bowtie, a clockwise ring, a valid park,
+    a sliver thinner than the precision grid and a park with excess
+    precision.
+    """
+    return gpd.GeoDataFrame(
+        {"name": ["bowtie", "clockwise", "valid", "sliver", "precise"]},
+        geometry=[
+            Polygon([(-87.6, 41.8), (-87.59, 41.81), (-87.59, 41.8), (-87.6, 41.81)]),
+            Polygon([(-87.6, 41.8), (-87.6, 41.81), (-87.59, 41.81), (-87.59, 41.8)]),
+            box(-87.6, 41.8, -87.59, 41.81),
+            box(-87.6, 41.8, -87.59, 41.80000001),
+            box(-87.6000000001, 41.8, -87.59, 41.81),
+        ],
+        crs=4326,
+    )
+
+
+def test_normalize_gdf(parks):
+    """
+    Tests that geometries are repaired, oriented and snapped, that slivers
+    are dropped and that the fixes are counted.
+    """
+    normalized, report = normalize_gdf(parks, "parks")
+
+    assert list(normalized["name"]) == ["bowtie", "clockwise", "valid", "precise"]
+    assert normalized.is_valid.all()
+    assert (report.total, report.repaired, report.dropped) == (5, 1, 1)
+    assert report.reoriented == 2
+    assert report.snapped == 2
+
+    for geometry in normalized.geometry:
+        for part in shapely.get_parts(geometry):
+            assert shapely.is_ccw(part.exterior)
+    assert normalized.geometry.iloc[3].bounds[0] == pytest.approx(-87.6, abs=1e-12)
+
+
+def test_polygonal_part():
+    """
+    Tests that stray lines are dropped from repaired collections.
+    """
+    collection = shapely.GeometryCollection(
+        [box(0, 0, 1, 1), shapely.LineString([(2, 2), (3, 3)])]
+    )
+
+    assert polygonal_part(collection).equals(box(0, 0, 1, 1))
+    assert polygonal_part(shapely.LineString([(2, 2), (3, 3)])).is_empty
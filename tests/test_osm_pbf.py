@@ -0,0 +1,132 @@
+import geopandas as gpd
+import pytest
+
+from green_spaces.config import CHICAGO
+from green_spaces.parks.osm_pbf import is_park, read_osm_extract
+
+OSM_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6" generator="test">
+  <node id="1" version="1" lat="41.80" lon="-87.70"/>
+  <node id="2" version="1" lat="41.80" lon="-87.69"/>
+  <node id="3" version="1" lat="41.81" lon="-87.69"/>
+  <node id="4" version="1" lat="41.81" lon="-87.70"/>
+  <node id="5" version="1" lat="41.900" lon="-87.650"/>
+  <node id="6" version="1" lat="41.900" lon="-87.649"/>
+  <node id="7" version="1" lat="41.901" lon="-87.649"/>
+  <node id="8" version="1" lat="41.85" lon="-87.60">
+    <tag k="building" v="house"/>
+  </node>
+  <node id="9" version="1" lat="45.00" lon="-87.60">
+    <tag k="building" v="house"/>
+  </node>
+  <node id="20" version="1" lat="41.75" lon="-87.75"/>
+  <node id="21" version="1" lat="41.75" lon="-87.55"/>
+  <node id="22" version="1" lat="41.95" lon="-87.55"/>
+  <node id="23" version="1" lat="41.95" lon="-87.75"/>
+  <node id="30" version="1" lat="41.98" lon="-87.80"/>
+  <node id="31" version="1" lat="41.98" lon="-87.79"/>
+  <node id="32" version="1" lat="41.99" lon="-87.79"/>
+  <way id="10" version="1">
+    <nd ref="1"/><nd ref="2"/><nd ref="3"/><nd ref="4"/><nd ref="1"/>
+    <tag k="leisure" v="park"/>
+    <tag k="name" v="Test Park"/>
+  </way>
+  <way id="11" version="1">
+    <nd ref="5"/><nd ref="6"/><nd ref="7"/><nd ref="5"/>
+    <tag k="building" v="yes"/>
+  </way>
+  <way id="12" version="1">
+    <nd ref="1"/><nd ref="2"/><nd ref="3"/><nd ref="1"/>
+    <tag k="highway" v="footway"/>
+  </way>
+  <way id="13" version="1">
+    <nd ref="30"/><nd ref="31"/><nd ref="32"/><nd ref="30"/>
+    <tag k="leisure" v="park"/>
+    <tag k="name" v="Suburban Park"/>
+  </way>
+  <way id="14" version="1">
+    <nd ref="20"/><nd ref="21"/><nd ref="22"/><nd ref="23"/><nd ref="20"/>
+  </way>
+  <relation id="40" version="1">
+    <member type="way" ref="14" role="outer"/>
+    <tag k="type" v="boundary"/>
+    <tag k="boundary" v="administrative"/>
+    <tag k="admin_level" v="8"/>
+    <tag k="name" v="Chicago"/>
+  </relation>
+</osm>
+"""
+
+
+@pytest.fixture
+def extract(tmp_path):
+    """
+    A small OSM file with a park, building way and node, a building node
+    outside Chicago, an untagged area, the Chicago boundary and a park
+    within the Chicago bounds but outside its boundary.
+    """
+    path = tmp_path / "extract.osm"
+    path.write_text(OSM_XML)
+    return read_osm_extract(str(path))
+
+
+def test_is_park():
+    """
+    Tests that only the park tags match.
+    """
+    assert is_park({"leisure": "dog_park"})
+    assert is_park({"landuse": "recreation_ground"})
+    assert not is_park({"leisure": "pitch", "landuse": "grass"})
+
+
+def test_read_osm_extract(extract):
+    """
+    Tests that parks and buildings come out of one pass with osmnx-style
+    (element, id) indexes, tag columns and geometries.
+    """
+    parks, buildings = extract
+
+    # ids are strings, like the saved osmnx features, and the park outside
+    # the Chicago boundary is dropped
+    assert list(parks.index) == [("way", "10")]
+    assert parks.loc[("way", "10"), "name"] == "Test Park"
+    assert parks.geometry.iloc[0].geom_type == "Polygon"
+    assert parks.crs.to_epsg() == 4326
+
+    # the building node outside the Chicago bounds is dropped
+    assert sorted(buildings.index) == [("node", "8"), ("way", "11")]
+    assert buildings.loc[("way", "11"), "building"] == "yes"
+
+
+def test_read_osm_extract_without_boundary(tmp_path):
+    """
+    Tests that parks within the bounds are kept when the extract has no
+    boundary of the place.
+    """
+    path = tmp_path / "extract.osm"
+    path.write_text(OSM_XML)
+    parks = read_osm_extract(str(path), place_name="Evanston, Illinois, USA").parks
+
+    assert sorted(parks.index) == [("way", "10"), ("way", "13")]
+
+
+def test_ingest_extract(tmp_path):
+    """
+    Tests that the ingest writes the park and building layers of one pass.
+    """
+    # the park and building stages it writes through import osmnx
+    ingest_extract = pytest.importorskip("green_spaces.parks.ingest_extract")
+    path = tmp_path / "extract.osm"
+    path.write_text(OSM_XML)
+    city = CHICAGO._replace(data_dir=tmp_path)
+
+    ingest_extract.main(str(path), city)
+
+    parks = gpd.read_file(tmp_path / "uncleaned_park_polygons.geojson")
+    assert list(parks["id"]) == ["10"]
+    buildings = gpd.read_file(tmp_path / "processed/buildings/chicago_buildings.geojson")
+    centroids = gpd.read_file(
+        tmp_path / "processed/buildings/chicago_building_centroids.geojson"
+    )
+    assert len(buildings) == len(centroids) == 2
+    assert (centroids.geom_type == "Point").all()
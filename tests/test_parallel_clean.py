@@ -0,0 +1,56 @@
+import copy
+import pytest
+from shapely.geometry import box, mapping
+
+from green_spaces.parks.clean_park_polygons import clean_features, parse_geometries
+from green_spaces.parks.incremental_clean import component_labels
+from green_spaces.parks.parallel_clean import partition_components, parallel_clean
+
+
+@pytest.fixture
+def features():
+    """
+    Rows of overlapping unnamed parks, each containing a small named park,
+    spread over several tiles of size 1. Rows starting at 0.1 stay inside a
+    tile while rows starting at 0.7 cross a tile border.
+    """
+    features = []
+    for row in range(4):
+        x = row + (0.1 if row % 2 else 0.7)
+        parks = [
+            (None, box(x, row, x + 0.3, row + 0.3)),
+            (None, box(x + 0.2, row, x + 0.5, row + 0.3)),
+            ("Named Park", box(x + 0.05, row + 0.05, x + 0.1, row + 0.1)),
+            ("Lone Park", box(x, row + 0.5, x + 0.1, row + 0.6)),
+        ]
+        for i, (name, geom) in enumerate(parks):
+            features.append({
+                "type": "Feature",
+                "geometry": mapping(geom),
+                "properties": {"id": f"{row}-{i}", "name": name},
+            })
+    return features
+
+
+def test_partition_components(features):
+    """
+    Tests that components crossing tile borders are kept out of the tiles.
+    """
+    geometries = parse_geometries(features)
+    tiles, border = partition_components(geometries, component_labels(geometries), 1)
+
+    assert sorted(border) == [0, 1, 2, 8, 9, 10]
+    assert sorted(p for positions in tiles.values() for p in positions) == [
+        3, 4, 5, 6, 7, 11, 12, 13, 14, 15
+    ]
+
+
+def test_parallel_clean_matches_single_process(features):
+    """
+    Tests that tile-parallel cleaning gives the single-process output.
+    """
+    expected, expected_lineage = clean_features(copy.deepcopy(features))
+    cleaned, lineage = parallel_clean(copy.deepcopy(features), tile_size=1, max_workers=2)
+
+    assert cleaned == expected
+    assert lineage == expected_lineage
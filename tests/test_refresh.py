@@ -0,0 +1,138 @@
+import geopandas as gpd
+import pytest
+from shapely.geometry import box
+from green_spaces.reviews.refresh import (
+    Search,
+    merge_ratings,
+    moved_parks,
+    place_key,
+    rank_searches,
+    select_within_budget,
+)
+
+DAY = 86_400
+
+
+def place(name, latitude, longitude, rating, review_count, source="Google"):
+    '''
+    Cleaned place dictionary
+    '''
+    return {"name": name, "latitude": latitude, "longitude": longitude,
+            "rating": rating, "review_count": review_count, "source": source}
+
+
+def google_response(*review_counts, name="Park"):
+    '''
+    Raw Google response with one place per review count
+    '''
+    return {"places": [
+        {"name": f"{name} {i}", "geometry": {"location": {"lat": 41.8, "lng": -87.6 + i}},
+         "rating": 4, "user_ratings_total": count}
+        for i, count in enumerate(review_counts)
+    ]}
+
+
+@pytest.fixture
+def searches():
+    '''
+    Two Google searches over 15 locations and one Yelp search
+    '''
+    url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+    locations = [(41.8, -87.6)] * 15
+    return [
+        Search("google_park", "google", url, {"type": "park"}, locations),
+        Search("google_field", "google", url, {"keyword": "field"}, locations),
+        Search("yelp_parks", "yelp", "https://api.yelp.com/v3/businesses/search",
+               {"categories": "parks"}, None),
+    ]
+
+
+def test_rank_searches(searches):
+    '''
+    Test that older and more influential searches rank first, and that
+    uncached searches are skipped
+    '''
+    responses = [google_response(10), google_response(10_000, name="Field"), None]
+    fetch_times = [100 * DAY, 100 * DAY, None]
+    ranked = rank_searches(searches, responses, fetch_times, now=200 * DAY)
+    assert [c.search.output_name for c in ranked] == ["google_field", "google_park"]
+    assert ranked[0].age == 100
+    assert ranked[0].impact == 10_000
+    assert ranked[0].cost == 15
+
+    # only reviews of places matched to parks count
+    matched = {place_key(place("Park 0", 41.8, -87.6, 4, 10))}
+    ranked = rank_searches(searches, responses, fetch_times, matched, now=200 * DAY)
+    assert [c.impact for c in ranked] == [10, 0]
+
+
+def test_select_within_budget(searches):
+    '''
+    Test that the highest priority searches fitting the budget are picked
+    '''
+    responses = [google_response(10), google_response(10_000), google_response(1)]
+    fetch_times = [100 * DAY, 100 * DAY, 50 * DAY]
+    ranked = rank_searches(searches, responses, fetch_times, now=200 * DAY)
+
+    selected = select_within_budget(ranked, budget=20)
+    assert [c.search.output_name for c in selected] == ["google_field", "yelp_parks"]
+    assert select_within_budget(ranked, budget=100, max_searches=1) == ranked[:1]
+
+
+def test_merge_ratings():
+    '''
+    Test that changed places are updated in place, missing ones removed and
+    new ones appended
+    '''
+    old = [place("A", 41.8, -87.6, 4.0, 10), place("B", 41.9, -87.6, 4.0, 10),
+           place("C", 42.0, -87.6, 4.0, 10)]
+    new = [place("D", 41.7, -87.6, 5.0, 1), place("C", 42.0, -87.6, 4.0, 10),
+           place("A", 41.8, -87.6, 4.5, 12)]
+    merged, changed, added, removed = merge_ratings(old, new)
+    assert merged == [new[2], new[1], new[0]]
+    assert (changed, added, removed) == (1, 1, 1)
+
+
+def test_merge_ratings_shared_location():
+    '''
+    Test that listings of different sources sharing a name and location
+    are both kept
+    '''
+    places = [place("A", 41.8, -87.6, 4.0, 10, "Google"),
+              place("A", 41.8, -87.6, 3.0, 5, "Yelp")]
+    merged, changed, added, removed = merge_ratings(places, places[::-1])
+    assert merged == places
+    assert (changed, added, removed) == (0, 0, 0)
+
+
+def test_moved_parks():
+    '''
+    Test that only parks whose reviews changed are marked for recompute
+    '''
+    parks = gpd.GeoDataFrame(
+        {"id": ["1", "2"], "name": ["Alpha Park", "Beta Park"]},
+        geometry=[box(-87.601, 41.799, -87.599, 41.801),
+                  box(-87.501, 41.799, -87.499, 41.801)],
+        crs=4326,
+    )
+    old = [place("Alpha Park", 41.8, -87.6, 4.0, 10),
+           place("Beta Park", 41.8, -87.5, 4.0, 10)]
+    new = [place("Alpha Park", 41.8, -87.6, 4.0, 10),
+           place("Beta Park", 41.8, -87.5, 3.0, 20)]
+    assert moved_parks(parks, old, old) == []
+    assert moved_parks(parks, old, new) == ["2"]
+
+
+def test_moved_parks_matches_like_index():
+    '''
+    Test that places are matched to parks as the index matches reviews: a
+    named park only takes reviews with a similar name, however close
+    '''
+    parks = gpd.GeoDataFrame(
+        {"id": ["1"], "name": ["Alpha Park"]},
+        geometry=[box(-87.601, 41.799, -87.599, 41.801)],
+        crs=4326,
+    )
+    old = [place("Gamma Fountain", 41.8, -87.6, 4.0, 10)]
+    new = [place("Gamma Fountain", 41.8, -87.6, 2.0, 50)]
+    assert moved_parks(parks, old, new) == []
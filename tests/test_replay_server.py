@@ -0,0 +1,148 @@
+import asyncio
+import httpx
+import pytest
+from green_spaces.config import MINNEAPOLIS
+from green_spaces.reviews import google, yelp
+from green_spaces.reviews.cache_store import CacheStore
+from green_spaces.reviews.google import fetch_google
+from green_spaces.reviews.replay_server import (
+    GOOGLE_PATH,
+    YELP_PATH,
+    ReplayConfig,
+    ReplayData,
+    load_replay_data,
+    start_replay_server,
+)
+from green_spaces.reviews.reviews_utils import FetchException, RateLimiter
+from green_spaces.reviews.yelp import fetch_yelp
+
+GOOGLE_URL = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+YELP_URL = "https://api.yelp.com/v3/businesses/search"
+
+
+@pytest.fixture
+def replay_data():
+    '''
+    Cached Google search of 50 places along a street, and a Yelp search of
+    120 places
+    '''
+    google_places = [
+        {"place_id": str(i), "name": f"Park {i}",
+         "geometry": {"location": {"lat": 41.8, "lng": -87.7 + i * 0.001}}}
+        for i in range(50)
+    ]
+    yelp_places = [
+        {"id": str(i), "name": f"Yelp {i}",
+         "coordinates": {"latitude": 41.8, "longitude": -87.6}}
+        for i in range(120)
+    ]
+    return ReplayData([
+        (GOOGLE_URL, {"radius": "3590", "type": "park"}, {"places": google_places}),
+        (YELP_URL, {"location": "Chicago", "categories": "parks"}, {"places": yelp_places}),
+    ])
+
+
+@pytest.fixture
+def replay_server(replay_data):
+    '''
+    Start a replay server for a ReplayConfig
+    '''
+    servers = []
+
+    def start(config=None):
+        server, base_url = start_replay_server(replay_data, config)
+        servers.append(server)
+        return base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def fast_limiter():
+    return RateLimiter(qps=1000, burst=100, max_retries=3, base_delay=0.001)
+
+
+def test_google_replay(monkeypatch, replay_server, fast_limiter):
+    '''
+    Test that Google searches are answered from the cache within their
+    radius, 20 results per page
+    '''
+    monkeypatch.setattr(google, "PAGE_TOKEN_DELAY", 0)
+    base_url = replay_server()
+
+    # about 83 m between places, so a 2 km radius reaches 25 of them
+    places = asyncio.run(fetch_google(
+        base_url + GOOGLE_PATH, {"radius": "2000", "type": "park"}, [(41.8, -87.7)],
+        limiter=fast_limiter,
+    ))
+    assert [place["place_id"] for place in places] == [str(i) for i in range(25)]
+    assert fast_limiter.stats().requests == 2
+
+    places = asyncio.run(fetch_google(
+        base_url + GOOGLE_PATH, {"radius": "2000", "keyword": "stadium"},
+        [(41.8, -87.7)], limiter=fast_limiter,
+    ))
+    assert places == []
+
+
+def test_yelp_replay(replay_server, fast_limiter):
+    '''
+    Test that Yelp searches are paged by offset and limit
+    '''
+    base_url = replay_server()
+    places = fetch_yelp(base_url + YELP_PATH,
+                        {"location": "Chicago", "categories": "parks"}, fast_limiter)
+    assert [place["id"] for place in places] == [str(i) for i in range(120)]
+    assert fast_limiter.stats().requests == 3
+
+
+def test_error_injection(replay_server, fast_limiter):
+    '''
+    Test that injected failures are retried, then raised
+    '''
+    base_url = replay_server(ReplayConfig(error_rate=1.0))
+    with pytest.raises(FetchException):
+        fetch_yelp(base_url + YELP_PATH, {"location": "Chicago"}, fast_limiter)
+    assert fast_limiter.stats().retries == 3
+
+
+def test_rate_limit_injection(replay_server):
+    '''
+    Test that requests above the rate limit are answered 429 with a
+    Retry-After header
+    '''
+    base_url = replay_server(ReplayConfig(rate_limit=2, retry_after=7))
+    statuses = [httpx.get(base_url + YELP_PATH).status_code for _ in range(4)]
+    assert statuses[:2] == [200, 200]
+    response = httpx.get(base_url + YELP_PATH)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
+
+
+def test_latency_injection(replay_server):
+    '''
+    Test that responses are delayed by the configured latency
+    '''
+    base_url = replay_server(ReplayConfig(latency=0.2))
+    response = httpx.get(base_url + YELP_PATH)
+    assert response.elapsed.total_seconds() >= 0.2
+
+
+def test_load_replay_data_city(tmp_path):
+    '''
+    Test that the replay data is read from the searches and cache of the
+    given city
+    '''
+    city = MINNEAPOLIS._replace(cache_dir=tmp_path / "minneapolis")
+    _, url, params = yelp.search_requests(city)[0]
+    with CacheStore(city.cache_dir) as store:
+        store.put(url, params, {"places": [{"id": "1", "name": "Loring Park"}]})
+
+    data = load_replay_data(city)
+    assert [list(places) for places in data.yelp.values()] == [["1"]]
+
+    other = MINNEAPOLIS._replace(cache_dir=tmp_path / "other")
+    assert not load_replay_data(other).yelp
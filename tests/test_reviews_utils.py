@@ -1,5 +1,22 @@
+import asyncio
+import datetime
+import httpx
+import numpy as np
 import pytest
-from green_spaces.reviews.reviews_utils import cache_key
+from green_spaces.reviews import reviews_utils
+from green_spaces.reviews.cache_store import CacheStore
+from green_spaces.reviews.reviews_utils import (
+    BudgetExceeded,
+    LimiterStats,
+    Place,
+    RateLimiter,
+    cache_key,
+    load_place_table,
+    place_table,
+    save_place_table,
+    table_columns,
+    table_places,
+)
 
 @pytest.fixture
 def sample_yelp_inputs():
@@ -45,4 +62,147 @@ def test_cache_key_google(sample_google_inputs):
     correct_key = "maps.googleapis.commapsapiplacenearbysearchjson" + \
                   "_radius_3590.json_keyword_stadium.json"
     assert key == correct_key, \
-        "Cache key incorrect, is {key} instead of {correct_key}"
\ No newline at end of file
+        "Cache key incorrect, is {key} instead of {correct_key}"
+
+class FakeClock:
+    '''
+    Clock advanced by hand to test the token bucket without sleeping
+    '''
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_rate_limiter_token_bucket():
+    '''
+    Test that requests beyond the burst wait for tokens at the set rate
+    '''
+    clock = FakeClock()
+    limiter = RateLimiter(qps=2, burst=2, clock=clock)
+
+    waits = [limiter.reserve() for _ in range(4)]
+    assert waits == [0, 0, 0.5, 1.0]
+
+    # tokens refill with time
+    clock.now = 10
+    assert limiter.reserve() == 0
+    assert limiter.stats() == LimiterStats(requests=5, retries=0, throttled=1.5)
+
+
+def test_rate_limiter_daily_budget():
+    '''
+    Test that the daily budget stops requests
+    '''
+    limiter = RateLimiter(qps=1000, burst=10, daily_budget=3)
+    for _ in range(3):
+        limiter.reserve()
+    with pytest.raises(BudgetExceeded):
+        limiter.reserve()
+
+
+def test_rate_limiter_persisted_budget(tmp_path):
+    '''
+    Test that the daily budget kept in the cache store holds across
+    limiters, e.g. after a restart
+    '''
+    with CacheStore(tmp_path) as store:
+        limiter = RateLimiter(qps=1000, burst=10, daily_budget=3,
+                              provider="yelp", store=store)
+        limiter.reserve()
+        limiter.reserve()
+
+    with CacheStore(tmp_path) as store:
+        limiter = RateLimiter(qps=1000, burst=10, daily_budget=3,
+                              provider="yelp", store=store)
+        limiter.reserve()
+        with pytest.raises(BudgetExceeded):
+            limiter.reserve()
+        assert store.request_count("yelp", datetime.date.today().isoformat()) == 3
+
+        # budgets are counted per provider
+        RateLimiter(qps=1000, daily_budget=3, provider="google", store=store).reserve()
+
+
+def test_retry_delay_malformed_retry_after(monkeypatch):
+    '''
+    Test that a malformed Retry-After header falls back to the backoff
+    '''
+    limiter = RateLimiter(qps=1000, base_delay=1.0)
+    for header in ["soon", "Mon, 99 Foo 2024", "nan", "inf", "-inf"]:
+        response = httpx.Response(429, headers={"Retry-After": header})
+        assert 0 <= limiter.retry_delay(response, attempt=2) <= 4
+    response = httpx.Response(429, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+    assert limiter.retry_delay(response, attempt=2) == 0
+
+
+def test_rate_limiter_retries(monkeypatch):
+    '''
+    Test that throttled responses are retried after Retry-After and that
+    server errors back off exponentially with jitter
+    '''
+    sleeps = []
+    monkeypatch.setattr(reviews_utils.time, "sleep", sleeps.append)
+    responses = iter([
+        httpx.Response(429, headers={"Retry-After": "3"}),
+        httpx.Response(503),
+        httpx.Response(200, json={"ok": True}),
+    ])
+    limiter = RateLimiter(qps=1000, burst=10, base_delay=1.0)
+
+    response = limiter.request(lambda url: next(responses), "http://test")
+
+    assert response.json() == {"ok": True}
+    retry_sleeps = [s for s in sleeps if s > 0]
+    assert retry_sleeps[0] == 3
+    assert 0 <= sleeps[-2] <= 2
+    assert limiter.stats().requests == 3
+    assert limiter.stats().retries == 2
+
+
+def test_rate_limiter_async_gives_up():
+    '''
+    Test that the last failed response is returned once retries run out
+    '''
+    async def send(url):
+        return httpx.Response(500)
+
+    limiter = RateLimiter(qps=1000, burst=10, max_retries=2, base_delay=0.001)
+    response = asyncio.run(limiter.request_async(send, "http://test"))
+
+    assert response.status_code == 500
+    assert limiter.stats().requests == 3
+
+
+def test_place_table_round_trip(tmp_path):
+    '''
+    Test that places survive the place table file, missing values included,
+    and that numeric columns are read from the file without copying
+    '''
+    places = [
+        Place("Ping Tom Memorial Park", 41.857, -87.633, 4.7, 3677, "Google"),
+        Place("Parque Niños Héroes", 41.85, -87.69, 4.5, 12, "Yelp"),
+        Place(None, None, None, 0, 0, "Yelp Dataset"),
+    ]
+    table = place_table(places)
+    assert table.dtype["name"].itemsize == len("Ping Tom Memorial Park")
+
+    save_place_table(table, "places", tmp_path)
+    loaded = load_place_table(tmp_path / "places.npy")
+    assert isinstance(loaded, np.memmap)
+    assert np.shares_memory(loaded["rating"], loaded)
+    assert table_places(loaded) == [place._asdict() for place in places]
+
+    columns = table_columns(loaded)
+    assert columns["name"].tolist() == ["Ping Tom Memorial Park", "Parque Niños Héroes", ""]
+    assert columns["review_count"].tolist() == [3677, 12, 0]
+
+
+def test_empty_place_table(tmp_path):
+    '''
+    Test that a search without places gives an empty table
+    '''
+    table = place_table([])
+    save_place_table(table, "places", tmp_path)
+    assert table_places(load_place_table(tmp_path / "places.npy")) == []
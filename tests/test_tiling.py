@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+from green_spaces.reviews.tiling import Tile, adaptive_search
+
+BBOX = (42.0, 41.6, -87.5, -87.9)
+
+
+def fake_provider(places, cap):
+    '''
+    Local provider returning at most cap places within the search radius,
+    the nearest first, and recording its calls
+    '''
+    calls = []
+
+    def search(tile):
+        calls.append(tile)
+        lat, lon = tile.center
+        dy = (places[:, 0] - lat) * 111_000
+        dx = (places[:, 1] - lon) * 111_000 * np.cos(np.radians(lat))
+        distance = np.hypot(dx, dy)
+        found = np.flatnonzero(distance <= tile.radius)
+        found = found[np.argsort(distance[found])][:cap]
+        return [{"id": int(i)} for i in found]
+
+    return search, calls
+
+
+@pytest.fixture
+def clustered_places():
+    '''
+    500 places in a dense cluster and 40 spread over the bounding box
+    '''
+    rng = np.random.default_rng(0)
+    cluster = rng.normal([41.9, -87.65], 0.01, size=(500, 2))
+    spread = rng.uniform([41.6, -87.9], [42.0, -87.5], size=(40, 2))
+    return np.vstack([cluster, spread])
+
+
+def test_tile_split_covers_tile():
+    '''
+    Test that quadrants cover the tile and halve the search radius
+    '''
+    tile = Tile(*BBOX)
+    quadrants = tile.split()
+    assert len(quadrants) == 4
+    assert max(q.north for q in quadrants) == tile.north
+    assert min(q.south for q in quadrants) == tile.south
+    assert max(q.east for q in quadrants) == tile.east
+    assert min(q.west for q in quadrants) == tile.west
+    assert all(q.radius == pytest.approx(tile.radius / 2, rel=0.01) for q in quadrants)
+
+
+def test_sparse_area_takes_one_call(clustered_places):
+    '''
+    Test that a search that does not saturate is not split
+    '''
+    search, calls = fake_provider(clustered_places[500:], cap=60)
+    result = adaptive_search(search, BBOX, 60, key=lambda place: place["id"])
+    assert result.calls == len(calls) == 1
+    assert len(result.places) == 40
+
+
+def test_saturated_tiles_are_split(clustered_places):
+    '''
+    Test that subdividing saturated tiles finds every place, with far fewer
+    calls than a uniform grid of the smallest tiles
+    '''
+    search, calls = fake_provider(clustered_places, cap=60)
+    result = adaptive_search(search, BBOX, 60, key=lambda place: place["id"])
+
+    assert sorted(place["id"] for place in result.places) == list(range(540))
+    assert not result.truncated
+    assert result.calls == len(calls)
+
+    depth = max(round(np.log2(Tile(*BBOX).radius / tile.radius)) for tile in calls)
+    assert result.calls < 4**depth / 4
+
+
+def test_max_radius_splits_without_searching(clustered_places):
+    '''
+    Test that tiles larger than the provider's radius are split first
+    '''
+    search, calls = fake_provider(clustered_places[500:], cap=60)
+    max_radius = Tile(*BBOX).radius // 2 + 10
+    result = adaptive_search(search, BBOX, 60, key=lambda place: place["id"],
+                             max_radius=max_radius)
+    assert result.calls == 4
+    assert all(tile.radius <= max_radius for tile in calls)
+    assert len(result.places) == 40
+
+
+def test_truncated_tiles_reported():
+    '''
+    Test that tiles still saturated at the smallest size are reported
+    '''
+    places = np.full((100, 2), [41.8, -87.7])
+    search, _ = fake_provider(places, cap=60)
+    result = adaptive_search(search, BBOX, 60, key=lambda place: place["id"],
+                             min_radius=5_000)
+    assert result.truncated
+    assert all(tile.radius / 2 < 5_000 for tile in result.truncated)
@@ -0,0 +1,95 @@
+import gzip
+import json
+import pytest
+from green_spaces.reviews.combine_reviews import dedup_places
+from green_spaces.reviews.yelp_dataset import (
+    file_shards,
+    ingest_dataset,
+    iter_shard,
+)
+
+BBOX = (42.0, 41.6, -87.5, -87.9)
+
+
+def write_lines(path, records):
+    '''
+    Write records as JSON lines
+    '''
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "wt") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    '''
+    Business dump with parks inside and outside the bounding box, a
+    restaurant and a park without reviews, and a review dump
+    '''
+    businesses = [
+        {"business_id": "a", "name": "Alpha Park", "latitude": 41.8,
+         "longitude": -87.6, "stars": 3.0, "review_count": 2,
+         "categories": "Parks, Active Life"},
+        {"business_id": "b", "name": "Beta Dog Park", "latitude": 41.9,
+         "longitude": -87.7, "stars": 4.5, "review_count": 8,
+         "categories": "Dog Parks"},
+        {"business_id": "c", "name": "Far Park", "latitude": 39.9,
+         "longitude": -75.1, "stars": 5.0, "review_count": 3,
+         "categories": "Parks"},
+        {"business_id": "d", "name": "Diner", "latitude": 41.8,
+         "longitude": -87.6, "stars": 4.0, "review_count": 5,
+         "categories": "Restaurants"},
+    ]
+    reviews = [
+        {"review_id": str(i), "business_id": business_id, "stars": stars,
+         "text": "x" * 50}
+        for i, (business_id, stars) in enumerate(
+            [("a", 5), ("c", 1), ("a", 4), ("d", 2), ("a", 3)] * 20
+        )
+    ]
+    business_path = tmp_path / "business.json.gz"
+    review_path = tmp_path / "review.json"
+    write_lines(business_path, businesses)
+    write_lines(review_path, reviews)
+    return business_path, review_path, reviews
+
+
+def test_shards_cover_every_line_once(dataset):
+    '''
+    Test that byte-range shards read every line exactly once
+    '''
+    _, review_path, reviews = dataset
+    shards = file_shards([review_path], shard_size=100)
+    assert len(shards) > 10
+    records = [record for shard in shards for record in iter_shard(*shard)]
+    assert records == reviews
+
+
+def test_ingest_dataset(dataset):
+    '''
+    Test that businesses are filtered by bounding box and category, and
+    rated from their reviews or from the business record without reviews
+    '''
+    business_path, review_path, _ = dataset
+    places = ingest_dataset([business_path], [review_path], BBOX,
+                            max_workers=2, shard_size=300)
+    assert sorted(places, key=lambda place: place["name"]) == [
+        {"name": "Alpha Park", "latitude": 41.8, "longitude": -87.6,
+         "rating": 4.0, "review_count": 60, "source": "Yelp Dataset"},
+        {"name": "Beta Dog Park", "latitude": 41.9, "longitude": -87.7,
+         "rating": 4.5, "review_count": 8, "source": "Yelp Dataset"},
+    ]
+
+
+def test_dataset_listing_counts_as_yelp():
+    '''
+    Test that a dataset listing of a Yelp API place is not counted twice
+    '''
+    places = [
+        {"name": "Alpha Park", "latitude": 41.8, "longitude": -87.6,
+         "rating": 4.0, "review_count": 60, "source": "Yelp Dataset"},
+        {"name": "Alpha Park", "latitude": 41.8, "longitude": -87.6,
+         "rating": 4.5, "review_count": 50, "source": "Yelp"},
+    ]
+    assert dedup_places(places) == places[:1]